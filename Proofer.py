@@ -3,12 +3,24 @@
 # Import modules
 import sys
 import os
-from time import sleep
+import argparse
+import atexit
+from collections import OrderedDict
 import datetime
+from hashlib import blake2b
 import re
 from re import findall
 sys.path.insert(0, '/Users/zjszewczyk/Dropbox/Code/Standalone')
 from Markdown import Markdown
+from phrase_matcher import PhraseMatcher, LongestMatches
+from syllable_index import dictionary_syllables
+from features import FeatureCache
+from watcher import Watcher
+from preview import PreviewServer
+from stats_output import write_reports
+from repetition import RepetitionDetector, default_window
+from tokenizer import tokenize, count_sentences
+from profiling import Profiler
 
 ####
 ## "pec_overused" is a list of overused words from Plain English Campaign (http://www.plainenglish.co.uk/the-a-z-of-alternative-words.html)
@@ -33,6 +45,12 @@ exclude         = be_verbs+["the", "a", "or", "my", "and", "to", "we", "I", "for
 def SyllableCount(word):
     word = word.lower()
 
+    # Prefer the syllable count from the dictionary. Fall back on the heuristic
+    # below only for words the dictionary does not know.
+    sylls = dictionary_syllables(word)
+    if (sylls != None):
+        return sylls
+
     syls = 0 # Number of added syllables
     disc = 0 # Number of discarded syllables
 
@@ -127,15 +145,263 @@ def SyllableCount(word):
     # calculate the output
     return numVowels - disc + syls
 
+# Time each stage of a build; disabled unless run with --profile.
+profiler = Profiler(enabled=False)
+
+# Match the characters around a word that stop a complex word from being
+# highlighted: the end of a tag before it, or the start of one after it.
+tag_before = re.compile(r"[\>\w]")
+tag_after = re.compile(r"[\<\w]")
+
+# Class: BuildContext
+# Purpose: Hold everything a build needs that outlives the build, so a watch
+#          session sets it up once: the word lists, the templates, a compiled
+#          pattern for each word highlighted, and the results of the last
+#          build.
+class BuildContext:
+    # Method: __init__
+    # Purpose: Build the word lists.
+    # Parameters:
+    # - window: Number of consecutive words, across paragraphs, in which
+    #           three uses of a word make it a repeated word. (Integer)
+    # - max_patterns: Maximum number of compiled patterns to keep. (Integer)
+    def __init__(self, window=default_window, max_patterns=4096):
+        self.window = window
+        self.max_patterns = max_patterns
+
+        # Search each paragraph's tokens for every overused word and phrase
+        # in a single pass.
+        self.matcher = PhraseMatcher(overlap, tokenize)
+
+        # Cache each word's syllable count and word list memberships across
+        # paragraphs and rebuilds, since prose repeats the same few words
+        # over and over.
+        self.features = FeatureCache(SyllableCount, exclude, be_verbs)
+
+        # Templates, split at the divider, with their modification times.
+        self.templates = {}
+
+        # A compiled pattern matching each highlighted word between non-word
+        # characters. Compiled once per word, rather than left to the re
+        # module's cache, which a long post's vocabulary overflows, and kept
+        # for the most recently used words, so a long watch session does not
+        # hold a pattern for every word it has ever highlighted.
+        self.patterns = OrderedDict()
+
+        # The results of every line proofed in the last build, and each
+        # line's tokens, keyed by content hash, so rebuilds only proof and
+        # scan the lines that changed.
+        self.paragraphs = {}
+        self.tokens = {}
+
+    # Method: template
+    # Purpose: Return a template split at its divider, reading it again only
+    #          when it has changed on disk.
+    # Parameters:
+    # - path: Path to the template. (String)
+    # Return: The HTML before and after the article. (List)
+    def template(self, path):
+        mtime = os.stat(path).st_mtime_ns
+        cached = self.templates.get(path)
+        if (cached == None or cached[0] != mtime):
+            fd = open(path, "r")
+            cached = (mtime, fd.read().split("<!--Divider-->"))
+            fd.close()
+            self.templates[path] = cached
+        return cached[1]
+
+    # Method: pattern
+    # Purpose: Return the compiled pattern for a word between non-word
+    #          characters, as highlighting substitutes it.
+    # Parameters:
+    # - word: The word. (String)
+    # Return: The pattern. (Pattern)
+    def pattern(self, word):
+        compiled = self.patterns.get(word)
+        if (compiled != None):
+            self.patterns.move_to_end(word)
+            return compiled
+
+        # Evict the least recently used pattern once the cache is full.
+        compiled = self.patterns[word] = re.compile(r"([^\w])"+word+r"([^\w])")
+        if (len(self.patterns) > self.max_patterns):
+            self.patterns.popitem(last=False)
+        return compiled
+
+# The build context for callers that do not keep their own.
+default_context = BuildContext()
+
+# Method: ProofParagraph
+# Purpose: Proof a single line of the content file
+# Parameters:
+# - line: Line of the content file. (String)
+# - block: Whether the line falls inside a <pre> block. (Boolean)
+# - render: Whether to render HTML, or only count. (Boolean)
+# - repeated: Lowercase words the document-wide repetition pass found repeated
+#   in this line. (Frozenset)
+# - tokens: The line's tokens, if already scanned. (List)
+# - context: Word lists and compiled patterns. (BuildContext)
+# Return: The line's HTML, whether it counts toward the document statistics,
+#         its statistics if so, and whether the next line falls inside a <pre>
+#         block. (Dictionary)
+def ProofParagraph(line, block, render=True, repeated=frozenset(), tokens=None, context=None):
+    context = context or default_context
+    result = {"fk_wc":line.count(" ")+1, "html":"", "counted":False, "block":block, "findings":[]}
+
+    # Save a "backup" of the line, for searching a sanitized version of it
+    backup = line
+
+    # If we're looking at an empty line, just skip over it; else continue
+    if (len(line.strip()) == 0):
+        return result
+
+    # Do not collect stats on code snippets. Write them to the file and
+    # move on.
+    if (line[0:4] == "<pre" or block == True):
+        if (line.find("</pre>") == -1):
+            block = True
+        else:
+            block = False
+    result["block"] = block
+
+    # Do not collect stats on images. Write them to the file and move on.
+    if (line[0:2] == "![" or line[0:4] == "<pre"):
+        if (render):
+            result["html"] = Markdown(line, "https://zacs.site/")+"\n"
+        return result
+
+    # Instantiate paragraph-specific statistics
+    wc = 0 # Word count for current paragraph
+    overused_words = 0 # Number of overused words
+    repeated_words = 0 # Number of repeated words
+    avoid_words = 0 # Number of words to avoid
+    complex_words = 0 # Number of complex words
+    syllable_count = 0 # Number of syllables
+    highlighted = set() # Repeated words already highlighted in this line
+    findings = result["findings"] # Words and phrases found, by category
+
+    # Scan the line once; every count below reads from its tokens.
+    if (tokens == None):
+        tokens = tokenize(backup)
+
+    # Find every word or phrase from the list of overused words to avoid in
+    # a single, case insensitive pass over the tokens. Count each match
+    # toward the paragraph and document totals, then highlight the longest
+    # non-overlapping matches, rebuilding the line once from the offsets.
+    matches = context.matcher.search_tokens(tokens, backup)
+    overused_words += len(matches)
+    findings.extend({"category":"overused", "text":line[start:end]} for start,end,phrase in matches)
+
+    if (render):
+        pieces = []
+        last_end = 0
+        for start, end, phrase in LongestMatches(matches):
+            pieces.append(line[last_end:start])
+            pieces.append("<span class='replace'>"+line[start:end]+"</span>")
+            last_end = end
+        pieces.append(line[last_end:])
+        line = "".join(pieces)
+
+    # For each word in the sentence, highlight repetitions. Also check for be
+    # verbs as well, and highlight them accordingly.
+    for token in tokens:
+        wc += 1
+
+        # Look up the word's syllable count and word list memberships, which
+        # are only computed the first time the cache sees the word.
+        stripped = token.text
+        lowered = token.norm
+        features = context.features.get(lowered)
+
+        # First check if we have decided to exclude the word, as in the case of "the",
+        # "of", "a", "for", or similar words. If true, skip the word; else, proceed.
+        if (not features.excluded):
+            # If the repetition pass found three occurences of the word within
+            # the window, highlight it as a repeat word and incrememnt the number
+            # of unique words repeated in the document.
+            if (lowered in repeated and lowered not in highlighted):
+                highlighted.add(lowered)
+                findings.append({"category":"repeated", "text":stripped})
+                if (render):
+                    line = context.pattern(stripped).sub(r"\1<span class='repeat "+stripped+"'>"+stripped+r"</span>\2", line)
+                repeated_words += 1
+
+        # Check for be verbs, "ly" words in the document. If found, highlight
+        # them and increment the be verb count.
+        if (features.be_verb or features.adverb):
+            findings.append({"category":"avoid", "text":stripped})
+            if (render):
+                line = context.pattern(stripped).sub(r"\1<span class='avoid'>"+stripped+r"</span>\2", line)
+            avoid_words += 1
+
+        # To calculate the number of complex words, first exclude proper nouns. Next,
+        # exclude compound words, then strip -es, -ed, and -ing endings. Finally, if
+        # the number of syllables in the remaining word is >= 3, found a complex word.
+        if (token.case != "title" and token.case != "upper"):
+            if ("-" not in stripped):
+                if (features.complex):
+                    findings.append({"category":"complex", "text":stripped})
+                    complex_words += 1
+                if (features.complex and render):
+                    start = line.find(stripped)
+                    length = len(stripped)
+                    end = start+length
+
+                    # print("Searched: '%s'" % line[start:end])
+                    # print("With ends: '%s'" % line[start-1:end+1])
+                    # print("Preceeding character: '%s'" % line[start-1])
+                    # print("After character: '%s'" % line[end])
+                    # print(re.match("[\>\w]", line[start-1]))
+                    # print(re.match("[\<\w]", line[end]))
+                    # print(line)
+                    # print
+                    if not ("http" in stripped or tag_before.match(line[start-1]) or tag_after.match(line[end])):
+                        line = line.replace(stripped, "<span class='complex_word'>"+stripped+"</span>")
+                    # line = re.sub((r"[^\>\w]")+stripped+(r"[^\<\w]"), "\1<span class='complex_word'>"+stripped+"</span>\2", line)
+                    # sleep(1)
+
+        syllable_count += features.syllables
+
+    # Count sentences in paragraph
+    sentences = count_sentences(tokens) or 1
+
+    if (render):
+        if (line[0:1] != "* " and line[0] != "#" and line[0:3] != "<pre" and block == False and line[-7:].strip() != "</pre>"):
+            # Write the paragraph stats div to the output file, then the parsed line.
+            result["html"] += "<div class='floating_stats'><div>Words: %d. Sentences: %d</div><div>Overused phrase: %d</div><div>Repeated: %d; Avoid: %d</div></div>\n" % (wc, sentences, overused_words, repeated_words, avoid_words)
+        result["html"] += Markdown(line, "https://zacs.site/")+"\n"
+
+    result.update({"counted":True, "words":wc, "sentences":sentences, "overused":overused_words, "repeated":repeated_words, "avoid":avoid_words, "complex":complex_words, "syllables":syllable_count})
+    return result
+
+# Method: Ratio
+# Purpose: Divide, treating a ratio over nothing, like words per sentence in
+#          a draft with no sentences yet, as zero.
+# Parameters:
+# - numerator: The count to divide. (Integer)
+# - denominator: The count to divide by. (Integer)
+# Return: The ratio, or 0.0 if the denominator is zero. (Float)
+def Ratio(numerator, denominator):
+    return float(numerator)/float(denominator) if denominator else 0.0
+
 # Will probably rewrite this. Regex for all HTML tags: (<[^>]+>)|(&[^;]+;)
-# Method: GenFile
-# Purpose: Generate an HTML file for proofing
+# Method: BuildDocument
+# Purpose: Proof a content file, reusing the results of lines proofed in an
+#          earlier build.
 # Parameters:
 # - iname: Name of content file. (String)
-def GenFile(iname):
+# - render: Whether to render HTML, or only count. (Boolean)
+# - context: Word lists and the last build's results. (BuildContext)
+# Return: The document's title HTML, its paragraphs' HTML, its statistics
+#         named as in assets/template.html and as plain numbers, each counted
+#         paragraph's statistics and findings, the number of lines proofed,
+#         and the number of lines in the file. (Dictionary)
+def BuildDocument(iname, render=True, context=None):
+    context = context or default_context
+
     # Instantiate document statistics
     #   fk_wc is a special word count for the Flesch-Kincaid readability test
-    #   word_count is a by-paragraph word count
+    #   paragraph_count is a count of the paragraphs counted
     #   total_sentences is a count of all sentences in document
     #   total_word_count is the word count for the entire document
     #   total_overused_words is the count of overused words
@@ -145,7 +411,7 @@ def GenFile(iname):
     #   complex_words is a running count of words with over three syllables
     #   syllable_count is a running cound of syllables in the document
     fk_wc = 0
-    word_count = []
+    paragraph_count = 0
     total_sentences = 0
     total_word_count = 0
     total_overused_words = 0
@@ -154,22 +420,12 @@ def GenFile(iname):
     complex_words = 0
     syllable_count = 0
 
-    # Open th template file, read its contents, and split them for easy access later
-    template_fd = open("template.html", "r")
-    template = template_fd.read().split("<!--Divider-->")
-    template_fd.close()
-
-    # Clear the output file, then write the opening HTML tags
-    o_fd = open("index.html", "w").close()
-    o_fd = open("index.html", "a")
-    o_fd.write(template[0])
-
     # Open the source file
     fd = open(iname, "r")
 
     # Read the title from the source file
     title = fd.readline().strip()
-    if (title[0] == "#"):
+    if (title[:1] == "#"):
         title = title.split("](")
         title = "<h2 class='linkpost'><a href=\""+title[1][:-3]+"\">"+title[0][3:]+"</a></h2>"
     else:
@@ -178,161 +434,97 @@ def GenFile(iname):
     # Get rid of the title separator (=) and the following blank line
     fd.readline()
 
-    # Write the opening <article> tag and article title
-    o_fd.write("<article>\n")
-    o_fd.write(title)
-
-    block = False
-    # Iterate over each line in the file
+    # Find the words used three times within the repetition window, across
+    # paragraph breaks, in one pass over the document's words. Lines
+    # ProofParagraph skips, like images and code, do not count.
+    source = []
+    seen_tokens = {}
+    detector = RepetitionDetector(context.window, 3, exclude)
     for line in iter(fd.readline, ""):
-        fk_wc += line.count(" ")+1
-
-        # Save a "backup" of the line, for searching a sanitized version of it
-        backup = line
-
-        # If we're looking at an empty line, just skip over it; else continue
-        if (len(line.strip()) == 0):
-            continue
-
-        # Do not collect stats on code snippets. Write them to the file and
-        # move on.
-        if (line[0:4] == "<pre" or block == True):
-            if (line.find("</pre>") == -1):
-                block = True
-            else:
-                block = False
-
-        # Do not collect stats on images. Write them to the file and move on.
-        if (line[0:2] == "![" or line[0:4] == "<pre"):
-            o_fd.write(Markdown(line, "https://zacs.site/")+"\n")
+        digest = blake2b(line.encode("utf-8"), digest_size=16).digest()
+        source.append((line, digest))
+        if (len(line.strip()) == 0 or line[0:2] == "![" or line[0:4] == "<pre"):
             continue
-
-        # Instantiate paragraph-specific statistics
-        wc = 0 # Word count for current paragraph
-        overused_words = 0 # Number of overused words
-        repeated_words = 0 # Number of repeated words
-        avoid_words = 0 # Number of words to avoid
-        dict_count = {} # A dictionary that will count occurences of each word
-
-        # For each word in the list of overused words to avoid, search the
-        # paragraph case insensitively. If a match is found, increment the count
-        # of overused words in the paragraph and document, then highlight it.
-        for word in overlap:
-            m = re.search("[^\w]"+word+"[^\w]", line, re.IGNORECASE)
-            if (m):
-                overused_words += line.lower().count(word)
-                total_overused_words += overused_words
-
-                # The first replace will capture matches with uppercase letters
-                # that start a sentence, or regular lowercase words; if the first
-                # replace targeted matches with uppercase letters that start a
-                # sentence, the second replace will capture all other occurences of
-                # that word that may exist throughout the document.
-                line = line.replace(m.group(0), " <span class='replace'>"+m.group(0)+"</span> ")
-                if (m.group(0) != m.group(0).lower()):
-                    line = line.replace(m.group(0).lower(), " <span class='replace'>"+m.group(0).lower().strip()+"</span> ")
-
-        # For each word in the sentence, count repetitions. If there are three or more
-        # of the same word in a sentnece, highlight all occurences. Also check for be
-        # verbs as well, and highlight them accordingly.
-        # for word in backup.split(" "):
-        for word in re.split("(\s|--)", backup):
-
-            if ("](" in word):
-                word = word.split("](")[0]
-
-            # This strips any special characters from the word, such as punctuation.
-            stripped = re.sub(r"^[\W]+", "", word.strip())
-            stripped = re.sub(r"[\W]+$", "", stripped)
-
-            if (len(stripped) == 0):
-                continue
-
-            wc += 1
-
-            # First check if we have decided to exclude the word, as in the case of "the",
-            # "of", "a", "for", or similar words. If true, skip the word; else, proceed.
-            if (stripped.lower() not in exclude):
-                # If the word already exists in the dictionary, increment its count; else
-                # instantiate it to 1
-                if (stripped.lower() in dict_count):
-                    dict_count[stripped.lower()] += 1
-                else:
-                    dict_count[stripped.lower()] = 1
-
-                # Once there are at least three occurences of a word in the paragraph,
-                # highlight it as a repeat word and incrememnt the number of unique words
-                # repeated in the document.
-                if (dict_count[stripped.lower()] == 3):
-                    line = re.sub(r"([^\w])"+stripped+r"([^\w])", r"\1<span class='repeat "+stripped+"'>"+stripped+r"</span>\2", line)
-                    repeated_words += 1
-                    total_repeated_words += 1
-
-            # Check for be verbs, "ly" words in the document. If found, highlight
-            # them and increment the be verb count.
-            if (stripped.lower() in be_verbs) or (stripped.lower()[-2:] == "ly"):
-                line = re.sub(r"([^\w])"+stripped+r"([^\w])", r"\1<span class='avoid'>"+stripped+r"</span>\2", line)
-                avoid_words += 1
-                total_avoid_words += 1
-
-            # To calculate the number of complex words, first exclude proper nouns. Next,
-            # exclude compound words, then strip -es, -ed, and -ing endings. Finally, if
-            # the number of syllables in the remaining word is >= 3, found a complex word.
-            if (not (re.search("^[A-Z]", stripped))):
-                if ("-" not in stripped):
-                    if (SyllableCount(stripped.lower()) >= 3):
-                        start = line.find(word)
-                        length = len(word)
-                        end = start+length
-
-                        # print("Searched: '%s'" % line[start:end])
-                        # print("With ends: '%s'" % line[start-1:end+1])
-                        # print("Preceeding character: '%s'" % line[start-1])
-                        # print("After character: '%s'" % line[end])
-                        # print(re.match("[\>\w]", line[start-1]))
-                        # print(re.match("[\<\w]", line[end]))
-                        # print(line)
-                        # print
-                        if not ("http" in stripped or re.match("[\>\w]", line[start-1]) or re.match("[\<\w]", line[end])):
-                            line = line.replace(stripped, "<span class='complex_word'>"+stripped+"</span>")
-                        # line = re.sub((r"[^\>\w]")+stripped+(r"[^\<\w]"), "\1<span class='complex_word'>"+stripped+"</span>\2", line)
-                        complex_words += 1
-                        # sleep(1)
-
-            syllable_count += SyllableCount(stripped.lower())
-
-        word_count.append(wc)
-
-        # Count sentences in paragraph, and add that number to the running sentence total
-        sentences = (len(re.findall("\.[^\w]",line))+len(re.findall("[?!]",line))) or 1
-        total_sentences += sentences
-
-        if (line[0:1] != "* " and line[0] != "#" and line[0:3] != "<pre" and block == False and line[-7:].strip() != "</pre>"):
-            # Write the paragraph stats div to the output file, then the parsed line.
-            o_fd.write("<div class='floating_stats'><div>Words: %d. Sentences: %d</div><div>Overused phrase: %d</div><div>Repeated: %d; Avoid: %d</div></div>\n" % (word_count[-1], sentences, overused_words, repeated_words, avoid_words))
-        o_fd.write(Markdown(line, "https://zacs.site/")+"\n")
+        tokens = seen_tokens.get(digest) or context.tokens.get(digest)
+        if (tokens == None):
+            with profiler.stage("tokenize"):
+                tokens = tokenize(line)
+        seen_tokens[digest] = tokens
+        with profiler.stage("repetition"):
+            for token in tokens:
+                detector.add(token.norm, len(source)-1)
+    context.tokens = seen_tokens
+
+    repeated = {}
+    for word, found in detector.repeated().items():
+        for number in found:
+            repeated.setdefault(number, set()).add(word)
+
+    # Iterate over each line in the file. Reuse the results for any line
+    # proofed in an earlier build, keyed by a hash of its content, whether
+    # it falls inside a <pre> block, and its repeated words; proof only new or
+    # modified lines. Group the lines' HTML into paragraphs, keeping a <pre>
+    # block that spans several lines together, so each paragraph is a
+    # complete fragment.
+    block = False
+    seen = {}
+    paragraphs = []
+    paragraph = ""
+    paragraph_stats = []
+    proofed, lines = 0, 0
+    for line, digest in source:
+        flagged = frozenset(repeated.get(lines, ()))
+        lines += 1
+        key = (digest, block, render, flagged)
+        result = seen.get(key) or context.paragraphs.get(key)
+        if (result == None):
+            with profiler.stage("proof"):
+                result = ProofParagraph(line, block, render, flagged, seen_tokens.get(digest), context)
+            proofed += 1
+        seen[key] = result
+        block = result["block"]
+
+        fk_wc += result["fk_wc"]
+        paragraph += result["html"]
+        if (not block and len(paragraph) != 0):
+            paragraphs.append(paragraph)
+            paragraph = ""
+        if (result["counted"]):
+            paragraph_count += 1
+            total_word_count += result["words"]
+            total_sentences += result["sentences"]
+            total_overused_words += result["overused"]
+            total_repeated_words += result["repeated"]
+            total_avoid_words += result["avoid"]
+            complex_words += result["complex"]
+            syllable_count += result["syllables"]
+            paragraph_stats.append({"line":lines+2, "words":result["words"], "sentences":result["sentences"], "overused":result["overused"], "repeated":result["repeated"], "avoid":result["avoid"], "complex":result["complex"], "syllables":result["syllables"], "findings":result["findings"]})
+    if (len(paragraph) != 0):
+        paragraphs.append(paragraph)
+
+    # Keep only the lines of the current draft, so the cache does not grow
+    # with every edit.
+    context.paragraphs = seen
 
     # Close the source file
     fd.close()
 
-    # Write closing <article> tag
-    o_fd.write("</article>")
-
-    # Sum the paragraph word counts into a single count, for document stats
-    for num in word_count:
-        total_word_count += int(num)
-
     # Get a timestamp for the document stats
     d = datetime.datetime.now()
     utime = "%d-%d-%d %d:%d:%d" % (d.year,d.month,d.day,d.hour,d.minute,d.second)
 
+    # A draft with no words or no sentences yet, like a new post with only a
+    # title, scores zero on every test rather than dividing by zero.
+    scored = total_word_count > 0 and total_sentences > 0
+
     # Calculate Gunning Fog Index
     # estimates the years of formal education needed to understand the text on a first reading.
-    gfi = 0.4*(float(total_word_count)/float(total_sentences) + 100.0*float(complex_words)/float(total_word_count))
+    gfi = 0.4*(Ratio(total_word_count, total_sentences) + 100.0*Ratio(complex_words, total_word_count)) if scored else 0.0
 
     # Calculate Flesch-Kincaid Readability Test
     # higher scores indicate material that is easier to read; lower numbers indicate difficulty.
-    fkr = 206.835 - 1.015*(float(fk_wc)/float(total_sentences)) - 84.6*(float(syllable_count)/float(fk_wc))
+    fkr = 206.835 - 1.015*Ratio(fk_wc, total_sentences) - 84.6*Ratio(syllable_count, fk_wc) if scored else 0.0
+    counts = {"words":total_word_count, "sentences":total_sentences, "paragraphs":paragraph_count, "overused":total_overused_words, "repeated":total_repeated_words, "avoid":total_avoid_words, "complex":complex_words, "syllables":syllable_count, "reading_ease":fkr}
 
     if (fkr <= 30.0):
         fkr = "<span class='extreme'>%3.2f</span>" % (fkr)
@@ -351,46 +543,121 @@ def GenFile(iname):
 
     # Calculate the Flesch-Kincaid Grade level:
     # the number of years of education generally required to understand this text.
-    fgl = 0.39 * float(total_word_count)/float(total_sentences) + 11.8 * float(syllable_count)/float(total_word_count) - 15.59
+    fgl = 0.39*Ratio(total_word_count, total_sentences) + 11.8*Ratio(syllable_count, total_word_count) - 15.59 if scored else 0.0
+    counts.update({"fog_index":gfi, "grade_level":fgl})
 
-    # Write the closing HTML to the output file, with document stats. Close it.
-    o_fd.write(template[1] % (utime, utime, total_word_count, str(total_word_count/200.0)+" mins", total_sentences, len(word_count), total_word_count/len(word_count), total_overused_words, total_repeated_words, total_avoid_words, gfi, fkr, fgl))
-    o_fd.close()
+    stats = {"DTG":utime, "WORDS":total_word_count, "READING_TIME":total_word_count/200.0, "SENTENCES":total_sentences, "PARAGRAPHS":paragraph_count, "AVGWP":Ratio(total_word_count, paragraph_count), "AVGWS":Ratio(total_word_count, total_sentences), "AVGSS":Ratio(syllable_count, total_sentences), "AVGS":Ratio(syllable_count, total_word_count), "OVERUSED_PHRASES":total_overused_words, "REPEATED_WORDS":total_repeated_words, "WORDS_TO_AVOID":total_avoid_words, "FOG_INDEX":gfi, "READING_EASE":fkr, "GRADE_LEVEL":fgl}
+
+    return {"title":title, "paragraphs":paragraphs, "stats":stats, "counts":counts, "paragraph_stats":paragraph_stats, "proofed":proofed, "lines":lines}
+
+# Method: GenFile
+# Purpose: Generate an HTML file for proofing
+# Parameters:
+# - iname: Name of content file. (String)
+# - template_path: Template, with the article and statistics divided by
+#   <!--Divider-->. (String)
+# - output_path: HTML file to write. (String)
+# - context: Word lists, templates, and the last build's results. (BuildContext)
+# Return: Number of lines proofed, and number of lines in the file. (Tuple)
+def GenFile(iname, template_path="template.html", output_path="index.html", context=None):
+    context = context or default_context
+    document = BuildDocument(iname, context=context)
+    stats = document["stats"]
+
+    # Read the template and split it for easy access later, unless it has not
+    # changed since the last build.
+    with profiler.stage("template"):
+        template = context.template(template_path)
+
+    with profiler.stage("write"):
+        # Clear the output file, then write the opening HTML tags
+        o_fd = open(output_path, "w").close()
+        o_fd = open(output_path, "a")
+        o_fd.write(template[0])
+
+        # Write the article: its title, then each paragraph
+        o_fd.write("<article>\n")
+        o_fd.write(document["title"])
+        o_fd.write("".join(document["paragraphs"]))
+        o_fd.write("</article>")
+
+        # Write the closing HTML to the output file, with document stats. Close it.
+        o_fd.write(template[1] % (stats["DTG"], stats["DTG"], stats["WORDS"], str(stats["READING_TIME"])+" mins", stats["SENTENCES"], stats["PARAGRAPHS"], stats["AVGWP"], stats["OVERUSED_PHRASES"], stats["REPEATED_WORDS"], stats["WORDS_TO_AVOID"], stats["FOG_INDEX"], stats["READING_EASE"], stats["GRADE_LEVEL"]))
+        o_fd.close()
+
+    return document["proofed"], document["lines"]
 
 if (__name__ == "__main__"):
     t1 = datetime.datetime.now()
 
-    if (len(sys.argv) <= 1):
-        print("Provide text file.")
-        sys.exit(1)
-
-    f = sys.argv[1]
+    # Parse CLI arguments.
+    parser = argparse.ArgumentParser(description='Generate a live preview of a Markdown file, with writing statistics.')
+    parser.add_argument('file', type=str, help='Text file to proof.')
+    parser.add_argument('--exit', action='store_true', help='Build the HTML file once and exit, instead of watching for changes.')
+    parser.add_argument('--debounce', type=float, default=50, help='Milliseconds to wait for a burst of writes to finish before rebuilding. (Default: 50)')
+    parser.add_argument('--interval', type=float, default=2, help='Seconds between checks, where file events are unavailable. (Default: 2)')
+    parser.add_argument('--format', type=str, default='html', choices=['html', 'json', 'ndjson'], help='Build the HTML file, or print statistics and findings as JSON or NDJSON without rendering, and exit. (Default: html)')
+    parser.add_argument('--window', type=int, default=default_window, help='Number of consecutive words, across paragraphs, in which three uses of a word make it a repeated word. (Default: %d)' % default_window)
+    parser.add_argument('--profile', action='store_true', help='Print the time and calls spent in each stage of building on exit.')
+    parser.add_argument('--profile-memory', action='store_true', help='With --profile, also trace each stage\'s peak memory, which slows building.')
+    parser.add_argument('--profile-output', type=str, default=None, metavar='PATH', help='With --profile, also write a cProfile dump to PATH, for pstats.')
+    parser.add_argument('--serve', type=int, nargs='?', const=8000, default=None, metavar='PORT', help='Serve a live preview on localhost instead of writing the HTML file, pushing changed paragraphs to the page. (Default port: 8000)')
+    args = parser.parse_args()
+
+    f = args.file
+    default_context.window = args.window
+
+    # With --profile, time each stage, and report the breakdown on exit.
+    if (args.profile):
+        profiler = Profiler(True, args.profile_memory, args.profile_output)
+        Markdown = profiler.wrap("markdown", Markdown)
+        default_context.features.syllable_count = profiler.wrap("syllables", default_context.features.syllable_count)
+        def ReportProfile():
+            profiler.finish()
+            print(profiler.table(), file=sys.stderr)
+        atexit.register(ReportProfile)
 
     if (not os.path.isfile(f)):
         print("Provide valid file.")
         sys.exit(1)
 
-    # If there are two parameters, it's ./Proofer.py {FILENAME}, so monitor
-    # {FILENAME} for changes and update the HTML file live. If there are 3,
-    # it's ./Proofer.py {FILENAME} --exit, so just build the HTML file.
-    if (len(sys.argv) != 3):
-        f_s = []
+    # With --format json or ndjson, just print the statistics.
+    if (args.format != "html"):
+        document = BuildDocument(f, render=False)
+        title = re.sub(r"<[^>]+>", "", document["title"]).strip()
+        with profiler.stage("output"):
+            write_reports([{"file":f, "title":title, "stats":document["counts"], "paragraphs":document["paragraph_stats"]}], args.format, sys.stdout)
+    # With --serve, monitor {FILENAME} for changes and push them to the live
+    # preview. Without --exit, monitor {FILENAME} for changes and update the
+    # HTML file live. With --exit, just build the HTML file.
+    elif (args.serve != None):
+        watcher = Watcher(f, args.debounce/1000.0, args.interval)
+        server = PreviewServer("127.0.0.1", args.serve)
+        server.start()
+        print("Serving preview at %s" % server.url())
 
         while True:
-            n_s = os.stat(f)
-            n_s = [n_s.st_mtime, n_s.st_ctime]
+            # Build and push the changed paragraphs, then sleep until the file
+            # changes.
+            t1 = datetime.datetime.now()
+            document = BuildDocument(f)
+            sent = server.publish(document["title"], document["paragraphs"], document["stats"])
+            t2 = datetime.datetime.now()
+            print("Proofed %d of %d lines; sent %d of %d paragraphs in %s. Feature cache: %s" % (document["proofed"], document["lines"], sent, len(document["paragraphs"]), t2-t1, default_context.features))
+
+            watcher.wait()
+    elif (not args.exit):
+        watcher = Watcher(f, args.debounce/1000.0, args.interval)
 
-            if (f_s == n_s):
-                sleep(2)
-                continue
-
-            # File has changed
+        while True:
+            # Build, then sleep until the file changes.
             d = datetime.datetime.now()
             utime = "%d-%d-%d %d:%d:%d" % (d.year,d.month,d.day,d.hour,d.minute,d.second)
             print("Building: ", utime)
-            GenFile(f)
+            proofed, total = GenFile(f)
+            print("Proofed %d of %d lines. Feature cache: %s" % (proofed, total, default_context.features))
 
-            f_s = n_s
+            watcher.wait()
     else:
         print("Building '%s'" % f)
         GenFile(f)
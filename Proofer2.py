@@ -2,20 +2,38 @@
 
 # Imports
 import sys # CLI arguments
+import atexit # Profile reports
 import argparse # CLI argument parsing
-from os.path import isfile # Basic bounds checks
+from os import cpu_count, makedirs, walk # Batch mode
+from os.path import abspath, commonpath, dirname, getsize, isdir, isfile, join, relpath, splitext # Basic bounds checks, batch mode
+from glob import glob # Batch mode
+from multiprocessing import Pool # Batch mode
 from datetime import datetime # Runtime
-from re import sub # Text processing
-from html import unescape
-sys.path.insert(0, '/Users/zjszewczyk/Dropbox/Code/firstcrack-private')
-from Markdown import Markdown
 from re import findall
-from re import split as resplit
+from re import compile as recompile
+from html import unescape
+from collections import deque
+from annotate import Annotations, strip_tags
+from syllable_index import dictionary_syllables
+from features import FeatureCache
+from stats_output import write_record, write_reports
+from repetition import RepetitionDetector, default_repeats, default_window
+from tokenizer import tokenize, count_sentences
+from profiling import Profiler
 
 # Use the argparse library to specific input and ouput files via the CLI.
 parser = argparse.ArgumentParser(description='Identify elements of weak writing.')
 parser.add_argument('input_file', metavar='-i', type=str, nargs='?' ,help='Input file.')
 parser.add_argument('output_file', metavar='-o', type=str, nargs='?' ,help='Input file.')
+parser.add_argument('-b', '--batch', type=str, nargs='+', default=None, metavar='PATH', help='Proof every post in these files, directories, or glob patterns, instead of one input file.')
+parser.add_argument('-d', '--output-dir', type=str, default='./proofed', help='Directory for batch previews and summary.tsv. (Default: ./proofed)')
+parser.add_argument('-f', '--format', type=str, default='html', choices=['html', 'json', 'ndjson'], help='Write an HTML preview, or print statistics and findings as JSON or NDJSON without rendering. (Default: html)')
+parser.add_argument('-s', '--stream', action='store_true', help='Read the post from the input file, or from stdin if it is - or missing, and print NDJSON for each paragraph as soon as it is proofed, then for the document.')
+parser.add_argument('--no-title', dest='title', action='store_false', help='With --stream, the post does not start with a title.')
+parser.add_argument('--profile', action='store_true', help='Print the time and calls spent in each stage of proofing to stderr. Batch workers are not profiled.')
+parser.add_argument('--profile-memory', action='store_true', help='With --profile, also trace each stage\'s peak memory, which slows proofing.')
+parser.add_argument('--profile-output', type=str, default=None, metavar='PATH', help='With --profile, also write a cProfile dump to PATH, for pstats.')
+parser.add_argument('-j', '--jobs', type=int, default=cpu_count(), help='Number of batch worker processes. (Default: one per core)')
 
 # Class: c(olors)
 # Purpose: provide access to ANSI escape codes for styling output
@@ -36,6 +54,12 @@ class c():
 def syllables(word):
     word = word.lower()
 
+    # Prefer the syllable count from the dictionary. Fall back on the heuristic
+    # below only for words the dictionary does not know.
+    sylls = dictionary_syllables(word)
+    if (sylls != None):
+        return sylls
+
     syls = 0 # Number of added syllables
     disc = 0 # Number of discarded syllables
 
@@ -149,11 +173,667 @@ be_verbs = ["am", "is", "are", "was", "were", "be", "being", "been", "you're", "
 # Store a list of words to exclude from repetition highlighting.
 exclude = ["the", "a", "or", "my", "and", "to", "we", "I", "for", "i", "what", "of", "that", "he", "she", "it", "you", "your", "have", "which", "in", "on", "with", "would", "as", "had", "s"]
 
+# Store the words never highlighted as repeats, once, rather than per line.
+repetition_skip = frozenset(x.lower() for x in exclude+be_verbs)
+
+# Index the Plain English Campaign's suggestions by lowercase word.
+pec_lower = {k.lower():v for k,v in pec.items()}
+
+# Cache each word's syllable count and word list memberships, keyed by the
+# lowercase word, so repeated words are only looked up once.
+feature_cache = FeatureCache(syllables, exclude, be_verbs, [("trite", pec), ("avoid", marked_avoid), ("alternate", marked_alternate)])
+
+# Time each stage of proofing; disabled unless run with --profile.
+profiler = Profiler(enabled=False)
+
+# Store the location of the HTML template, next to this script.
+default_template = join(dirname(abspath(__file__)), "assets", "template.html")
+
+# Store the location of the Markdown parser, which load_markdown imports.
+markdown_path = '/Users/zjszewczyk/Dropbox/Code/firstcrack-private'
+
+# Store the file extensions batch mode treats as posts.
+post_extensions = [".md", ".txt", ".markdown"]
+
+# Store the substitutions that reduce Markdown to its visible text, in order:
+# images, links (keeping their text), tags, block markers, and emphasis.
+markdown_text_res = [(recompile(r"!\[[^\]]*\]\([^)]*\)"), ""),
+                     (recompile(r"\[([^\]]*)\](?:\([^)]*\)|\[[^\]]*\])"), r"\1"),
+                     (recompile(r"<[^>]*>"), ""),
+                     (recompile(r"^(?:#+|>|[*+-]|[0-9]+\.)\s+"), ""),
+                     (recompile(r"[*`]+|(?<!\w)_+|_+(?!\w)"), "")]
+
+# Store the markup used to highlight each category of finding, in order of
+# priority for findings that cover the same text.
+markup = [("trite", "<span class='trite tooltip'>", "<span class='tooltiptext'>Consider replacing with: {payload}</span></span>"),
+          ("avoid", "<span class='avoid'>", "</span>"),
+          ("alternate", "<span class='alternate'>", "</span>"),
+          ("dup", "<span class='dup'>", "</span>")]
+
+# Method: read_template
+# Purpose: Read the HTML template, split where the article goes.
+# Parameters:
+# - path: Path to the template. (String)
+# Return: The HTML before and after the article. (List)
+def read_template(path=default_template):
+    fd = open(path, "r")
+    template = fd.read().split("<!-- DIVIDER -->")
+    fd.close()
+    return template
+
+# Method: read_title
+# Purpose: Extract a post's title from its first line, consuming any metadata
+#          lines and the blank line that follow it.
+# Parameters:
+# - line: First line of the post, stripped. (String)
+# - infile: The post, positioned after its first line. (File)
+# Return: The title. (String)
+def read_title(line, infile):
+    if (line[:5] == "Type:"): # Handle files with a metadata header
+        # Extract the title from the next line
+        title = next(infile, "")[7:]
+        # Skip three metadata lines and the blank line separator
+        for i in range(4):
+            next(infile, "")
+    elif (line[:1] == "#"): # Handle linkposts
+        title = line.split("](")[0][2:]
+    else: # Handle original articles
+        title = line
+        next(infile, "")
+    return title
+
+# Method: markdown_text
+# Purpose: Reduce a line of Markdown to its visible text, without rendering it:
+#          drop images, tags, and formatting characters, and keep link text.
+# Parameters:
+# - line: Line of Markdown. (String)
+# Return: The line's text. (String)
+def markdown_text(line):
+    for pattern, replacement in markdown_text_res:
+        line = pattern.sub(replacement, line)
+    return unescape(line)
+
+# Method: analyze_paragraph
+# Purpose: Count a paragraph's words, sentences, and syllables, and find the
+#          words to highlight in it. Repeated words are found across
+#          paragraphs, by the detector each word is fed to.
+# Parameters:
+# - text_line: The paragraph's text, without markup. (String)
+# - detector: Repetition detector for the whole document. (RepetitionDetector)
+# - key: Recorded with each word fed to the detector, to identify the
+#        paragraph, such as its line number. (Any)
+# Return: Paragraph metrics, and findings as (start, end, category, payload)
+#         offsets into text_line. (Tuple)
+def analyze_paragraph(text_line, detector, key):
+    metrics = {"words":0, "sentences":0, "overused":0, "repeated":0, "avoid":0, "complex":0, "syllables":0}
+    findings = []
+
+    # Scan the paragraph once; every count below reads from its tokens.
+    with profiler.stage("tokenize"):
+        tokens = tokenize(text_line)
+    metrics["words"] = len(tokens)
+    metrics["sentences"] = count_sentences(tokens)
+
+    # For each word, count syllables and complex words (words with >= 3
+    # syllables), and feed it to the repetition detector. Then highlight be
+    # verbs, words the Plain English Campaign lists as complex, words Marked
+    # suggests avoiding, and words Marked suggests finding an alternative for,
+    # counting each distinct word once.
+    with profiler.stage("words"):
+        counted = set()
+        for token in tokens:
+            features = feature_cache.get(token.norm)
+            metrics["syllables"] += features.syllables
+            if (features.complex): metrics["complex"] += 1
+            detector.add(token.norm, (key, token.start, token.end))
+
+            # Ignore tokens that are in the exclude list
+            if (features.excluded): continue
+            if (features.be_verb): # Handle be verbs
+                metric, category, payload = "avoid", "avoid", None
+            elif (features.category == "trite"): # Handle Plain English Campaign's list
+                metric, category, payload = "overused", "trite", pec_lower[token.norm]
+            elif (features.category == "avoid"): # Handle Marked's Avoid word list
+                metric, category, payload = "avoid", "avoid", None
+            elif (features.category == "alternate"): # Handle Marked's Alternate list
+                metric, category, payload = "overused", "alternate", None
+            else:
+                continue
+
+            findings.append((token.start, token.end, category, payload))
+            if (token.text not in counted):
+                counted.add(token.text)
+                metrics[metric] += 1
+
+    return metrics, findings
+
+# Method: readability
+# Purpose: Score a text's readability from its counts.
+# Parameters:
+# - words: Number of words. (Integer)
+# - sentences: Number of sentences. (Integer)
+# - complex_words: Number of words with three or more syllables. (Integer)
+# - syllables: Number of syllables. (Integer)
+# Return: Gunning Fog Index, Flesch-Kincaid reading ease, and Flesch-Kincaid
+#         grade level, or zeros for a text with no words or no sentences.
+#         (Tuple)
+def readability(words, sentences, complex_words, syllables):
+    if (words == 0 or sentences == 0):
+        return 0.0, 0.0, 0.0
+
+    # Calculate Gunning Fog Index, which estimates the years of formal
+    # education needed to understand the text on a first reading.
+    fog_index = 0.4*(float(words)/float(sentences) + 100.0*float(complex_words)/float(words))
+
+    # Calculate Flesch-Kincaid Readability Test. Higher scores indicate
+    # material that is easier to read; lower numbers indicate difficulty.
+    reading_ease = 206.835 - 1.015*(float(words)/float(sentences)) - 84.6*(float(syllables)/float(words))
+
+    # Calculate the Flesch-Kincaid Grade level, which estimates the number
+    # of years of education generally required to understand this text.
+    grade_level = 0.39 * float(words)/float(sentences) + 11.8 * float(syllables)/float(words) - 15.59
+
+    return fog_index, reading_ease, grade_level
+
+# Method: ratio
+# Purpose: Divide two counts, for averages over a post that may have none of
+#          the thing averaged over, like a title-only post's sentences.
+# Parameters:
+# - numerator: The count to average. (Integer)
+# - denominator: The count to average over. (Integer)
+# Return: The average, or 0 when there is nothing to average over. (Float)
+def ratio(numerator, denominator):
+    return numerator/denominator if denominator else 0.0
+
+# Class: Paragraph
+# Purpose: Hold one line of a post: its source, its text, its counts, and its
+#          findings as (start, end, category, payload) offsets into the text.
+class Paragraph:
+    __slots__ = ("line", "source", "html", "text", "words", "sentences", "overused", "repeated", "avoid", "complex", "syllables", "findings")
+
+    # Method: as_dict
+    # Purpose: Return the paragraph's counts and findings, for serialization.
+    def as_dict(self):
+        return {"line":self.line, "words":self.words, "sentences":self.sentences, "overused":self.overused, "repeated":self.repeated, "avoid":self.avoid, "complex":self.complex, "syllables":self.syllables, "findings":[{"category":category, "start":start, "end":end, "text":self.text[start:end], "payload":payload} for start,end,category,payload in sorted(self.findings)]}
+
+# Class: Report
+# Purpose: Hold the analysis of a post: its title, document counts and
+#          readability scores, and every line as a Paragraph.
+class Report:
+    __slots__ = ("title", "words", "sentences", "paragraph_count", "overused", "repeated", "avoid", "complex", "syllables", "fog_index", "reading_ease", "grade_level", "paragraphs")
+
+    # Method: stats
+    # Purpose: Return the document's counts and scores, for serialization.
+    def stats(self):
+        return {"words":self.words, "sentences":self.sentences, "overused":self.overused, "repeated":self.repeated, "avoid":self.avoid, "complex":self.complex, "syllables":self.syllables, "paragraphs":self.paragraph_count, "fog_index":self.fog_index, "reading_ease":self.reading_ease, "grade_level":self.grade_level}
+
+    # Method: as_dict
+    # Purpose: Return the report in the form stats_output writes.
+    # Parameters:
+    # - name: Name of the post, such as its path. (String)
+    def as_dict(self, name=None):
+        return {"file":name, "title":self.title, "stats":self.stats(), "paragraphs":[p.as_dict() for p in self.paragraphs if len(p.text.strip()) != 0]}
+
+# Default analysis options:
+# - title: Whether the post starts with a title, as read_title expects. (Boolean)
+# - parser: Function rendering a line of Markdown to HTML, whose text is then
+#           analyzed; None reduces each line with markdown_text instead, and
+#           leaves the report unrenderable. (Function)
+# - window: Number of consecutive words, across paragraphs, a repeated word's
+#           uses must fall within. (Integer)
+# - repeats: Number of uses within the window that make a repeated word. (Integer)
+default_options = {"title":True, "parser":None, "window":default_window, "repeats":default_repeats}
+
+# Method: stream
+# Purpose: Proof a post line by line, yielding each paragraph as soon as the
+#          repetition window has moved past it, and folding its counts into the
+#          report's running totals. Only the paragraphs still inside the window
+#          are held, so memory stays flat however long the post.
+# Parameters:
+# - lines: The post's lines, from a list, a file, or stdin. (Iterable)
+# - report: Receives the title, totals, and, once every paragraph has been
+#           yielded, the readability scores. (Report)
+# - options: Overrides of default_options. (Dictionary)
+# Return: Paragraphs, in order. (Generator)
+def stream(lines, report, options=None):
+    options = dict(default_options, **(options or {}))
+    parse = options["parser"]
+
+    report.title = None
+    report.paragraph_count = 0
+    for name in ["words", "sentences", "overused", "repeated", "avoid", "complex", "syllables"]:
+        setattr(report, name, 0)
+    detector = RepetitionDetector(options["window"], options["repeats"], repetition_skip)
+    pending = deque() # (paragraph, index of its last word, its repeated words)
+
+    # Number lines as they are read, since read_title reads ahead.
+    numbered = enumerate(lines, 1)
+    for number, line in numbered:
+        line = line.strip()
+
+        if (number == 1 and options["title"]): # Extract title
+            report.title = read_title(line, (x for n,x in numbered))
+            continue
+
+        # Increase the paragraph count
+        if (len(line) != 0): 
+            if (line[0] != "#"):
+                report.paragraph_count += 1
+
+        # Analyze the line's visible text: the text of its rendered HTML, if
+        # there is a parser, or the Markdown reduced to text otherwise.
+        paragraph = Paragraph()
+        paragraph.line = number
+        paragraph.source = line
+        if (parse != None):
+            with profiler.stage("markdown"):
+                paragraph.html = parse(line)
+            with profiler.stage("strip_tags"):
+                paragraph.text = strip_tags(paragraph.html)[0]
+        else:
+            paragraph.html = None
+            with profiler.stage("markdown_text"):
+                paragraph.text = markdown_text(line)
+        metrics, paragraph.findings = analyze_paragraph(paragraph.text, detector, number)
+        for name, value in metrics.items():
+            setattr(paragraph, name, value)
+        pending.append((paragraph, detector.count-1, set()))
+
+        # Highlight repeated words, and count the distinct repeated words in
+        # each paragraph, then release the paragraphs no later word can
+        # repeat.
+        with profiler.stage("repetition"):
+            flag_repeats(detector.take(), pending)
+        while (pending and detector.settled(pending[0][1])):
+            yield settle(pending.popleft()[0], report)
+
+    while (pending):
+        yield settle(pending.popleft()[0], report)
+    report.fog_index, report.reading_ease, report.grade_level = readability(report.words, report.sentences, report.complex, report.syllables)
+
+# Method: flag_repeats
+# Purpose: Record newly reported repeated words in their paragraphs.
+# Parameters:
+# - found: Word -> (line number, start, end) occurrences, from the
+#          detector's take. (Dictionary)
+# - pending: (paragraph, index of its last word, its repeated words) for the
+#            paragraphs not yet yielded. (Deque)
+def flag_repeats(found, pending):
+    if (len(found) == 0):
+        return
+    lines = {paragraph.line:(paragraph, seen) for paragraph,last,seen in pending}
+    for word, occurrences in found.items():
+        for line, start, end in occurrences:
+            paragraph, seen = lines[line]
+            paragraph.findings.append((start, end, "dup", None))
+            if (word not in seen):
+                paragraph.repeated += 1
+                seen.add(word)
+
+# Method: settle
+# Purpose: Fold a finished paragraph's counts into the report's totals.
+# Parameters:
+# - paragraph: The paragraph. (Paragraph)
+# - report: The report. (Report)
+# Return: The paragraph. (Paragraph)
+def settle(paragraph, report):
+    report.words += paragraph.words
+    report.sentences += paragraph.sentences
+    report.overused += paragraph.overused
+    report.repeated += paragraph.repeated
+    report.avoid += paragraph.avoid
+    report.complex += paragraph.complex
+    report.syllables += paragraph.syllables
+    return paragraph
+
+# Method: analyze
+# Purpose: Proof a post held in memory. Nothing is read or written.
+# Parameters:
+# - text: The post, in Markdown. (String)
+# - options: Overrides of default_options. (Dictionary)
+# Return: The post's analysis. (Report)
+def analyze(text, options=None):
+    report = Report()
+    report.paragraphs = list(stream(text.splitlines(keepends=True), report, options))
+    return report
+
+# Method: render
+# Purpose: Render a report as an HTML preview, highlighting its findings.
+# Parameters:
+# - report: Analysis made with a parser. (Report)
+# - template: HTML before and after the article, from read_template. (List)
+# - built: Build time to show. (Datetime)
+# Return: The preview. (String)
+def render(report, template, built=None):
+    built = built or datetime.now()
+    word_count, sentence_count, syllable_count, paragraph_count = report.words, report.sentences, report.syllables, report.paragraph_count
+
+    # Write opening HTML tags and title
+    out = [f"{template[0]}\n<article>\n<h2>{report.title}</h2>\n"]
+
+    for paragraph in report.paragraphs:
+        if (paragraph.html == None):
+            raise ValueError("Reports analyzed without a parser cannot be rendered.")
+
+        # Render every finding into the line's HTML in one pass, through a map
+        # from each character of the text back to the HTML.
+        with profiler.stage("highlight"):
+            text_line, starts, ends = strip_tags(paragraph.html)
+            annotations = Annotations(markup)
+            for start, end, category, payload in paragraph.findings:
+                annotations.add(start, end, category, payload)
+            out.append(f"{annotations.render(paragraph.html, starts, ends)}\n")
+
+    reading_ease = report.reading_ease
+    if (reading_ease <= 30.0): reading_ease = "<span class='extreme'>%3.2f</span>" % (reading_ease)
+    elif (reading_ease <= 50.0): reading_ease = "<span class='hard'>%3.2f</span>" % (reading_ease)
+    elif (reading_ease <= 60.0): reading_ease = "<span class='tough'>%3.2f</span>" % (reading_ease)
+    elif (reading_ease <= 70.0): reading_ease = "<span class='plain'>%3.2f</span>" % (reading_ease)
+    elif (reading_ease <= 80.0): reading_ease = "<span class='fair'>%3.2f</span>" % (reading_ease)
+    elif (reading_ease <= 90.0): reading_ease = "<span class='easy'>%3.2f</span>" % (reading_ease)
+    elif (reading_ease <= 100.00): reading_ease = "<span class='simple'>%3.2f</span>" % (reading_ease)
+    
+    # Write the closing HTML tags, and fill in document statistics
+    with profiler.stage("template"):
+        out.append(f"</article>\n{template[1].format(DTG=built, WORDS=word_count, READING_TIME=(word_count/200), SENTENCES=sentence_count, PARAGRAPHS=paragraph_count, AVGWP=ratio(word_count, paragraph_count), AVGWS=ratio(word_count, sentence_count), AVGSS=ratio(syllable_count, sentence_count), AVGS=ratio(syllable_count, word_count), OVERUSED_PHRASES=report.overused, REPEATED_WORDS=report.repeated, WORDS_TO_AVOID=report.avoid, FOG_INDEX=report.fog_index, READING_EASE=reading_ease, GRADE_LEVEL=report.grade_level)}\n")
+    return "".join(out)
+
+# Method: load_markdown
+# Purpose: Import the Markdown parser, which lives outside this repository,
+#          when a preview is first rendered rather than when this module is
+#          imported.
+# Return: A Markdown parser. (Markdown)
+def load_markdown():
+    if (markdown_path not in sys.path):
+        sys.path.insert(0, markdown_path)
+    from Markdown import Markdown
+    return Markdown()
+
+# Method: read_post
+# Purpose: Read a post from disk.
+# Parameters:
+# - input_file: Path to the post. (String)
+# Return: The post. (String)
+def read_post(input_file):
+    fd = open(input_file, "r")
+    text = fd.read()
+    fd.close()
+    return text
+
+# Method: proof_file
+# Purpose: Proof a Markdown file and write an HTML preview of it.
+# Parameters:
+# - input_file: Path to the Markdown file. (String)
+# - output_file: Path for the HTML preview. (String)
+# - md: Markdown parser. (Markdown)
+# - template: HTML before and after the article, from read_template. (List)
+# Return: Document statistics. (Dictionary)
+def proof_file(input_file, output_file, md, template):
+    # Record build time
+    t1 = datetime.now()
+
+    with profiler.stage("read"):
+        text = read_post(input_file)
+    report = analyze(text, {"parser":md.html})
+    html = render(report, template, t1)
+
+    with profiler.stage("write"):
+        fd = open(output_file, "w")
+        fd.write(html)
+        fd.close()
+
+    return report.stats()
+
+# Method: stats_file
+# Purpose: Proof a Markdown file for its statistics and findings only, without
+#          rendering Markdown, highlighting, or filling in the template.
+# Parameters:
+# - input_file: Path to the Markdown file. (String)
+# Return: The post's title, document statistics, and each paragraph's metrics
+#         and findings, with offsets into the paragraph's text. (Dictionary)
+def stats_file(input_file):
+    with profiler.stage("read"):
+        text = read_post(input_file)
+    report = analyze(text)
+    report.title = report.title.strip() if report.title != None else None
+    return report.as_dict(input_file)
+
+# Method: expand_inputs
+# Purpose: Expand directories and glob patterns into the posts they contain.
+# Parameters:
+# - paths: Files, directories, or glob patterns. (List)
+# Return: Paths to posts, sorted and without duplicates. (List)
+def expand_inputs(paths):
+    found = set()
+    for path in paths:
+        for match in (glob(path, recursive=True) or [path]):
+            if (isdir(match)):
+                for root, dirs, files in walk(match):
+                    found.update(join(root, x) for x in files if splitext(x)[1].lower() in post_extensions)
+            elif (isfile(match)):
+                found.add(match)
+    return sorted(found)
+
+# Per-worker Markdown parser and template, set up once by init_worker rather
+# than once per post.
+worker_md = None
+worker_template = None
+
+# Method: init_worker
+# Purpose: Prepare a batch worker: load the parser, template, and lexicons once.
+# Parameters:
+# - template_path: Path to the template. (String)
+def init_worker(template_path):
+    global worker_md, worker_template
+    worker_md = load_markdown()
+    worker_template = read_template(template_path)
+    dictionary_syllables("a")
+
+# Method: proof_worker
+# Purpose: Proof one post in a batch worker.
+# Parameters:
+# - task: (input file, output file). (Tuple)
+# Return: (input file, statistics or None, error or None). (Tuple)
+def proof_worker(task):
+    input_file, output_file = task
+    try:
+        makedirs(dirname(output_file) or ".", exist_ok=True)
+        return input_file, proof_file(input_file, output_file, worker_md, worker_template), None
+    except Exception as e:
+        return input_file, None, f"{type(e).__name__}: {e}"
+
+# Method: stats_worker
+# Purpose: Proof one post for its statistics in a batch worker.
+# Parameters:
+# - input_file: Path to the post. (String)
+# Return: (input file, report or None, error or None). (Tuple)
+def stats_worker(input_file):
+    try:
+        return input_file, stats_file(input_file), None
+    except Exception as e:
+        return input_file, None, f"{type(e).__name__}: {e}"
+
+# Method: stats_batch
+# Purpose: Proof many posts for their statistics across a pool of worker
+#          processes, yielding each report in order as it finishes. One job,
+#          or one post, runs in this process instead.
+# Parameters:
+# - inputs: Paths to posts. (List)
+# - jobs: Number of worker processes. (Integer)
+# - errors: Receives errors, by input file. (Dictionary)
+# Return: Reports. (Generator)
+def stats_batch(inputs, jobs, errors):
+    pool = None
+    if (jobs > 1 and len(inputs) > 1):
+        pool = Pool(jobs, initializer=dictionary_syllables, initargs=("a",))
+        results = pool.imap(stats_worker, inputs)
+    else:
+        results = map(stats_worker, inputs)
+
+    for input_file, report, error in results:
+        if (error != None):
+            errors[input_file] = error
+        else:
+            yield report
+
+    if (pool != None):
+        pool.close()
+        pool.join()
+
+# Method: summarize
+# Purpose: Combine per-post statistics into statistics for the whole batch,
+#          computing the readability scores from the summed counts.
+# Parameters:
+# - results: Per-post statistics. (List)
+# Return: Batch statistics. (Dictionary)
+def summarize(results):
+    total = {x:sum(r[x] for r in results) for x in ["words", "sentences", "paragraphs", "overused", "repeated", "avoid", "complex", "syllables"]}
+    total["fog_index"], total["reading_ease"], total["grade_level"] = readability(total["words"], total["sentences"], total["complex"], total["syllables"])
+    return total
+
+# Method: preview_paths
+# Purpose: Name each post's preview, mirroring the posts' directory layout
+#          under the output directory: draft.md becomes draft.html. Posts
+#          that would share a preview, like draft.md and draft.txt, keep
+#          their extension instead: draft.md.html and draft.txt.html.
+#          Names are compared without case, for case-insensitive disks.
+# Parameters:
+# - inputs: Paths to posts. (List)
+# - output_dir: Directory for the previews. (String)
+# Return: Preview path, by input file. (Dictionary)
+def preview_paths(inputs, output_dir):
+    # A post listed twice, by different paths, is proofed once.
+    posts = {}
+    for x in inputs:
+        posts.setdefault(abspath(x), x)
+    root = commonpath([dirname(x) for x in posts])
+
+    names = {x:relpath(x, root) for x in posts}
+    stems = {}
+    for x, name in names.items():
+        stems.setdefault(splitext(name)[0].lower(), []).append(x)
+    for shared in stems.values():
+        if (len(shared) == 1):
+            names[shared[0]] = splitext(names[shared[0]])[0]
+
+    paths, owners = {}, {}
+    for x, name in names.items():
+        path = join(output_dir, name+".html")
+        if (path.lower() in owners):
+            raise ValueError(f"{posts[owners[path.lower()]]} and {posts[x]} would both be previewed as {path}.")
+        owners[path.lower()] = x
+        paths[posts[x]] = path
+    return paths
+
+# Method: proof_batch
+# Purpose: Proof many posts across a pool of worker processes, writing an HTML
+#          preview per post and a summary of every post.
+# Parameters:
+# - inputs: Paths to posts. (List)
+# - output_dir: Directory for the previews and summary. (String)
+# - jobs: Number of worker processes. (Integer)
+# - template_path: Path to the template. (String)
+# Return: Per-post statistics, by input file, and errors, by input file. (Tuple)
+def proof_batch(inputs, output_dir, jobs, template_path=default_template):
+    tasks = list(preview_paths(inputs, output_dir).items())
+
+    # Hand out the largest posts first, so one long post does not finish last.
+    tasks.sort(key=lambda x: getsize(x[0]), reverse=True)
+
+    results, errors = {}, {}
+    pool = Pool(jobs, initializer=init_worker, initargs=(template_path,))
+    for input_file, stats, error in pool.imap_unordered(proof_worker, tasks):
+        if (error != None):
+            errors[input_file] = error
+        else:
+            results[input_file] = stats
+    pool.close()
+    pool.join()
+
+    # Write one row per post, then one for the whole batch.
+    columns = ["words", "sentences", "paragraphs", "overused", "repeated", "avoid", "complex", "syllables", "fog_index", "reading_ease", "grade_level"]
+    fd = open(join(output_dir, "summary.tsv"), "w")
+    fd.write("\t".join(["file"]+columns)+"\n")
+    for input_file in sorted(results):
+        fd.write("\t".join([input_file]+[str(round(results[input_file][x], 2)) for x in columns])+"\n")
+    total = summarize(list(results.values()))
+    fd.write("\t".join(["TOTAL"]+[str(round(total[x], 2)) for x in columns])+"\n")
+    fd.close()
+
+    return results, errors
+
 # If run, not imported:
 if (__name__ == "__main__"):
     # Parse CLI arguments.
     args = parser.parse_args(sys.argv[1:])
-    
+
+    # With --profile, time each stage, and report the breakdown on exit.
+    if (args.profile):
+        profiler = Profiler(True, args.profile_memory, args.profile_output)
+        feature_cache.syllable_count = profiler.wrap("syllables", feature_cache.syllable_count)
+        def report_profile():
+            profiler.finish()
+            print(profiler.table(), file=sys.stderr)
+        atexit.register(report_profile)
+
+    # Streaming mode: proof a post of any length from a file or stdin, as an
+    # editor filter would pipe it, printing each paragraph as it is done.
+    if (args.stream):
+        name = args.input_file if args.input_file not in [None, "-"] else "-"
+        if (name != "-" and not isfile(name)):
+            print(f"{c.FAIL}Error:{c.ENDC} Input file does not exist.", file=sys.stderr)
+            sys.exit(1)
+        infile = sys.stdin if name == "-" else open(name, "r")
+        report = Report()
+        try:
+            for paragraph in stream(infile, report, {"title":args.title}):
+                if (len(paragraph.text.strip()) != 0):
+                    with profiler.stage("output"):
+                        write_record(dict(paragraph.as_dict(), type="paragraph", file=name), sys.stdout)
+        finally:
+            if (infile != sys.stdin):
+                infile.close()
+        title = report.title.strip() if report.title != None else None
+        write_record(dict(report.stats(), type="document", file=name, title=title), sys.stdout)
+        sys.exit(0)
+
+    # Statistics mode: print reports to stdout, and anything else to stderr.
+    if (args.format != "html"):
+        inputs = expand_inputs(args.batch) if args.batch != None else [args.input_file] if args.input_file != None else []
+        inputs = [x for x in inputs if isfile(x)]
+        if (len(inputs) == 0):
+            print(f"{c.FAIL}Error:{c.ENDC} Input file does not exist.", file=sys.stderr)
+            sys.exit(1)
+
+        errors = {}
+        write_reports(stats_batch(inputs, args.jobs, errors), args.format, sys.stdout, many=args.batch != None)
+        for input_file, error in sorted(errors.items()):
+            print(f"{c.WARNING}Skipped:{c.ENDC} {input_file}: {error}", file=sys.stderr)
+        sys.exit(1 if errors else 0)
+
+    # Batch mode: proof every post across a pool of worker processes.
+    if (args.batch != None):
+        inputs = expand_inputs(args.batch)
+        if (len(inputs) == 0):
+            print(f"{c.FAIL}Error:{c.ENDC} No posts found.")
+            sys.exit(1)
+
+        t1 = datetime.now()
+        print(f"Processing {c.UNDERLINE}{len(inputs)}{c.ENDC} posts with {args.jobs} workers ... ")
+        makedirs(args.output_dir, exist_ok=True)
+        try:
+            results, errors = proof_batch(inputs, args.output_dir, args.jobs)
+        except ValueError as e:
+            print(f"{c.FAIL}Error:{c.ENDC} {e}")
+            sys.exit(1)
+        t2 = datetime.now()
+
+        for input_file, error in sorted(errors.items()):
+            print(f"{c.WARNING}Skipped:{c.ENDC} {input_file}: {error}")
+        elapsed = (t2-t1).total_seconds()
+        print(f"Proofed {len(results)} of {len(inputs)} posts into {c.UNDERLINE}{args.output_dir}{c.ENDC} in {c.BOLD}{elapsed}s{c.ENDC} ({len(inputs)/elapsed:.2f} files/s)")
+        sys.exit(1 if errors else 0)
+
     # Error if user does not specify an input file
     if (args.input_file == None):
         parser.print_help()
@@ -170,132 +850,11 @@ if (__name__ == "__main__"):
     # Otherwise, process the input file
     print(f"Processing {c.UNDERLINE}{args.input_file}{c.ENDC} ... ")
 
-    # Set document variables
-    word_count, sentence_count, paragraph_count, overused_phrase_count, repeated_word_count, avoid_word_count, complex_words, syllable_count, fog_index, reading_ease, grade_level = 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0
-
-    # Instantiate Markdown parser
-    md = Markdown()
-
-    # Read the template
-    fd = open("./assets/template.html", "r")
-    template = fd.read().split("<!-- DIVIDER -->")
-    fd.close()
-
     # Open the output file
     if (args.output_file == None):
         args.output_file = "./index.html"
-    open(args.output_file, "w").close()
-    outfile = open(args.output_file, "a")
-
-    # Process file
-    infile = open(args.input_file, "r")
-    
-    for i,line in enumerate(infile):
-        line = line.strip()
-
-        if (i == 0): # Extract title
-            if (line[:5] == "Type:"): # Handle files with a metadata header
-                # Extract the title from the next line
-                title = next(infile)[7:]
-                # Skip three metadata lines and the blank line separator
-                next(infile); next(infile); next(infile); next(infile)
-            elif (line[0] == "#"): # Handle linkposts
-                title = line.split("](")[0][2:]
-            else: # Handle original articles
-                title = line
-                next(infile)
-
-            # Write opening HTML tags and title to output file
-            outfile.write(f"{template[0]}\n<article>\n<h2>{title}</h2>\n")
-            continue
-        
-        # Parse Markdown line into HTML
-        html_line = md.html(line)
-
-        # Strip out all HTML tags from line, to leave only content.
-        text_line = unescape(sub(r"(\<[^\>]+\>)", "", html_line))
-        
-        # Increase the paragraph count
-        if (len(line) != 0): 
-            if (line[0] != "#"):
-                paragraph_count += 1
-
-        # Tokenize paragraph by splitting into individual words.
-        tokens = resplit(r"\W",text_line)
-
-        # Extract unique words in sentence.
-        tokens_set = frozenset(tokens)
-
-        # Calculate total syllables present in document, and number of complex
-        # words (words with >= 3 syllables). Also count words.
-        for word in tokens:
-            if not (word.isalpha()): continue
-            sylls = syllables(word)
-            syllable_count += sylls
-            if (sylls >= 3): complex_words += 1
-            word_count += 1
-
-        # Find duplicate words, and highlight them.
-        for word in (tokens_set - set(exclude+be_verbs)):
-            if (len(word) != 0):
-                if (tokens.count(word) > 2):
-                    html_line = html_line.replace(word, f"<span class='dup'>{word}</span>")
-
-        # Count sentences in paragraph, as defined by the number of '.', ';', 
-        # '!', or '?' present.
-        sentence_count += sum([text_line.count(x) for x in ['.',';','!','?']])
-
-        # Highlight be verbs, words the Plain English Campaign lists as complex,
-        # words Marked suggests avoiding, and words Marked suggests finding an
-        # alternative for.
-        for each in tokens_set:
-            # Ignore non-word tokens and tokens that are in the exclude list
-            if not (each.isalpha()): continue
-            if (each in exclude): continue
-
-            if (each in be_verbs): # Handle be verbs
-                avoid_word_count += 1
-                html_line = sub(f"(\W){each}(\W)", "\1<span class='avoid'>"+each+"</span>\2", html_line)
-            elif (each in pec.keys()): # Handle Plain English Campaign's list
-                overused_phrase_count += 1
-                html_line = html_line.replace(each, f"<span class='trite tooltip'>{each}<span class='tooltiptext'>Consider replacing with: {pec[each]}</span></span>")
-            elif (each in marked_avoid): # Handle Marked's Avoid word list
-                avoid_word_count += 1
-                html_line = html_line.replace(each, f"<span class='avoid'>{each}</span>")
-            elif (each in marked_alternate): # Handle Marked's Alternate list
-                overused_phrase_count += 1
-                html_line = html_line.replace(each, f"<span class='alternate'>{each}</span>")
-
-        # Write the processed line to the HTML file.
-        outfile.write(f"{html_line}\n")
-    # At the end of the input file, write closing HTML tags and close all files.
-    else:
-        # Calculate Gunning Fog Index, which estimates the years of formal
-        # education needed to understand the text on a first reading.
-        fog_index = 0.4*(float(word_count)/float(sentence_count) + 100.0*float(complex_words)/float(word_count))
-
-        # Calculate Flesch-Kincaid Readability Test. Higher scores indicate
-        # material that is easier to read; lower numbers indicate difficulty.
-        reading_ease = 206.835 - 1.015*(float(word_count)/float(sentence_count)) - 84.6*(float(syllable_count)/float(word_count))
-        if (reading_ease <= 30.0): reading_ease = "<span class='extreme'>%3.2f</span>" % (reading_ease)
-        elif (reading_ease <= 50.0): reading_ease = "<span class='hard'>%3.2f</span>" % (reading_ease)
-        elif (reading_ease <= 60.0): reading_ease = "<span class='tough'>%3.2f</span>" % (reading_ease)
-        elif (reading_ease <= 70.0): reading_ease = "<span class='plain'>%3.2f</span>" % (reading_ease)
-        elif (reading_ease <= 80.0): reading_ease = "<span class='fair'>%3.2f</span>" % (reading_ease)
-        elif (reading_ease <= 90.0): reading_ease = "<span class='easy'>%3.2f</span>" % (reading_ease)
-        elif (reading_ease <= 100.00): reading_ease = "<span class='simple'>%3.2f</span>" % (reading_ease)
-
-        # Calculate the Flesch-Kincaid Grade level, which estimates the number
-        # of years of education generally required to understand this text.
-        grade_level = 0.39 * float(word_count)/float(sentence_count) + 11.8 * float(syllable_count)/float(word_count) - 15.59
-        
-        # Write the closing HTML tags, and fill in document statistics
-        outfile.write(f"</article>\n{template[1].format(DTG=t1, WORDS=word_count, READING_TIME=(word_count/200), SENTENCES=sentence_count, PARAGRAPHS=paragraph_count, AVGWP=(word_count/paragraph_count), AVGWS=(word_count/sentence_count), AVGSS=(syllable_count/sentence_count), AVGS=(syllable_count/word_count), OVERUSED_PHRASES=overused_phrase_count, REPEATED_WORDS=repeated_word_count, WORDS_TO_AVOID=avoid_word_count, FOG_INDEX=fog_index, READING_EASE=reading_ease, GRADE_LEVEL=grade_level)}\n")
-        
-        # Close files.
-        infile.close()
-        outfile.close()
+    proof_file(args.input_file, args.output_file, load_markdown(), read_template())
 
     # Record end time, and report execution time
     t2 = datetime.now()
-    print(f"Execution time: {c.BOLD}{(t2-t1).total_seconds()}s{c.ENDC}")
\ No newline at end of file
+    print(f"Execution time: {c.BOLD}{(t2-t1).total_seconds()}s{c.ENDC}")
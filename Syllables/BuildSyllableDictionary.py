@@ -1,18 +1,23 @@
 #!/usr/local/bin/python3
 
 # Imports
-from scraper import Scraper # Web scraper
-from os.path import exists # File operations
+from scraper import Scraper, ResponseCache # Web scraper
+from os.path import exists, isfile # File operations
 from os import remove # Migrating files
 from multiprocessing import Pool # Multiprocessing
 from os import listdir # Finding files
+from crawler import Crawler # Concurrent web scraper
+from syllable_store import SyllableStore # Build state
+import argparse # Command-line options
+import asyncio # Concurrent web scraper
+import sys # Error output
 
 # Method: BuildSyllableDictionary
 # Purpose: Enrich wordlist with true syllables from a dictionary
 # Parameters: none.
 def BuildSyllableDictionary():
     # Create a new instance of the web scraper
-    s = Scraper()
+    s = Scraper(cache=response_cache)
 
     # Open the wordlist
     s_fd = open("/usr/share/dict/words", "r")
@@ -194,47 +199,74 @@ def BuildDictionary(tgt):
     # Delete temp file
     remove("./interim_"+tgt)
 
-# Method: DownloadSyllable
-# Purpose: Capture syllables for single word
+# Method: ParseGoogle
+# Purpose: Read a syllable count from a Google definition page. Depending on
+#          the user agent string, the syllables may be in a span or div.
 # Parameters:
-# - word: Target word (String)
-def DownloadSyllable(word):
-    # Create a new instance of the Scraper class. This is necessary since these
-    # queries will be split up among multiple processors with dissimilar memory
-    s = Scraper()
-    
-    # Query Google for the definition of the wordlist's word. Depending on
-    # the user agent string, the number of syllables may be in a span or
-    # div. If neither element is in the response, try another source.
-    resp = scrape("https://google.com/search?q=define%20"+word)
+# - resp: The page (String)
+# Return: Syllable count, or None if the page has none (Integer)
+def ParseGoogle(resp):
     if ('<span data-dobid="hdw">' in resp):
         resp = resp.split('<span data-dobid="hdw">',1)[1].split("</span>",1)[0]
-        print(word,",",resp.count("·")+1)
         return resp.count("·")+1
     elif ('<div data-hveid="20">' in resp):
         resp = resp.split('<div data-hveid="20">',1)[1].split(">",1)[1].split("<",1)[0]
-        print(word,",",resp.count("·")+1)
         return resp.count("·")+1
-    else:
-        resp = ""
+    return None
 
-    # If Google does not have a syllable breakdown for the target word,
-    # try HowManySyllables.com.
-    if (resp == ""):
-        resp = scrape("https://www.howmanysyllables.com/words/"+word)
-    
-    # If the response contains a certain paragraph, parse the number of
-    # syllables. If not all has failed, so return -1 for the syllable count
+# Method: ParseHowManySyllables
+# Purpose: Read a syllable count from a HowManySyllables.com page.
+# Parameters:
+# - resp: The page (String)
+# Return: Syllable count, or None if the page has none (Integer)
+def ParseHowManySyllables(resp):
     if ('<p id="SyllableContentContainer">' in resp and '<span class="Answer_Red">' in resp.split('<p id="SyllableContentContainer">',1)[1]):
         resp = resp.split('<p id="SyllableContentContainer">',1)[1].split('<span class="Answer_Red">',1)[1].split('</span>',1)[0]
-        print(word,",",resp.count("-")+1)
         return resp.count("-")+1
-    else:
-        print(word,",",-1)
-        return -1
-    
-    # Cleanup
-    del s
+    return None
+
+# Where to look up a word's syllables, in order: a URL template, and how to
+# read the count from the page.
+sources = [("https://google.com/search?q=define%20{word}", ParseGoogle),
+           ("https://www.howmanysyllables.com/words/{word}", ParseHowManySyllables)]
+
+# Pages fetched by any earlier run, so a crashed or repeated run, or a change
+# to a parser, reads them from disk instead of fetching them again. None to
+# always fetch.
+response_cache = None
+
+# Method: DownloadSyllable
+# Purpose: Capture syllables for single word
+# Parameters:
+# - word: Target word (String)
+def DownloadSyllable(word):
+    # Create a new instance of the Scraper class. This is necessary since these
+    # queries will be split up among multiple processors with dissimilar memory
+    s = Scraper(cache=response_cache)
+
+    # Try each source in turn. If all fail, return -1 for the syllable count.
+    for template, parse in sources:
+        sylls = parse(s.scrape(template.format(word=word)))
+        if (sylls != None):
+            print(word,",",sylls)
+            return sylls
+    print(word,",",-1)
+    return -1
+
+# Method: BuildSyllableDictionaryAsync
+# Purpose: Enrich a wordlist with syllables from dictionaries, looking up many
+#          words at once. All state lives in a SyllableStore, which commits
+#          results in batches as they arrive, so an interrupted run resumes
+#          by looking up only the words the store is still missing.
+# Parameters:
+# - store: The syllable store, with its wordlist loaded (SyllableStore)
+# - crawler: Looks up the words; its sources and limits apply (Crawler)
+# - report: Seconds between progress reports; 0 for none (Float)
+def BuildSyllableDictionaryAsync(store, crawler, report=2.0):
+    try:
+        asyncio.run(crawler.crawl(store.missing(), store.record, report))
+    finally:
+        store.flush()
 
 # Method: RecoverFromError
 # Purpose: Append contents of partial temp files to syllable dictionaries.
@@ -453,6 +485,7 @@ if (__name__ == "__main__"):
     # a few times, the sub-wordlists were missing a "b", "c", and "w" that the
     # Recover function did not write to the syllable dictionary, because it saw
     # them already there. A quick fix and voila, a syllable-enriched wordlist.
+    # (Now wordlist_diff.py finds every difference like these in one pass.)
 
     # Failing to find a syllable count from a dictionary, the default was -1.
     # Let's see how many got assigned that value.
@@ -471,4 +504,56 @@ if (__name__ == "__main__"):
     # is a traditional Japanese jacket. "Pharyngotonsillitis" is a medical
     # condition. Are these words? Yes. Am I concerned about testing my syllable
     # counter against them? No. Whether it counts seven syllables in
-    # pharyngotonsillitis or not, I will sleep just fine at night.
\ No newline at end of file
+    # pharyngotonsillitis or not, I will sleep just fine at night.
+
+    # Twice, now, a full run has taken days. Most of that time is spent
+    # waiting on the network, one request per process at a time, and the
+    # letter files are so uneven that a few processes finish hours before the
+    # rest. So look words up many at a time with asyncio, and let each host
+    # set its own pace: a cap on open requests and on requests per second,
+    # and patient retries when it asks us to slow down.
+
+    # And no more interim files to patch back together after a crash: the
+    # whole build lives in one SQLite store. Resuming is a query for the
+    # words still missing, and the checks above are queries too.
+    parser = argparse.ArgumentParser(description="Build a syllable dictionary by looking up each word of a wordlist online.")
+    parser.add_argument("wordlist", nargs="?", default="/usr/share/dict/words", help="wordlist, one word per line (default: %(default)s)")
+    parser.add_argument("-s", "--store", default="./syllables.db", help="SQLite store holding the build, created or resumed (default: %(default)s)")
+    parser.add_argument("-o", "--output", default="./webS", help="syllable dictionary to write once every word is counted (default: %(default)s)")
+    parser.add_argument("--import", dest="imports", metavar="FILE", action="append", default=[], help="take counts from an existing dictionary like webS first; repeatable")
+    parser.add_argument("--check", action="store_true", help="report how complete the store is, without looking anything up")
+    parser.add_argument("-c", "--concurrency", type=int, default=32, help="words looked up at once (default: %(default)s)")
+    parser.add_argument("--per-host", type=int, default=8, help="requests open to any one host at once (default: %(default)s)")
+    parser.add_argument("--rate", type=float, default=10.0, help="requests per second, per host; 0 for no limit (default: %(default)s)")
+    parser.add_argument("--retries", type=int, default=4, help="retries of a failed request (default: %(default)s)")
+    parser.add_argument("--backoff", type=float, default=1.0, help="seconds before the first retry, doubling with each (default: %(default)s)")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds to allow each request (default: %(default)s)")
+    parser.add_argument("--cache", metavar="DIR", help="keep fetched pages in DIR, and read them from there on later runs")
+    parser.add_argument("--cache-ttl", type=float, metavar="DAYS", help="refetch cached pages older than this")
+    parser.add_argument("--cache-size", type=float, metavar="MB", help="evict the oldest cached pages past this size")
+    args = parser.parse_args()
+
+    if (args.cache != None):
+        response_cache = ResponseCache(args.cache,
+                                       args.cache_ttl*86400 if args.cache_ttl != None else None,
+                                       int(args.cache_size*1024*1024) if args.cache_size != None else None)
+        response_cache.prune()
+    if (not isfile(args.wordlist)):
+        print("Wordlist", args.wordlist, "does not exist.", file=sys.stderr)
+        sys.exit(1)
+
+    # Load the wordlist once, so imports fill its rows and the check counts
+    # them, even in a fresh store.
+    store = SyllableStore(args.store)
+    store.load_wordlist(args.wordlist)
+    for path in args.imports:
+        print(store.import_dictionary(path), "counts imported from", path)
+    if (not args.check):
+        crawler = Crawler(sources, args.concurrency, args.per_host, args.rate, args.retries, args.backoff, args.timeout, response_cache)
+        BuildSyllableDictionaryAsync(store, crawler)
+
+    rows, counted, missing, none = store.check()
+    print("%d words, %d counted, %d missing, %d with no count found (%d of them not proper nouns)." % (rows, counted, missing, none, len(store.no_syllables(False))))
+    if (missing == 0 and not args.check):
+        store.export(args.output)
+    store.close()
@@ -0,0 +1,355 @@
+#!/usr/local/bin/python3
+
+# Imports
+import asyncio # Concurrent requests
+import ssl # HTTPS
+import sys # Progress output
+from gzip import decompress # For gzip compressed webpages
+from random import choice, uniform # User agents, backoff jitter
+from time import monotonic # Rate limits, progress
+from urllib.parse import quote, urljoin, urlsplit # Building and following URLs
+from scraper import Scraper # User agents
+
+# Status codes worth retrying: rate limited, or the server is struggling.
+retry_statuses = frozenset([429, 500, 502, 503, 504])
+
+# Class: FetchError
+# Purpose: Signal a request that failed in a way worth retrying.
+class FetchError(Exception):
+    # Method: __init__
+    # Purpose: Record the failure.
+    # Parameters:
+    # - message: What went wrong. (String)
+    # - retry_after: Seconds the server asked to wait, if it did. (Float)
+    def __init__(self, message, retry_after=None):
+        Exception.__init__(self, message)
+        self.retry_after = retry_after
+
+# Class: HostLimit
+# Purpose: Bound the requests open to one host at once, and space the start
+#          of each request at least 1/rate seconds after the last.
+class HostLimit:
+    # Method: __init__
+    # Purpose: Set the limits.
+    # Parameters:
+    # - concurrency: Requests open at once. (Integer)
+    # - rate: Requests started per second; 0 for no limit. (Float)
+    def __init__(self, concurrency, rate):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.interval = 1.0/rate if rate > 0 else 0.0
+        self.next = 0.0
+
+    # Method: __aenter__
+    # Purpose: Wait for an open slot, then for the next start time.
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        now = monotonic()
+        wait = self.next - now
+        self.next = max(now, self.next) + self.interval
+        if (wait > 0):
+            await asyncio.sleep(wait)
+
+    # Method: __aexit__
+    # Purpose: Free the slot.
+    async def __aexit__(self, *exc):
+        self.semaphore.release()
+
+# Class: ConnectionPool
+# Purpose: Keep open connections to each host between requests, so a crawl
+#          pays for a TCP and TLS handshake once per connection, not once per
+#          word. A connection is kept only after a response read to its end,
+#          and only as many are kept per host as may be open to it at once.
+class ConnectionPool:
+    # Method: __init__
+    # Purpose: Create an empty pool.
+    # Parameters:
+    # - per_host: Idle connections to keep to any one host. (Integer)
+    # - context: TLS context for HTTPS connections, or None to create one
+    #            on the first. (SSLContext)
+    def __init__(self, per_host=8, context=None):
+        self.per_host = per_host
+        self.context = context
+        self.idle = {} # (host, port, secure) -> [(reader, writer)]
+
+    # Method: connect
+    # Purpose: Take an idle connection to a host, or open a new one.
+    # Parameters:
+    # - key: Host, port, and whether to use TLS. (Tuple)
+    # - timeout: Seconds to allow for connecting. (Float)
+    # Return: Reader, writer, and whether the connection was reused. (Tuple)
+    async def connect(self, key, timeout):
+        idle = self.idle.get(key)
+        while (idle):
+            reader, writer = idle.pop()
+            # Skip connections the server has closed while they sat idle.
+            if (not reader.at_eof() and not writer.is_closing()):
+                return reader, writer, True
+            writer.close()
+        host, port, secure = key
+        if (secure and self.context == None):
+            self.context = ssl.create_default_context()
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port, ssl=self.context if secure else None), timeout)
+        return reader, writer, False
+
+    # Method: release
+    # Purpose: Return a connection for the next request to its host, or close
+    #          it if the pool for that host is full.
+    # Parameters:
+    # - key: Host, port, and whether to use TLS. (Tuple)
+    # - reader: The connection's reader. (StreamReader)
+    # - writer: The connection's writer. (StreamWriter)
+    def release(self, key, reader, writer):
+        idle = self.idle.setdefault(key, [])
+        if (len(idle) < self.per_host and not writer.is_closing()):
+            idle.append((reader, writer))
+        else:
+            writer.close()
+
+    # Method: close
+    # Purpose: Close every idle connection.
+    def close(self):
+        for idle in self.idle.values():
+            for reader, writer in idle:
+                writer.close()
+        self.idle = {}
+
+# Method: fetch
+# Purpose: GET a URL over HTTP/1.1, following redirects and decoding gzip.
+# Parameters:
+# - url: Target URL. (String)
+# - timeout: Seconds to allow for the whole request. (Float)
+# - redirects: Redirects left to follow. (Integer)
+# - pool: Connections to reuse, and to keep this one in; None to open a
+#         connection for this request alone. (ConnectionPool)
+# Return: Status code and decoded body. (Tuple)
+async def fetch(url, timeout=10.0, redirects=5, pool=None):
+    parts = urlsplit(url)
+    secure = parts.scheme == "https"
+    key = (parts.hostname, parts.port or (443 if secure else 80), secure)
+    path = (parts.path or "/") + ("?"+parts.query if parts.query else "")
+    request = (f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nUser-Agent: {choice(Scraper.user_agent_list)}\r\n"
+               f"Accept-Encoding: gzip\r\nConnection: {'keep-alive' if pool != None else 'close'}\r\n\r\n").encode("latin-1")
+    connections = pool if pool != None else ConnectionPool(0)
+
+    while (True):
+        try:
+            reader, writer, reused = await connections.connect(key, timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            raise FetchError(f"{url}: {type(e).__name__}: {e}")
+        try:
+            writer.write(request)
+            head, body, complete = await asyncio.wait_for(read_response(reader), timeout)
+            break
+        except (OSError, EOFError, ValueError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            writer.close()
+            # A reused connection may have been closed by the server just as
+            # the request went out; try again on another.
+            if (not reused or isinstance(e, asyncio.TimeoutError)):
+                raise FetchError(f"{url}: {type(e).__name__}: {e}")
+
+    status, headers = head
+    if (complete and headers.get("connection", "").lower() != "close"):
+        connections.release(key, reader, writer)
+    else:
+        writer.close()
+
+    if (status in [301, 302, 303, 307, 308] and "location" in headers and redirects > 0):
+        return await fetch(urljoin(url, headers["location"]), timeout, redirects-1, pool)
+    if (status in retry_statuses):
+        retry_after = headers.get("retry-after", "")
+        raise FetchError(f"{url}: HTTP {status}", float(retry_after) if retry_after.isdigit() else None)
+
+    if (headers.get("content-encoding") == "gzip"):
+        body = decompress(body)
+    return status, body.decode("utf-8", "replace")
+
+# Method: read_response
+# Purpose: Read an HTTP/1.1 response's status, headers, and body.
+# Parameters:
+# - reader: The connection. (StreamReader)
+# Return: (status code, lowercase headers), the raw body, and whether the
+#         body's end was marked, leaving the connection fit for another
+#         request. (Tuple)
+async def read_response(reader):
+    lines = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ", 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        if (":" in line):
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+
+    if (status < 200 or status in [204, 304]):
+        return (status, headers), b"", True
+    if (headers.get("transfer-encoding", "").lower() == "chunked"):
+        chunks = []
+        while (True):
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            if (size == 0):
+                await reader.readuntil(b"\r\n")
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        body = b"".join(chunks)
+    elif ("content-length" in headers):
+        body = await reader.readexactly(int(headers["content-length"]))
+    else:
+        return (status, headers), await reader.read(), False
+    return (status, headers), body, True
+
+# Class: Crawler
+# Purpose: Look up the syllable count of every word in a wordlist, with many
+#          requests in flight at once. Words, not letter files, are the unit
+#          of work, so no worker idles while another works through a long
+#          letter. Each host gets its own concurrency and rate limit.
+class Crawler:
+    # Method: __init__
+    # Purpose: Configure the sources and limits.
+    # Parameters:
+    # - sources: (URL template with {word}, parse function) pairs, tried in
+    #            order. A parse function returns the syllable count in a page,
+    #            or None. (List)
+    # - concurrency: Words looked up at once. (Integer)
+    # - per_host: Requests open to any one host at once. (Integer)
+    # - rate: Requests started per second, per host; 0 for no limit. (Float)
+    # - retries: Attempts per request after the first. (Integer)
+    # - backoff: Seconds before the first retry, doubling with each. (Float)
+    # - timeout: Seconds to allow each request. (Float)
+    # - cache: Where to look for pages before fetching them, and to keep the
+    #          pages fetched, or None. (ResponseCache)
+    def __init__(self, sources, concurrency=32, per_host=8, rate=10.0, retries=4, backoff=1.0, timeout=10.0, cache=None):
+        self.sources = sources
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.rate = rate
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache = cache
+        self.limits = {}
+
+        # One TLS context for every connection of every crawl; loading the
+        # system's certificates costs more than a handshake.
+        self.ssl = ssl.create_default_context()
+        self.pool = None
+
+        # Running counters, for progress reports
+        self.done, self.total, self.requests, self.retried, self.failed = 0, 0, 0, 0, 0
+
+    # Method: request
+    # Purpose: Fetch a URL within its host's limits, retrying transient
+    #          failures with exponential backoff and jitter. Pages in the
+    #          cache are served from it, without counting against any limit.
+    #          The cache is read and written on a worker thread, so its file
+    #          I/O, and its first scan of the cache directory, do not stall
+    #          every other request on the event loop.
+    # Parameters:
+    # - url: Target URL. (String)
+    # Return: Status code and body, or None if every attempt failed. (Tuple)
+    async def request(self, url):
+        if (self.cache != None):
+            cached = await asyncio.to_thread(self.cache.get, url)
+            if (cached != None):
+                return cached[0], cached[2].decode("utf-8", "replace")
+
+        host = urlsplit(url).netloc
+        limit = self.limits.get(host)
+        if (limit == None):
+            limit = self.limits[host] = HostLimit(self.per_host, self.rate)
+
+        for attempt in range(self.retries+1):
+            try:
+                async with limit:
+                    self.requests += 1
+                    status, body = await fetch(url, self.timeout, pool=self.pool)
+                if (self.cache != None and status < 500):
+                    await asyncio.to_thread(self.cache.put, url, status, "text/html; charset=utf-8", body.encode("utf-8"))
+                return status, body
+            except FetchError as e:
+                if (attempt == self.retries):
+                    print(f"\n{e}; giving up.", file=sys.stderr)
+                    return None
+                self.retried += 1
+                delay = e.retry_after if e.retry_after != None else self.backoff * 2**attempt * uniform(0.5, 1.5)
+                await asyncio.sleep(delay)
+
+    # Method: lookup
+    # Purpose: Find a word's syllable count, trying each source in turn.
+    # Parameters:
+    # - word: The word. (String)
+    # Return: Syllable count, or -1 if no source has one, and the host of
+    #         the source it came from, or None. (Tuple)
+    async def lookup(self, word):
+        for template, parse in self.sources:
+            response = await self.request(template.format(word=quote(word)))
+            if (response == None):
+                self.failed += 1
+                continue
+            status, body = response
+            if (status < 400):
+                sylls = parse(body)
+                if (sylls != None):
+                    return sylls, urlsplit(template).hostname
+        return -1, None
+
+    # Method: worker
+    # Purpose: Look up words from the queue until it is empty. A word whose
+    #          lookup fails unexpectedly, as when a parser meets a page it
+    #          does not understand, is recorded as -1 and reported, and the
+    #          worker moves on.
+    # Parameters:
+    # - queue: Words to look up. (Queue)
+    # - found: Receives each word, its syllable count, and its source. (Function)
+    async def worker(self, queue, found):
+        while (True):
+            try:
+                word = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                sylls, source = await self.lookup(word)
+            except Exception as e:
+                print(f"\n{word}: {type(e).__name__}: {e}; recorded as -1.", file=sys.stderr)
+                self.failed += 1
+                sylls, source = -1, None
+            found(word, sylls, source)
+            self.done += 1
+
+    # Method: progress
+    # Purpose: Report progress and an estimated time to finish, every few
+    #          seconds, until cancelled.
+    # Parameters:
+    # - interval: Seconds between reports. (Float)
+    async def progress(self, interval=2.0):
+        start = monotonic()
+        while (True):
+            await asyncio.sleep(interval)
+            elapsed = monotonic()-start
+            rate = self.done/elapsed
+            eta = (self.total-self.done)/rate if rate > 0 else float("inf")
+            print(f"\r{self.done}/{self.total} words, {rate:.1f} words/s, ETA {eta/60:.1f} min; {self.requests} requests, {self.retried} retries, {self.failed} failures   ", end="", file=sys.stderr, flush=True)
+
+    # Method: crawl
+    # Purpose: Look up every word.
+    # Parameters:
+    # - words: Words to look up. (Iterable)
+    # - found: Called with each word, its syllable count, and the host of
+    #          its source as it is found, in no particular order. (Function)
+    # - report: Seconds between progress reports; 0 for none. (Float)
+    async def crawl(self, words, found, report=2.0):
+        queue = asyncio.Queue()
+        for word in words:
+            queue.put_nowait(word)
+        self.total += queue.qsize()
+
+        # Connections belong to this crawl's event loop, so each crawl keeps
+        # its own pool.
+        self.pool = ConnectionPool(self.per_host, self.ssl)
+        reporter = asyncio.create_task(self.progress(report)) if report > 0 else None
+        try:
+            await asyncio.gather(*[self.worker(queue, found) for i in range(self.concurrency)])
+        finally:
+            self.pool.close()
+            if (reporter != None):
+                reporter.cancel()
+                print(file=sys.stderr)
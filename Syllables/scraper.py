@@ -1,9 +1,191 @@
-from urllib import request as r # Getting URLs
+from http.client import HTTPConnection, HTTPSConnection, RemoteDisconnected # Getting URLs
+from email.message import Message # Headers of cached pages
+from hashlib import sha256 # Cache keys
+from heapq import heapify, heappop, heappush # Cache eviction order
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit # Following redirects, cache keys
 from urllib.request import urlretrieve # Getting resources
 from random import choice # Randomize user agent so scraper isn't blocked
-from gzip import GzipFile # For gzip compressed webpages
+import json # Cache entries
+import os # Cache files
+import threading # Connections per thread
+import time # Cache timestamps
+import zlib # For compressed webpages
 import re
 
+# Method: NormalizeURL
+# Purpose: Reduce a URL to a canonical form, so that URLs naming the same page
+#          share a cache entry: lowercase scheme and host, no default port,
+#          sorted query parameters, and no fragment.
+# Parameters:
+# - url: The URL (String)
+# Return: The normalized URL (String)
+def NormalizeURL(url):
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or "").lower()
+    if (parts.port != None and parts.port != {"http": 80, "https": 443}.get(scheme)):
+        netloc += ":%d" % parts.port
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, parts.path or "/", query, ""))
+
+# Class: ResponseCache
+# Purpose: Keep fetched pages on disk, so a re-run, or a parser looking for
+#          something new, reads them locally instead of fetching them again.
+#          Each page is stored zlib-compressed in a file named for the SHA-256
+#          of its normalized URL, after a line of JSON recording the URL,
+#          status, content type, and when it was fetched. Writes are atomic,
+#          so any number of threads and processes may share a directory.
+class ResponseCache:
+    # Method: __init__
+    # Purpose: Open the cache.
+    # Parameters:
+    # - directory: Where to keep the pages; created if need be (String)
+    # - ttl: Seconds a page stays fresh, or None to keep it forever (Float)
+    # - max_bytes: Size to hold the cache under by evicting the oldest pages,
+    #              or None for no limit (Integer)
+    def __init__(self, directory, ttl=None, max_bytes=None):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.index = None # Path -> (fetched, size), read on first need
+        self.ages = [] # Heap of (fetched, path), oldest first; may hold replaced entries
+        self.total = 0
+        self.hits, self.misses = 0, 0
+        os.makedirs(directory, exist_ok=True)
+
+    # Method: path
+    # Purpose: Find the file for a URL.
+    # Parameters:
+    # - url: The URL (String)
+    # Return: File path (String)
+    def path(self, url):
+        key = sha256(NormalizeURL(url).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key[:2], key)
+
+    # Method: get
+    # Purpose: Read a fresh page from the cache.
+    # Parameters:
+    # - url: The URL (String)
+    # Return: Status code, content type, and body, or None if the page is
+    #         missing or stale (Tuple)
+    def get(self, url):
+        path = self.path(url)
+        try:
+            f = open(path, "rb")
+            raw = f.read()
+            f.close()
+            head, body = raw.split(b"\n", 1)
+            meta = json.loads(head)
+            if (self.ttl != None and time.time()-meta["fetched"] > self.ttl):
+                with self.lock:
+                    self.discard(path)
+                    if (self.index != None):
+                        self.total -= self.index.pop(path, (0, 0))[1]
+                self.misses += 1
+                return None
+            body = zlib.decompress(body)
+        except (OSError, ValueError, KeyError, zlib.error):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return meta["status"], meta["type"], body
+
+    # Method: put
+    # Purpose: Store a page, then evict the oldest pages if the cache has
+    #          grown past its size limit.
+    # Parameters:
+    # - url: The URL (String)
+    # - status: Status code (Integer)
+    # - content_type: Content-Type header, or "" (String)
+    # - body: The page, uncompressed (Bytes)
+    def put(self, url, status, content_type, body):
+        path = self.path(url)
+        fetched = time.time()
+        head = json.dumps({"url": NormalizeURL(url), "status": status, "type": content_type, "fetched": fetched})
+        data = head.encode("utf-8") + b"\n" + zlib.compress(body)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = "%s.%d.%d.tmp" % (path, os.getpid(), threading.get_ident())
+        f = open(temp, "wb")
+        f.write(data)
+        f.close()
+        os.replace(temp, path)
+
+        if (self.max_bytes != None):
+            with self.lock:
+                self.load()
+                self.total -= self.index.get(path, (0, 0))[1]
+                self.index[path] = (fetched, len(data))
+                heappush(self.ages, (fetched, path))
+                self.total += len(data)
+                if (self.total > self.max_bytes):
+                    self.evict()
+
+    # Method: load
+    # Purpose: Read the size and age of every page on disk, once.
+    def load(self):
+        if (self.index != None):
+            return
+        self.index = {}
+        for sub in os.scandir(self.directory):
+            if (not sub.is_dir()):
+                continue
+            for entry in os.scandir(sub.path):
+                if (not entry.name.endswith(".tmp")):
+                    stat = entry.stat()
+                    self.index[entry.path] = (stat.st_mtime, stat.st_size)
+        self.total = sum(x[1] for x in self.index.values())
+        self.ages = [(fetched, path) for path, (fetched, size) in self.index.items()]
+        heapify(self.ages)
+
+    # Method: evict
+    # Purpose: Remove the oldest pages until the cache is back under its size
+    #          limit, popping them from the age heap, so each eviction costs
+    #          a heap pop rather than a sort of the whole index. Heap entries
+    #          for pages since rewritten or removed are skipped, and cleared
+    #          out once they outnumber the pages. Call with the lock held.
+    def evict(self):
+        ages = self.ages
+        while (self.total > self.max_bytes and ages):
+            fetched, path = heappop(ages)
+            entry = self.index.get(path)
+            if (entry == None or entry[0] != fetched):
+                continue
+            self.discard(path)
+            del self.index[path]
+            self.total -= entry[1]
+        if (len(ages) > 2*len(self.index)):
+            self.ages = [(fetched, path) for path, (fetched, size) in self.index.items()]
+            heapify(self.ages)
+
+    # Method: discard
+    # Purpose: Remove a page's file, if it is still there.
+    # Parameters:
+    # - path: File path (String)
+    def discard(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    # Method: prune
+    # Purpose: Remove every stale page, then the oldest pages past the size
+    #          limit.
+    def prune(self):
+        with self.lock:
+            self.index = None
+            self.load()
+            if (self.ttl != None):
+                cutoff = time.time()-self.ttl
+                for path, (fetched, size) in list(self.index.items()):
+                    if (fetched < cutoff):
+                        self.discard(path)
+                        del self.index[path]
+                        self.total -= size
+            if (self.max_bytes != None):
+                self.evict()
+
 class Scraper:
     # Pool of user agents, for randomizing user agent string
     user_agent_list = [
@@ -33,7 +215,88 @@ class Scraper:
         'Mozilla/5.0 (compatible; MSIE 10.0; Windows NT 6.1; Trident/6.0)',
         'Mozilla/4.0 (compatible; MSIE 8.0; Windows NT 5.1; Trident/4.0; .NET CLR 2.0.50727; .NET CLR 3.0.4506.2152; .NET CLR 3.5.30729)']
 
-    h = ""
+    # Method: __init__
+    # Purpose: Create a scraper. Each thread that uses it keeps its own open
+    #          connection to each host it has visited, reused for every later
+    #          request to that host, so it pays for a TCP and TLS handshake
+    #          once, not once per page.
+    # Parameters:
+    # - timeout: Seconds to wait on a connection before giving up (Float)
+    # - cache: Where to look for pages before fetching them, and to keep the
+    #          pages fetched, or None (ResponseCache)
+    def __init__(self, timeout=10.0, cache=None):
+        self.timeout = timeout
+        self.cache = cache
+        self.local = threading.local()
+
+    # Method: connection
+    # Purpose: Get this thread's connection to a host, opening it if need be.
+    # Parameters:
+    # - scheme: "http" or "https" (String)
+    # - netloc: Host, and port if any (String)
+    # Return: The connection (HTTPConnection)
+    def connection(self, scheme, netloc):
+        pool = getattr(self.local, "pool", None)
+        if (pool == None):
+            pool = self.local.pool = {}
+        conn = pool.get((scheme, netloc))
+        if (conn == None):
+            if (scheme == "https"):
+                conn = HTTPSConnection(netloc, timeout=self.timeout)
+            else:
+                conn = HTTPConnection(netloc, timeout=self.timeout)
+            pool[(scheme, netloc)] = conn
+        return conn
+
+    # Method: close
+    # Purpose: Close this thread's connections.
+    def close(self):
+        for conn in getattr(self.local, "pool", {}).values():
+            conn.close()
+        self.local.pool = {}
+
+    # Method: fetch
+    # Purpose: GET a URL on a pooled connection, following redirects. A
+    #          connection the server has closed since its last use is reopened
+    #          and the request sent again, once.
+    # Parameters:
+    # - url: Target URL (String)
+    # - redirects: Redirects left to follow (Integer)
+    # Return: Status code, headers, and body, decompressed (Tuple)
+    def fetch(self, url, redirects=5):
+        parts = urlsplit(url)
+        path = (parts.path or "/") + ("?"+parts.query if parts.query else "")
+        # Make the request with a random user agent string
+        self.local.h = choice(self.user_agent_list)
+        headers = {'User-Agent': self.local.h, 'Accept-Encoding': 'gzip, deflate'}
+
+        for attempt in range(2):
+            conn = self.connection(parts.scheme, parts.netloc)
+            try:
+                conn.request("GET", path, headers=headers)
+                res = conn.getresponse()
+                body = res.read()
+                break
+            except (RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                conn.close()
+                if (attempt == 1):
+                    raise
+            except:
+                conn.close()
+                raise
+        if (res.will_close):
+            conn.close()
+
+        if (res.status in [301, 302, 303, 307, 308] and res.getheader("location") != None and redirects > 0):
+            return self.fetch(urljoin(url, res.getheader("location")), redirects-1)
+
+        # Decompress the body in one pass, if it is compressed
+        encoding = res.getheader("content-encoding", "")
+        if (encoding == "gzip"):
+            body = zlib.decompress(body, 16+zlib.MAX_WBITS)
+        elif (encoding == "deflate"):
+            body = zlib.decompress(body)
+        return res.status, res.headers, body
 
     # Method: scrape
     # Purpose: Get content at target URL.
@@ -41,38 +304,35 @@ class Scraper:
     # - url: Target URL (String)
     # Return: HTML content at target URL (String)
     def scrape(self, url):
-        global h
-        # Make the request with a random user agent string
-        h = choice(self.user_agent_list)
-        req = r.Request(url, headers = {'User-Agent': h})
-        # Get the response
-        res = r.urlopen(req)
-
-        # Cleanup
-        del req
+        # Serve the page from the cache if it is there. If not, fetch it and
+        # keep it, unless the server failed or asked us to slow down.
+        cached = self.cache.get(url) if self.cache != None else None
+        if (cached != None):
+            status, content_type, res = cached
+            headers = Message()
+            headers["Content-Type"] = content_type
+        else:
+            status, headers, res = self.fetch(url)
+            if (self.cache != None and status < 500 and status != 429):
+                self.cache.put(url, status, headers.get("content-type", ""), res)
 
         # Check for an error (HTTP status code >= 400)
-        if (int(res.getcode()) >= 400):
-            return "%s : Error encountered, : %s" % (url, res.getcode())
-
-        if (("content-encoding" in res.info().keys()) and (res.info()["content-encoding"] == "gzip")):
-            buf = res.read()
-            f = GzipFile(fileobj=buf)
-            res = f.read()
-        else:
-            res = res.read()
+        if (status >= 400):
+            return "%s : Error encountered, : %s" % (url, status)
 
-        # Try to decode the page with utf-8 and then ascii
+        # Try to decode the page with its declared charset, then utf-8
         try:
-            return res.decode('utf-8')
-            return res.decode('ascii')
+            return res.decode(headers.get_content_charset() or 'utf-8')
         # Notify the user on error
-        except:
+        except (UnicodeDecodeError, LookupError):
             print("%s : Encountered encoding error." % (url))
             return "%s : Encountered encoding error." % (url)
 
+    # Method: getHeaders
+    # Purpose: Get the user agent string of this thread's last request.
+    # Return: The user agent string (String)
     def getHeaders(self):
-        return h
+        return getattr(self.local, "h", "")
 
     def makeLocal(self, __raw):
         regex = r"([\w-]+)=(\"|')([^\"']*)\2"
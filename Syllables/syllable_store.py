@@ -0,0 +1,147 @@
+#!/usr/local/bin/python3
+
+# Imports
+import sqlite3 # The store
+import time # Fetch times
+
+# One row per wordlist line, so a dictionary exported from the store lines up
+# with its wordlist, as webS does. Words are stored lowercased, as looked up;
+# "proper" records whether the wordlist capitalized the word. A word with no
+# syllables yet has a null count; -1 means no source had one.
+schema = """
+CREATE TABLE IF NOT EXISTS words (
+    line INTEGER PRIMARY KEY,
+    word TEXT NOT NULL,
+    proper INTEGER NOT NULL,
+    syllables INTEGER,
+    source TEXT,
+    fetched REAL
+);
+CREATE INDEX IF NOT EXISTS words_word ON words (word);
+CREATE INDEX IF NOT EXISTS words_missing ON words (word) WHERE syllables IS NULL;
+CREATE INDEX IF NOT EXISTS words_syllables ON words (syllables);
+"""
+
+# Class: SyllableStore
+# Purpose: Keep the whole state of a dictionary build in one SQLite file: the
+#          wordlist, and each word's syllables, where they came from, and when.
+#          Results are committed in batches, so a crash loses at most one
+#          batch, and resuming is a query for the words still missing.
+class SyllableStore:
+    # Method: __init__
+    # Purpose: Open or create a store.
+    # Parameters:
+    # - path: The database file. (String)
+    # - batch: Results to hold before committing them together. (Integer)
+    def __init__(self, path, batch=500):
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(schema)
+        self.batch = batch
+        self.pending = []
+
+    # Method: load_wordlist
+    # Purpose: Add a wordlist's words, one row per line. Lines already in the
+    #          store are kept, with their syllables.
+    # Parameters:
+    # - path: The wordlist, one word per line. (String)
+    # Return: Number of rows added. (Integer)
+    def load_wordlist(self, path):
+        s_fd = open(path, "r")
+        rows = ((i, x.lower(), x[0].isupper()) for i, x in enumerate(x.strip() for x in s_fd) if x)
+        before = self.db.total_changes
+        with self.db:
+            self.db.executemany("INSERT OR IGNORE INTO words (line, word, proper) VALUES (?, ?, ?)", rows)
+        s_fd.close()
+        return self.db.total_changes-before
+
+    # Method: import_dictionary
+    # Purpose: Take syllables from a dictionary file of "word,count" lines,
+    #          like webS or syllable_{letter}.txt, for words not yet counted.
+    # Parameters:
+    # - path: The dictionary. (String)
+    # - source: Source to record for the imported counts. (String)
+    # Return: Number of rows filled. (Integer)
+    def import_dictionary(self, path, source="import"):
+        counts = {}
+        s_fd = open(path, "r")
+        for line in s_fd:
+            line = line.rsplit(",", 1)
+            if (len(line) == 2 and line[1].strip().lstrip("-").isdigit()):
+                counts.setdefault(line[0].strip().lower(), int(line[1]))
+        s_fd.close()
+
+        before = self.db.total_changes
+        with self.db:
+            self.db.executemany("UPDATE words SET syllables = ?, source = ? WHERE word = ? AND syllables IS NULL",
+                                ((count, source, word) for word, count in counts.items()))
+        return self.db.total_changes-before
+
+    # Method: missing
+    # Purpose: Find the words not yet counted, each once, in wordlist order.
+    # Return: The words. (List)
+    def missing(self):
+        return [x[0] for x in self.db.execute("SELECT word FROM words WHERE syllables IS NULL GROUP BY word ORDER BY MIN(line)")]
+
+    # Method: record
+    # Purpose: Record a word's syllables, committing once a batch has built up.
+    # Parameters:
+    # - word: The word, lowercase. (String)
+    # - syllables: Its syllable count, or -1 for none found. (Integer)
+    # - source: Where the count came from, or None. (String)
+    def record(self, word, syllables, source=None):
+        self.pending.append((syllables, source, time.time(), word))
+        if (len(self.pending) >= self.batch):
+            self.flush()
+
+    # Method: flush
+    # Purpose: Commit the results recorded since the last commit.
+    def flush(self):
+        if (self.pending):
+            with self.db:
+                self.db.executemany("UPDATE words SET syllables = ?, source = ?, fetched = ? WHERE word = ?", self.pending)
+            self.pending = []
+
+    # Method: check
+    # Purpose: Summarize how complete the store is.
+    # Return: Rows, rows counted, rows not yet counted, and rows no source
+    #         had a count for. (Tuple)
+    def check(self):
+        return self.db.execute("SELECT COUNT(*), COUNT(syllables), COUNT(*)-COUNT(syllables), "
+                               "COALESCE(SUM(syllables = -1), 0) FROM words").fetchone()
+
+    # Method: no_syllables
+    # Purpose: Find the words no source had a count for.
+    # Parameters:
+    # - proper: True or False for only proper nouns or only other words, or
+    #           None for both. (Boolean)
+    # Return: The words, in wordlist order. (List)
+    def no_syllables(self, proper=None):
+        if (proper == None):
+            rows = self.db.execute("SELECT word FROM words WHERE syllables = -1 ORDER BY line")
+        else:
+            rows = self.db.execute("SELECT word FROM words WHERE syllables = -1 AND proper = ? ORDER BY line", (proper,))
+        return [x[0] for x in rows]
+
+    # Method: export
+    # Purpose: Write the counted words as a dictionary of "word,count" lines,
+    #          in wordlist order, like webS.
+    # Parameters:
+    # - path: The dictionary to write. (String)
+    # Return: Number of lines written. (Integer)
+    def export(self, path):
+        self.flush()
+        d_fd = open(path, "w")
+        count = 0
+        for word, syllables in self.db.execute("SELECT word, syllables FROM words WHERE syllables IS NOT NULL ORDER BY line"):
+            d_fd.write(word+","+str(syllables)+'\n')
+            count += 1
+        d_fd.close()
+        return count
+
+    # Method: close
+    # Purpose: Commit any pending results and close the store.
+    def close(self):
+        self.flush()
+        self.db.close()
@@ -0,0 +1,251 @@
+#!/usr/local/bin/python3
+
+# Imports
+import argparse # Command-line options
+from multiprocessing import Pool # Diffing shards in parallel
+from os import listdir # Finding letter lists
+from os.path import getsize, join # File operations
+from string import ascii_lowercase # Shard boundaries
+
+# Method: ReadWords
+# Purpose: Stream the words of a wordlist, or of a dictionary of "word,count"
+#          lines, with their line numbers, from a byte range of the file.
+# Parameters:
+# - path: The file (String)
+# - start: Byte offset of the first line to read (Integer)
+# - end: Byte offset to stop before, or None for the end of the file (Integer)
+# - line: Number of lines before start (Integer)
+# Return: (line number, word) pairs, as a generator (Iterator)
+def ReadWords(path, start=0, end=None, line=0):
+    f = open(path, "rb")
+    f.seek(start)
+    remaining = (end if end != None else getsize(path)) - start
+    for raw in f:
+        remaining -= len(raw)
+        if (remaining < 0):
+            break
+        line += 1
+        word = raw.split(b",", 1)[0].strip()
+        if (word):
+            yield line, word.decode("utf-8")
+    f.close()
+
+# Method: Ordered
+# Purpose: Pass through the lines of a stream that are in order by lowercase
+#          word, setting aside each line out of place: one above both its
+#          neighbors, like "plies" before "pliers", or below the line before.
+# Parameters:
+# - pairs: (line number, word) pairs (Iterator)
+# - outliers: Receives the lines out of place (List)
+# Return: The lines in order, as a generator (Iterator)
+def Ordered(pairs, outliers):
+    last = ""
+    cur = next(pairs, None)
+    for nxt in pairs:
+        key, following = cur[1].lower(), nxt[1].lower()
+        if (key < last or (key > following and following >= last)):
+            outliers.append(cur)
+        else:
+            yield cur
+            last = key
+        cur = nxt
+    if (cur != None):
+        if (cur[1].lower() < last):
+            outliers.append(cur)
+        else:
+            yield cur
+
+# Method: DiffWords
+# Purpose: Merge-join a wordlist and a dictionary, in one pass. Both should
+#          be in order by lowercase word, as web2 and webS are. Equal words
+#          pair off in order, so a word listed twice ("A" then "a") needs two
+#          dictionary lines. Lines out of place are set aside and paired with
+#          each other at the end, so a stray line costs one difference, not a
+#          cascade, and memory grows only with the number of strays.
+# Parameters:
+# - wordlist: (line number, word) pairs from the wordlist (Iterator)
+# - dictionary: (line number, word) pairs from the dictionary (Iterator)
+# Return: Differences, as a generator of (kind, wordlist pair, dictionary
+#         pair) tuples, where kind is "-" for a word missing from the
+#         dictionary, "+" for a word not in the wordlist, and "~" for a word
+#         in both but written differently than the lowercase wordlist word
+#         (Iterator)
+def DiffWords(wordlist, dictionary):
+    w_strays, d_strays = [], []
+    wordlist = Ordered(wordlist, w_strays)
+    dictionary = Ordered(dictionary, d_strays)
+
+    a = next(wordlist, None)
+    b = next(dictionary, None)
+    while (a != None or b != None):
+        if (b == None or (a != None and a[1].lower() < b[1].lower())):
+            yield "-", a, None
+            a = next(wordlist, None)
+        elif (a == None or b[1].lower() < a[1].lower()):
+            yield "+", None, b
+            b = next(dictionary, None)
+        else:
+            if (b[1] != a[1].lower()):
+                yield "~", a, b
+            a = next(wordlist, None)
+            b = next(dictionary, None)
+
+    # Pair the lines set aside on each side by word
+    unmatched = {}
+    for b in d_strays:
+        unmatched.setdefault(b[1].lower(), []).append(b)
+    for a in w_strays:
+        matches = unmatched.get(a[1].lower())
+        if (matches):
+            b = matches.pop(0)
+            if (b[1] != a[1].lower()):
+                yield "~", a, b
+        else:
+            yield "-", a, None
+    for matches in unmatched.values():
+        for b in matches:
+            yield "+", None, b
+
+# Method: FindLetter
+# Purpose: Binary search a sorted file for the first line at or after a
+#          letter, by its first byte, lowercased.
+# Parameters:
+# - f: The file, opened in binary (File)
+# - size: Size of the file (Integer)
+# - letter: The letter (Bytes)
+# Return: Byte offset of the line (Integer)
+def FindLetter(f, size, letter):
+    # Move to the first line starting at or after an offset
+    def align(pos):
+        if (pos == 0):
+            return 0
+        f.seek(pos-1)
+        f.readline()
+        return f.tell()
+
+    lo, hi = 0, size
+    while (lo < hi):
+        mid = (lo+hi)//2
+        f.seek(align(mid))
+        first = f.readline()[:1].lower()
+        if (not first or first >= letter):
+            hi = mid
+        else:
+            lo = mid+1
+    return align(lo)
+
+# Method: CountLines
+# Purpose: Count the lines in a byte range of a file.
+# Parameters:
+# - path: The file (String)
+# - start: Offset of the range (Integer)
+# - end: Offset past the range (Integer)
+# Return: Number of lines (Integer)
+def CountLines(path, start, end):
+    f = open(path, "rb")
+    f.seek(start)
+    count = 0
+    while (start < end):
+        chunk = f.read(min(end-start, 1 << 20))
+        if (not chunk):
+            break
+        count += chunk.count(b"\n")
+        start += len(chunk)
+    f.close()
+    return count
+
+# Method: LetterShards
+# Purpose: Split a sorted file into one byte range per starting letter, with
+#          anything before "b" in the first and after "z" in the last.
+# Parameters:
+# - path: The file (String)
+# Return: (start, end, lines before start) for each letter (List)
+def LetterShards(path):
+    size = getsize(path)
+    f = open(path, "rb")
+    bounds = [0] + [FindLetter(f, size, x.encode()) for x in ascii_lowercase[1:]] + [size]
+    f.close()
+    shards = []
+    line = 0
+    for i in range(len(ascii_lowercase)):
+        shards.append((bounds[i], bounds[i+1], line))
+        line += CountLines(path, bounds[i], bounds[i+1])
+    return shards
+
+# Method: DiffShard
+# Purpose: Diff one pair of byte ranges. Takes a single tuple, for Pool.map.
+# Parameters:
+# - shard: Wordlist path, its (start, end, lines before) range, dictionary
+#          path, and its range (Tuple)
+# Return: The differences, as from DiffWords (List)
+def DiffShard(shard):
+    wordlist, (w_start, w_end, w_line), dictionary, (d_start, d_end, d_line) = shard
+    return list(DiffWords(ReadWords(wordlist, w_start, w_end, w_line), ReadWords(dictionary, d_start, d_end, d_line)))
+
+# Method: DiffFiles
+# Purpose: Diff a wordlist against a dictionary, like /usr/share/dict/words
+#          against webS, one shard per starting letter, in parallel.
+# Parameters:
+# - wordlist: File path for the wordlist (String)
+# - dictionary: File path for the dictionary (String)
+# - processes: Shards to diff at once; 1 to diff in this process (Integer)
+# Return: The differences, as from DiffWords, in order (List)
+def DiffFiles(wordlist, dictionary, processes=None):
+    shards = [(wordlist, w, dictionary, d) for w, d in zip(LetterShards(wordlist), LetterShards(dictionary))]
+    if (processes == 1):
+        results = map(DiffShard, shards)
+    else:
+        with Pool(processes) as pool:
+            results = pool.map(DiffShard, shards)
+    return [x for result in results for x in result]
+
+# Method: DiffLetterLists
+# Purpose: Diff each sub-wordlist {letter}.txt against its syllable
+#          dictionary syllable_{letter}.txt, in parallel.
+# Parameters:
+# - words: Directory of the sub-wordlists (String)
+# - syllables: Directory of the syllable dictionaries (String)
+# - processes: Pairs to diff at once; 1 to diff in this process (Integer)
+# Return: Letter file name and its differences, for each pair (List)
+def DiffLetterLists(words, syllables, processes=None):
+    files = sorted([x for x in listdir(words) if ".txt" in x and len(x) == 5])
+    shards = [(join(words, x), (0, None, 0), join(syllables, "syllable_"+x), (0, None, 0)) for x in files]
+    if (processes == 1):
+        results = list(map(DiffShard, shards))
+    else:
+        with Pool(processes) as pool:
+            results = pool.map(DiffShard, shards)
+    return list(zip(files, results))
+
+# Method: FormatDifference
+# Purpose: Describe a difference for the user.
+# Parameters:
+# - difference: A difference, as from DiffWords (Tuple)
+# Return: The description (String)
+def FormatDifference(difference):
+    kind, a, b = difference
+    if (kind == "-"):
+        return "- wordlist line %d, '%s', is missing from the dictionary." % a
+    elif (kind == "+"):
+        return "+ dictionary line %d, '%s', is not in the wordlist." % b
+    return "~ wordlist line %d, '%s', is written '%s' on dictionary line %d." % (a[0], a[1], b[1], b[0])
+
+if (__name__ == "__main__"):
+    parser = argparse.ArgumentParser(description="List every difference between a wordlist and its syllable dictionary.")
+    parser.add_argument("wordlist", nargs="?", default="/usr/share/dict/words", help="wordlist, or with --letters, directory of {letter}.txt (default: %(default)s)")
+    parser.add_argument("dictionary", nargs="?", default="./webS", help="syllable dictionary, or with --letters, directory of syllable_{letter}.txt (default: %(default)s)")
+    parser.add_argument("--letters", action="store_true", help="diff each {letter}.txt against its syllable_{letter}.txt")
+    parser.add_argument("-j", "--processes", type=int, default=None, help="shards to diff at once (default: one per CPU)")
+    args = parser.parse_args()
+
+    if (args.letters):
+        pairs = DiffLetterLists(args.wordlist, args.dictionary, args.processes)
+    else:
+        pairs = [(args.dictionary, DiffFiles(args.wordlist, args.dictionary, args.processes))]
+
+    count = 0
+    for name, differences in pairs:
+        for difference in differences:
+            print(name+":", FormatDifference(difference))
+        count += len(differences)
+    print(count, "differences found.")
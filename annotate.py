@@ -0,0 +1,130 @@
+#!/usr/bin/python3
+
+# Imports
+from re import compile as recompile
+from html import unescape
+
+# Match an HTML tag, or a character reference like "&amp;" or "&#8212;".
+markup_re = recompile(r"<[^>]*>|&(?:#[0-9]+|#[xX][0-9a-fA-F]+|[A-Za-z][A-Za-z0-9]*);")
+
+# Elements that never take a closing tag, and so never affect nesting.
+void_elements = frozenset(["area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"])
+
+# Method: strip_tags
+# Purpose: Extract the visible text of an HTML fragment, with a map back to the
+#          fragment for every character of that text.
+# Parameters:
+# - html: HTML fragment. (String)
+# Return: (text, starts, ends), where text[i] came from html[starts[i]:ends[i]].
+#         (Tuple)
+def strip_tags(html):
+    text, starts, ends = [], [], []
+    last = 0
+    for m in markup_re.finditer(html):
+        # Copy the text preceding the tag or reference as-is.
+        text.append(html[last:m.start()])
+        starts.extend(range(last, m.start()))
+        ends.extend(range(last+1, m.start()+1))
+        last = m.end()
+
+        # Tags contribute nothing to the text. Character references contribute
+        # their unescaped characters, each mapped to the whole reference.
+        if (m.group(0)[0] == "&"):
+            ch = unescape(m.group(0))
+            text.append(ch)
+            starts.extend([m.start()]*len(ch))
+            ends.extend([m.end()]*len(ch))
+    text.append(html[last:])
+    starts.extend(range(last, len(html)))
+    ends.extend(range(last+1, len(html)+1))
+
+    return "".join(text), starts, ends
+
+# Method: balanced
+# Purpose: Check that a run of HTML closes every element it opens, and closes
+#          none that it did not open, so it can safely be wrapped in a span.
+# Parameters:
+# - html: HTML fragment. (String)
+def balanced(html):
+    depth = 0
+    for m in markup_re.finditer(html):
+        tag = m.group(0)
+        if (tag[0] != "<" or tag[:4] == "<!--" or tag[-2:] == "/>"):
+            continue
+        if (tag[1:2] == "/"):
+            depth -= 1
+            if (depth < 0):
+                return False
+        elif (tag[1:].split(None, 1)[0].rstrip(">").lower() not in void_elements):
+            depth += 1
+    return depth == 0
+
+# Class: Annotations
+# Purpose: Collect findings as (start, end, category, payload) spans over the
+#          visible text of a line, resolve overlaps between them, and render
+#          them into the line's HTML in a single pass.
+class Annotations:
+    # Method: __init__
+    # Purpose: Set the markup for each category.
+    # Parameters:
+    # - markup: (category, opening tag, closing tag) tuples, in order of
+    #           priority. Closing tags may refer to the span's {payload}. (List)
+    def __init__(self, markup):
+        self.markup = {category:(opening, closing) for category,opening,closing in markup}
+        self.priority = {category:i for i,(category,opening,closing) in enumerate(markup)}
+        self.spans = []
+
+    # Method: add
+    # Purpose: Record a finding over text[start:end].
+    # Parameters:
+    # - start: Offset of the first character. (Integer)
+    # - end: Offset after the last character. (Integer)
+    # - category: Category of the finding, as named in the markup. (String)
+    # - payload: Category-specific details, for the markup. (String)
+    def add(self, start, end, category, payload=None):
+        self.spans.append((start, end, category, payload))
+
+    # Method: resolve
+    # Purpose: Reduce the findings to a sorted list of spans that do not
+    #          overlap. The leftmost, then longest, finding wins; findings over
+    #          the same text are decided by category priority.
+    # Return: (start, end, category, payload) tuples. (List)
+    def resolve(self):
+        priority = self.priority
+        self.spans.sort(key=lambda s: (s[0], -s[1], priority[s[2]]))
+
+        resolved = []
+        last_end = 0
+        for span in self.spans:
+            if (span[0] >= last_end):
+                resolved.append(span)
+                last_end = span[1]
+        return resolved
+
+    # Method: render
+    # Purpose: Emit the HTML for a line with every resolved finding marked up.
+    # Parameters:
+    # - html: HTML the findings' text was extracted from. (String)
+    # - starts: Per-character start offsets, from strip_tags. (List)
+    # - ends: Per-character end offsets, from strip_tags. (List)
+    # Return: HTML with findings marked up. (String)
+    def render(self, html, starts, ends):
+        out = []
+        last = 0
+        for start, end, category, payload in self.resolve():
+            hstart, hend = starts[start], ends[end-1]
+
+            # Never cut through an element, like a link that only covers part
+            # of a phrase, since the resulting markup would not nest.
+            if (not balanced(html[hstart:hend])):
+                continue
+
+            opening, closing = self.markup[category]
+            out.append(html[last:hstart])
+            out.append(opening.format(payload=payload))
+            out.append(html[hstart:hend])
+            out.append(closing.format(payload=payload))
+            last = hend
+        out.append(html[last:])
+
+        return "".join(out)
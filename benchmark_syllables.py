@@ -0,0 +1,229 @@
+#!/usr/local/bin/python3
+
+# Imports
+import sys # CLI arguments, module paths
+import argparse # CLI argument parsing
+import json # Results
+import platform # Environment details
+import tracemalloc # Memory measurements
+from collections import Counter # Corpus word frequencies
+from datetime import datetime # Timestamps
+from importlib import import_module # Loading implementations
+from os.path import abspath, dirname, join # File paths
+from random import Random # Reproducible samples
+from re import findall # Corpus tokenization
+from time import perf_counter, perf_counter_ns # Timing
+
+# Default locations of the word list and the frequency-weighting corpus. The
+# corpus is fixed prose kept for the benchmark alone, so that runs, and their
+# samples, stay comparable as the Readme and other documents change.
+base = dirname(abspath(__file__))
+default_wordlist = join(base, "Syllables", "webS")
+default_corpus = join(base, "assets", "benchmark_corpus.txt")
+
+# Store the implementations to benchmark: (name, module, function, batch),
+# where batch implementations take the whole sample in one call.
+implementations = [
+    ("Proofer.SyllableCount", "Proofer", "SyllableCount", False), # The baseline
+    ("Proofer2.syllables", "Proofer2", "syllables", False),
+    ("syllable_check.syllables", "syllable_check", "syllables", False),
+    ("syllable_check.count_syllables_batch", "syllable_check", "count_syllables_batch", True),
+    ("syllable.sylco", "syllable", "sylco", False),
+    ("syllable.MySyllableCount", "syllable", "MySyllableCount", False),
+    ("syllable.NewSyllableCount", "syllable", "NewSyllableCount", False),
+]
+
+# Method: load
+# Purpose: Import an implementation, if its module and dependencies import.
+# Parameters:
+# - module: Module name. (String)
+# - function: Function name. (String)
+# Return: The function, or the reason it could not be loaded. (Tuple)
+def load(module, function):
+    # Syllables/syllable.py imports its neighbor, scraper.py, by bare name.
+    if (join(base, "Syllables") not in sys.path):
+        sys.path.append(join(base, "Syllables"))
+    try:
+        return getattr(import_module(module), function), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+# Method: build_samples
+# Purpose: Draw the fixed word samples every implementation is measured on.
+# Parameters:
+# - wordlist: Path to the syllable dictionary to draw words from. (String)
+# - corpus: Path to prose, for the frequency-weighted sample. (String)
+# - size: Number of words per sample. (Integer)
+# - seed: Random seed, so runs draw the same words. (Integer)
+# Return: Sample name -> words. (Dictionary)
+def build_samples(wordlist, corpus, size, seed):
+    fd = open(wordlist, "r")
+    words = sorted(set(line.split(",")[0].strip().lower() for line in fd))
+    fd.close()
+    words = [w for w in words if w.isalpha()]
+
+    rng = Random(seed)
+    samples = {}
+
+    # Every word in the dictionary is equally likely.
+    samples["uniform"] = [rng.choice(words) for i in range(size)]
+
+    # Words are drawn in proportion to how often they appear in real prose,
+    # so common short words dominate, as they do when proofing.
+    fd = open(corpus, "r")
+    counts = Counter(w.lower() for w in findall(r"[A-Za-z]+", fd.read()))
+    fd.close()
+    vocabulary = sorted(counts)
+    samples["frequency"] = rng.choices(vocabulary, weights=[counts[w] for w in vocabulary], k=size)
+
+    # Long words exercise every rule, and are the words that decide whether
+    # a word counts as complex.
+    long_words = [w for w in words if len(w) >= 10]
+    samples["long"] = [rng.choice(long_words) for i in range(size)]
+
+    return samples
+
+# Method: percentile
+# Purpose: Return the pth percentile of sorted values, by nearest rank.
+# Parameters:
+# - values: Sorted values. (List)
+# - p: Percentile, from 0 to 100. (Float)
+def percentile(values, p):
+    return values[min(len(values)-1, int(len(values)*p/100))]
+
+# Method: measure
+# Purpose: Measure one implementation on one sample.
+# Parameters:
+# - count: Syllable counting function. (Function)
+# - words: Sample of words. (List)
+# - batch: Whether the function takes the whole sample at once. (Boolean)
+# - repeat: Number of timed passes; the fastest is reported. (Integer)
+# Return: Measurements. (Dictionary)
+def measure(count, words, batch, repeat):
+    # Warm up once, so one-time setup like loading a dictionary is not timed.
+    if (batch):
+        count(words[:10])
+    else:
+        for word in words[:10]:
+            count(word)
+
+    # Throughput: the fastest of several passes over the whole sample.
+    best = None
+    for i in range(repeat):
+        t1 = perf_counter()
+        if (batch):
+            count(words)
+        else:
+            for word in words:
+                count(word)
+        elapsed = perf_counter() - t1
+        best = elapsed if best == None else min(best, elapsed)
+    result = {"words": len(words), "seconds": best, "words_per_second": len(words)/best if best else None}
+
+    # Latency: time every call individually.
+    if (not batch):
+        latencies = []
+        for word in words:
+            t1 = perf_counter_ns()
+            count(word)
+            latencies.append(perf_counter_ns() - t1)
+        latencies.sort()
+        result["latency_ns"] = {"p50": percentile(latencies, 50), "p90": percentile(latencies, 90), "p99": percentile(latencies, 99), "max": latencies[-1]}
+
+    # Memory: blocks and bytes still held after a pass, as caches fill, and
+    # the peak traced memory during the pass. CPython does not count the
+    # blocks allocated and freed within a call, so each call's allocations
+    # are measured by the bytes it allocates on top of what was already held
+    # when it started, at its peak.
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    call_bytes = []
+    if (batch):
+        count(words)
+    else:
+        for word in words:
+            tracemalloc.reset_peak()
+            held = tracemalloc.get_traced_memory()[0]
+            count(word)
+            call_bytes.append(tracemalloc.get_traced_memory()[1] - held)
+    after = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    diff = after.compare_to(before, "filename")
+    result["memory"] = {"retained_blocks": sum(x.count_diff for x in diff), "retained_bytes": sum(x.size_diff for x in diff), "peak_bytes": peak}
+    if (call_bytes):
+        call_bytes.sort()
+        result["memory"]["call_bytes"] = {"mean": sum(call_bytes)/len(call_bytes), "p50": percentile(call_bytes, 50), "p99": percentile(call_bytes, 99), "max": call_bytes[-1]}
+
+    return result
+
+# Method: run
+# Purpose: Benchmark every available implementation on every sample.
+# Parameters:
+# - names: Implementations to run; None runs all of them. (List)
+# - samples: Sample name -> words, as returned by build_samples. (Dictionary)
+# - repeat: Number of timed passes per measurement. (Integer)
+# Return: Results, by implementation and sample. (Dictionary)
+def run(names, samples, repeat):
+    results = {}
+    for name, module, function, batch in implementations:
+        if (names != None and name not in names):
+            continue
+        count, error = load(module, function)
+        if (count == None):
+            results[name] = {"skipped": error}
+            continue
+        results[name] = {sample: measure(count, words, batch, repeat) for sample,words in samples.items()}
+    return results
+
+# Method: report
+# Purpose: Format benchmark results as a table.
+# Parameters:
+# - results: Results, as returned by run. (Dictionary)
+# Return: The table. (String)
+def report(results):
+    lines = [f"{'Implementation':<40}{'Sample':<11}{'Words/s':>12}{'p50 ns':>9}{'p99 ns':>9}{'B/call':>8}{'Peak KiB':>10}"]
+    skipped = []
+    for name, samples in results.items():
+        if ("skipped" in samples):
+            lines.append(f"{name:<40}SKIPPED: {samples['skipped']}")
+            skipped.append(name)
+            continue
+        for sample, r in samples.items():
+            latency = r.get("latency_ns", {})
+            call = r["memory"].get("call_bytes", {})
+            lines.append(f"{name:<40}{sample:<11}{r['words_per_second']:>12,.0f}{latency.get('p50', ''):>9}{latency.get('p99', ''):>9}{format(call['mean'], '.0f') if call else '':>8}{r['memory']['peak_bytes']/1024:>10.1f}")
+
+    # A skipped implementation is missing from every comparison, so say so
+    # where it cannot be missed.
+    if (skipped):
+        lines.append("")
+        lines.append(f"WARNING: {len(skipped)} implementation(s) could not be loaded and were not measured: {', '.join(skipped)}.")
+        if (implementations[0][0] in skipped):
+            lines.append(f"WARNING: the baseline, {implementations[0][0]}, is among them; install its dependencies to compare against it.")
+    return "\n".join(lines)
+
+# If run, not imported:
+if (__name__ == "__main__"):
+    # Parse CLI arguments.
+    parser = argparse.ArgumentParser(description='Benchmark the syllable counting implementations.')
+    parser.add_argument('-n', '--size', type=int, default=20000, help='Words per sample.')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='Timed passes per measurement.')
+    parser.add_argument('-s', '--seed', type=int, default=1, help='Random seed for the samples.')
+    parser.add_argument('-w', '--wordlist', type=str, default=default_wordlist, help='Syllable dictionary to draw words from.')
+    parser.add_argument('-c', '--corpus', type=str, default=default_corpus, help='Prose to draw the frequency-weighted sample from.')
+    parser.add_argument('-i', '--implementations', type=str, nargs='+', default=None, choices=[x[0] for x in implementations], help='Implementations to run. (Default: all)')
+    parser.add_argument('-o', '--output', type=str, default=None, help='JSON results file. (Default: benchmark-{timestamp}.json)')
+    args = parser.parse_args()
+
+    started = datetime.now()
+    samples = build_samples(args.wordlist, args.corpus, args.size, args.seed)
+    results = run(args.implementations, samples, args.repeat)
+    print(report(results))
+
+    # Record enough about the run to compare it with later runs.
+    output = args.output or f"benchmark-{started.strftime('%Y%m%d-%H%M%S')}.json"
+    fd = open(output, "w")
+    json.dump({"started": started.isoformat(), "python": platform.python_version(), "platform": platform.platform(), "processor": platform.processor(), "size": args.size, "repeat": args.repeat, "seed": args.seed, "wordlist": args.wordlist, "corpus": args.corpus, "results": results}, fd, indent=2)
+    fd.close()
+    print(f"Results written to {output}")
@@ -0,0 +1,248 @@
+#!/usr/local/bin/python3
+
+# Imports
+import sys # CLI arguments
+import argparse # CLI argument parsing
+import json # Requests and responses
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor # Serving requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer # Serving over TCP
+from os import cpu_count, remove # Worker count, stale sockets
+from os.path import exists # Stale sockets
+from signal import SIGTERM, signal # Clean shutdown
+from socketserver import ThreadingUnixStreamServer # Serving over a Unix socket
+from threading import BoundedSemaphore, local # Backpressure, per-thread parsers
+from time import perf_counter # Request timing
+from urllib.parse import parse_qs, urlsplit # Request options
+import Proofer2 # Analysis
+
+# Per-thread (or, in a process pool, per-process) Markdown parsers, loaded the
+# first time a worker renders a preview.
+parsers = local()
+
+# Class: DaemonHTTPServer
+# Purpose: Serve over TCP, with a listen backlog deep enough that a burst of
+#          clients is answered, if only with 503, rather than reset.
+class DaemonHTTPServer(ThreadingHTTPServer):
+    request_queue_size = 128
+    daemon_threads = True
+
+# Class: DaemonUnixServer
+# Purpose: Serve over a Unix socket, with the same backlog.
+class DaemonUnixServer(ThreadingUnixStreamServer):
+    request_queue_size = 128
+    daemon_threads = True
+
+# Method: warm
+# Purpose: Load everything a request needs before the first request arrives:
+#          the syllable index, and every word's path through the feature cache.
+def warm():
+    Proofer2.analyze("Title\n=\n\nWarm the syllable index and the word lists.")
+
+# Method: handle
+# Purpose: Analyze one post, in a worker.
+# Parameters:
+# - text: The post, in Markdown. (String)
+# - fmt: "json" for the report, or "html" for a rendered preview. (String)
+# - title: Whether the post starts with a title. (Boolean)
+# Return: Response body and content type. (Tuple)
+def handle(text, fmt, title):
+    if (fmt == "html"):
+        if (getattr(parsers, "md", None) == None):
+            parsers.md = Proofer2.load_markdown()
+            parsers.template = Proofer2.read_template(Proofer2.default_template)
+        report = Proofer2.analyze(text, {"title":title, "parser":parsers.md.html})
+        return Proofer2.render(report, parsers.template).encode("utf-8"), "text/html; charset=utf-8"
+
+    report = Proofer2.analyze(text, {"title":title})
+    return json.dumps(report.as_dict()).encode("utf-8"), "application/json"
+
+# Class: ProofingDaemon
+# Purpose: Keep the word lists and syllable data loaded, and analyze posts
+#          sent over localhost HTTP or a Unix socket.
+class ProofingDaemon:
+    # Method: __init__
+    # Purpose: Start the workers and bind the server.
+    # Parameters:
+    # - address: (host, port) to listen on, or a Unix socket path. (Tuple or String)
+    # - workers: Number of worker threads or processes. (Integer)
+    # - processes: Whether to analyze in processes, which use every core,
+    #              rather than threads, which share one warm cache. (Boolean)
+    # - max_pending: Requests accepted at once, queued or running; more are
+    #                turned away with 503. (Integer)
+    # - max_bytes: Largest post accepted. (Integer)
+    def __init__(self, address, workers=4, processes=False, max_pending=64, max_bytes=1<<20):
+        warm()
+        if (processes):
+            self.executor = ProcessPoolExecutor(workers, initializer=warm)
+        else:
+            self.executor = ThreadPoolExecutor(workers)
+        self.slots = BoundedSemaphore(max_pending)
+        self.max_pending = max_pending
+        self.max_bytes = max_bytes
+        self.served, self.rejected = 0, 0
+
+        # Send each response as soon as it is written, rather than waiting on
+        # the client's delayed acknowledgement of the headers; Unix sockets
+        # have no such delay.
+        daemon = self
+        class Handler(DaemonHandler):
+            server_daemon = daemon
+            disable_nagle_algorithm = not isinstance(address, str)
+
+        if (isinstance(address, str)):
+            # Replace a socket left behind by an earlier daemon.
+            if (exists(address)):
+                remove(address)
+            self.server = DaemonUnixServer(address, Handler)
+        else:
+            self.server = DaemonHTTPServer(address, Handler)
+        self.address = address
+
+    # Method: submit
+    # Purpose: Analyze a post on a worker, unless too many requests are
+    #          already pending.
+    # Parameters:
+    # - text: The post, in Markdown. (String)
+    # - fmt: "json" or "html". (String)
+    # - title: Whether the post starts with a title. (Boolean)
+    # Return: Response body and content type, or None if the daemon is too
+    #         busy. (Tuple)
+    def submit(self, text, fmt, title):
+        if (not self.slots.acquire(blocking=False)):
+            self.rejected += 1
+            return None
+        try:
+            result = self.executor.submit(handle, text, fmt, title).result()
+        finally:
+            self.slots.release()
+        self.served += 1
+        return result
+
+    # Method: status
+    # Purpose: Report the daemon's load and cache effectiveness.
+    # Return: Status. (Dictionary)
+    def status(self):
+        return {"served":self.served, "rejected":self.rejected, "max_pending":self.max_pending, "feature_cache":str(Proofer2.feature_cache)}
+
+    # Method: serve_forever
+    # Purpose: Serve requests until interrupted.
+    def serve_forever(self):
+        try:
+            self.server.serve_forever()
+        finally:
+            self.close()
+
+    # Method: close
+    # Purpose: Stop serving, and remove the Unix socket, if any.
+    def close(self):
+        self.server.server_close()
+        self.executor.shutdown(wait=False)
+        if (isinstance(self.address, str) and exists(self.address)):
+            remove(self.address)
+
+# Class: DaemonHandler
+# Purpose: Answer analysis and status requests.
+class DaemonHandler(BaseHTTPRequestHandler):
+    server_daemon = None
+
+    # Use keep-alive connections, so clients sending many posts skip the
+    # connection setup.
+    protocol_version = "HTTP/1.1"
+
+    # Method: do_GET
+    # Purpose: Report the daemon's status.
+    def do_GET(self):
+        if (urlsplit(self.path).path == "/status"):
+            self.send_body(200, json.dumps(self.server_daemon.status()).encode("utf-8"), "application/json")
+        else:
+            self.send_body(404, b"Not found.\n", "text/plain")
+
+    # Method: do_POST
+    # Purpose: Analyze the posted Markdown. Query options: format=json|html,
+    #          and title=0 for posts without a title.
+    def do_POST(self):
+        # Read the body before answering, even with an error, so that on a
+        # keep-alive connection it is not taken for the next request. A body
+        # that cannot or will not be read closes the connection instead.
+        length = self.headers.get("Content-Length") or "0"
+        if (not length.strip().isdecimal()):
+            self.close_connection = True
+            self.send_body(400, b"Content-Length must be a whole number of bytes.\n", "text/plain")
+            return
+        length = int(length)
+        if (length > self.server_daemon.max_bytes):
+            self.close_connection = True
+            self.send_body(413, b"Post too large.\n", "text/plain")
+            return
+        text = self.rfile.read(length).decode("utf-8", "replace")
+
+        url = urlsplit(self.path)
+        if (url.path != "/analyze"):
+            self.send_body(404, b"Not found.\n", "text/plain")
+            return
+        query = parse_qs(url.query)
+        fmt = query.get("format", ["json"])[0]
+        title = query.get("title", ["1"])[0] != "0"
+        if (fmt not in ["json", "html"]):
+            self.send_body(400, b"Format must be json or html.\n", "text/plain")
+            return
+
+        t1 = perf_counter()
+        try:
+            result = self.server_daemon.submit(text, fmt, title)
+        except Exception as e:
+            self.send_body(500, f"{type(e).__name__}: {e}\n".encode("utf-8"), "text/plain")
+            return
+        if (result == None):
+            self.send_body(503, b"Busy; retry shortly.\n", "text/plain", {"Retry-After":"1"})
+            return
+
+        body, content_type = result
+        self.send_body(200, body, content_type, {"Server-Timing":f"analyze;dur={(perf_counter()-t1)*1000:.2f}"})
+
+    # Method: send_body
+    # Purpose: Send a complete response.
+    # Parameters:
+    # - code: HTTP status code. (Integer)
+    # - body: Response body. (Bytes)
+    # - content_type: Response content type. (String)
+    # - headers: Additional headers. (Dictionary)
+    def send_body(self, code, body, content_type, headers={}):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    # Method: address_string
+    # Purpose: Name the client; Unix socket clients have no address.
+    def address_string(self):
+        return self.client_address[0] if self.client_address else "unix"
+
+    # Method: log_message
+    # Purpose: Keep request logs quiet.
+    def log_message(self, format, *args):
+        pass
+
+# If run, not imported:
+if (__name__ == "__main__"):
+    # Parse CLI arguments.
+    parser = argparse.ArgumentParser(description='Serve proofing requests from warm word lists and syllable data.')
+    parser.add_argument('-p', '--port', type=int, default=8100, help='Port to listen on, on localhost. (Default: 8100)')
+    parser.add_argument('-s', '--socket', type=str, default=None, help='Unix socket to listen on, instead of a port.')
+    parser.add_argument('-w', '--workers', type=int, default=cpu_count(), help='Number of workers. (Default: one per core)')
+    parser.add_argument('--processes', action='store_true', help='Analyze in worker processes instead of threads, to use every core.')
+    parser.add_argument('--max-pending', type=int, default=64, help='Requests accepted at once; more get 503. (Default: 64)')
+    args = parser.parse_args()
+
+    # Exit through serve_forever's cleanup when stopped, to remove the socket.
+    signal(SIGTERM, lambda signum, frame: sys.exit(0))
+
+    daemon = ProofingDaemon(args.socket or ("127.0.0.1", args.port), args.workers, args.processes, args.max_pending)
+    print(f"Serving on {args.socket or f'http://127.0.0.1:{args.port}/'} with {args.workers} {'processes' if args.processes else 'threads'}")
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,88 @@
+#!/usr/local/bin/python3
+
+# Imports
+from collections import OrderedDict, namedtuple
+
+# Per-token features used by the proofing loops:
+# - syllables: Syllable count. (Integer)
+# - complex: Whether the word has three or more syllables. (Boolean)
+# - category: Category of the first lexicon containing the word, or None. (String)
+# - excluded: Whether the word is excluded from repetition highlighting. (Boolean)
+# - be_verb: Whether the word is a be verb. (Boolean)
+# - adverb: Whether the word ends in "-ly". (Boolean)
+Features = namedtuple("Features", ["syllables", "complex", "category", "excluded", "be_verb", "adverb"])
+
+# Class: FeatureCache
+# Purpose: Compute and cache the features of each normalized token, keeping
+#          only the most recently used entries. Threads may share a cache:
+#          each OrderedDict operation is atomic, and the method tolerates
+#          another thread evicting a token between them. The counters may
+#          undercount under contention.
+class FeatureCache:
+    # Method: __init__
+    # Purpose: Store the word lists the features are computed from.
+    # Parameters:
+    # - syllable_count: Function returning a word's syllable count. (Function)
+    # - exclude: Words to exclude from repetition highlighting. (List)
+    # - be_verbs: Be verbs to avoid. (List)
+    # - lexicons: (category, words) tuples, in order of precedence. (List)
+    # - maxsize: Maximum number of cached tokens. (Integer)
+    def __init__(self, syllable_count, exclude=(), be_verbs=(), lexicons=(), maxsize=8192):
+        self.syllable_count = syllable_count
+        self.exclude = frozenset(x.lower() for x in exclude)
+        self.be_verbs = frozenset(x.lower() for x in be_verbs)
+        self.lexicons = [(category, frozenset(x.lower() for x in words)) for category,words in lexicons]
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+
+        # Running counters, for reporting the cache's effectiveness
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+    # Method: get
+    # Purpose: Return the features of a token, computing them on a miss.
+    # Parameters:
+    # - token: Word, in any case. (String)
+    # Return: The token's features. (Features)
+    def get(self, token):
+        key = token.lower()
+        features = self.cache.get(key)
+        if (features != None):
+            self.hits += 1
+            try:
+                self.cache.move_to_end(key)
+            except KeyError:
+                pass
+            return features
+
+        self.misses += 1
+        sylls = self.syllable_count(key)
+        category = None
+        for name, words in self.lexicons:
+            if (key in words):
+                category = name
+                break
+        features = Features(sylls, sylls >= 3, category, key in self.exclude, key in self.be_verbs, key[-2:] == "ly")
+
+        # Evict the least recently used token once the cache is full.
+        self.cache[key] = features
+        if (len(self.cache) > self.maxsize):
+            try:
+                self.cache.popitem(last=False)
+                self.evictions += 1
+            except KeyError:
+                pass
+
+        return features
+
+    # Method: clear
+    # Purpose: Empty the cache and reset its counters.
+    def clear(self):
+        self.cache.clear()
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+    # Method: __str__
+    # Purpose: Summarize the cache's counters.
+    def __str__(self):
+        total = self.hits + self.misses
+        rate = (self.hits/total*100) if total else 0.0
+        return f"{len(self.cache)}/{self.maxsize} tokens cached; {self.hits} hits ({rate:.2f}%), {self.misses} misses, {self.evictions} evictions"
@@ -0,0 +1,115 @@
+#!/usr/local/bin/python3
+
+# Class: PhraseMatcher
+# Purpose: Find every occurrence of a fixed list of words and phrases in a
+#          single pass over a paragraph's tokens, using an Aho-Corasick
+#          automaton built over the case-folded phrases' tokens.
+class PhraseMatcher:
+    # Method: __init__
+    # Purpose: Build the automaton's trie, failure links, and output sets.
+    # Parameters:
+    # - phrases: Words and phrases to search for. (List)
+    # - tokenize: Function splitting a phrase into tokens with "start", "end",
+    #             and "norm" fields, as tokenizer.tokenize does. (Function)
+    def __init__(self, phrases, tokenize):
+        # Keep the phrases as given, for reporting, and in case-folded form,
+        # for matching. Duplicates only need a single path through the trie.
+        self.phrases = []
+        self.lengths = []
+        self.gaps = []    # Per-phrase text between its tokens, without spaces
+        self.goto = [{}]  # Per-state map of token -> next state
+        self.fail = [0]   # Per-state failure link
+        self.out = [()]   # Per-state indices of phrases ending at this state
+
+        seen = set()
+        for phrase in phrases:
+            text = phrase.lower()
+            tokens = tokenize(text)
+            key = tuple(x.norm for x in tokens)
+            gaps = tuple(Gap(text, a, b) for a, b in zip(tokens, tokens[1:]))
+            if (len(key) == 0 or (key, gaps) in seen):
+                continue
+            seen.add((key, gaps))
+            self.phrases.append(phrase)
+            self.lengths.append(len(key))
+            self.gaps.append(gaps)
+
+            # Walk or extend the trie one token at a time.
+            state = 0
+            for ch in key:
+                nxt = self.goto[state].get(ch)
+                if (nxt == None):
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(())
+                state = nxt
+            self.out[state] = self.out[state] + (len(self.phrases)-1,)
+
+        # Breadth-first pass to set failure links. Each state inherits the
+        # outputs of its failure state, so a scan never has to follow the
+        # chain of failure links just to report shorter matches.
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while (f and ch not in self.goto[f]):
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    # Method: search_tokens
+    # Purpose: Return every occurrence of the phrases in a tokenized text.
+    #          Punctuation and skipped markup are not tokens, so a match must
+    #          also have the phrase's own text between its words, ignoring
+    #          spaces: "at the end. Of the day" is not "at the end of the day".
+    # Parameters:
+    # - tokens: Tokens, with "start", "end", and "norm" fields. (List)
+    # - text: The text the tokens were scanned from. (String)
+    # Return: (start, end, phrase) tuples, as character offsets, ordered by
+    #         start offset. (List)
+    def search_tokens(self, tokens, text):
+        goto, fail, out = self.goto, self.fail, self.out
+        phrases, lengths, gaps = self.phrases, self.lengths, self.gaps
+        matches = []
+        state = 0
+        for i, token in enumerate(tokens):
+            norm = token.norm
+            while (state and norm not in goto[state]):
+                state = fail[state]
+            state = goto[state].get(norm, 0)
+
+            for index in out[state]:
+                first = i+1-lengths[index]
+                if (any(Gap(text, tokens[first+k], tokens[first+k+1]) != gap for k, gap in enumerate(gaps[index]))):
+                    continue
+                matches.append((tokens[first].start, token.end, phrases[index]))
+
+        matches.sort(key=lambda m: (m[0], -m[1]))
+        return matches
+
+# Method: Gap
+# Purpose: Return the text between two tokens, without whitespace.
+# Parameters:
+# - text: The text the tokens were scanned from. (String)
+# - a: The first token. (Token)
+# - b: The token after it. (Token)
+# Return: The text between them. (String)
+def Gap(text, a, b):
+    return "".join(text[a.end:b.start].split())
+
+# Method: LongestMatches
+# Purpose: Reduce a list of matches to the leftmost-longest matches that do not
+#          overlap, for highlighting.
+# Parameters:
+# - matches: (start, end, phrase) tuples, as returned by search_tokens. (List)
+def LongestMatches(matches):
+    selected = []
+    last_end = 0
+    for start, end, phrase in matches:
+        if (start >= last_end):
+            selected.append((start, end, phrase))
+            last_end = end
+    return selected
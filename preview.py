@@ -0,0 +1,263 @@
+#!/usr/local/bin/python3
+
+# Imports
+import json # Update messages
+from hashlib import blake2b # Paragraph identifiers
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer # Serving the preview
+from mimetypes import guess_type # Static file types
+from os.path import abspath, dirname, isfile, join, normpath # File paths
+from queue import Empty, Queue # Per-client update queues
+from re import DOTALL, search, sub # Template editing
+from threading import Lock, Thread # Serving alongside the build loop
+
+# Default locations of the preview template and its assets
+base = dirname(abspath(__file__))
+assets = join(base, "assets")
+default_template = join(assets, "template.html")
+
+# Seconds between keep-alive comments on an idle event stream, which also
+# reveal clients that have gone away.
+keepalive = 15.0
+
+# Replaces the template's reload-every-five-seconds script. The page holds an
+# event stream open; each update lists the paragraphs in order, with HTML only
+# for paragraphs the page has not seen, so unchanged paragraphs stay in place
+# and the scroll position holds.
+client_script = """<script type="text/javascript">
+            const events = new EventSource("/events");
+            events.onmessage = function (e) {
+                const update = JSON.parse(e.data);
+                const article = document.getElementById("preview");
+                const title = document.getElementById("preview_title");
+                const known = {};
+                for (const el of article.querySelectorAll(":scope > .preview_paragraph")) {
+                    known[el.id] = el;
+                }
+                if (title.innerHTML !== update.title) {
+                    title.innerHTML = update.title;
+                }
+                let previous = title;
+                for (const id of update.order) {
+                    let el = known[id];
+                    if (el) {
+                        delete known[id];
+                    } else {
+                        el = document.createElement("div");
+                        el.id = id;
+                        el.className = "preview_paragraph";
+                        el.innerHTML = update.changed[id];
+                    }
+                    if (previous.nextSibling !== el) {
+                        previous.after(el);
+                    }
+                    previous = el;
+                }
+                for (const id in known) {
+                    known[id].remove();
+                }
+                document.getElementById("document_stats").outerHTML = update.stats;
+            };
+        </script>"""
+
+# Method: paragraph_ids
+# Purpose: Name each paragraph by a hash of its HTML, numbering repeats, so a
+#          paragraph keeps its name until its content changes.
+# Parameters:
+# - paragraphs: Paragraphs' HTML, in order. (List)
+# Return: Paragraph names, in order. (List)
+def paragraph_ids(paragraphs):
+    ids = []
+    repeats = {}
+    for paragraph in paragraphs:
+        digest = blake2b(paragraph.encode("utf-8"), digest_size=8).hexdigest()
+        repeats[digest] = repeats.get(digest, 0) + 1
+        ids.append(f"p{digest}-{repeats[digest]}")
+    return ids
+
+# Class: PreviewServer
+# Purpose: Serve a live preview of a document over HTTP, and push each rebuild
+#          to open pages over Server-Sent Events.
+class PreviewServer:
+    # Method: __init__
+    # Purpose: Read the template and bind the server.
+    # Parameters:
+    # - host: Address to listen on. (String)
+    # - port: Port to listen on. (Integer)
+    # - template: Path to the preview template. (String)
+    def __init__(self, host="127.0.0.1", port=8000, template=default_template):
+        fd = open(template, "r")
+        self.template = fd.read().split("<!-- DIVIDER -->")
+        fd.close()
+        if ("<script" in self.template[0]):
+            self.template[0] = sub(r"<script.*?</script>", lambda m: client_script, self.template[0], count=1, flags=DOTALL)
+        else:
+            self.template[0] = self.template[0].replace("</head>", client_script+"\n    </head>")
+
+        # The last published document, and a queue of updates for each open page
+        self.title = ""
+        self.ids = []
+        self.paragraphs = {}
+        self.stats = "<section id=\"document_stats\"></section>"
+        self.clients = []
+        self.lock = Lock()
+
+        preview = self
+        class Handler(PreviewHandler):
+            server_preview = preview
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    # Method: url
+    # Purpose: Return the address of the preview.
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    # Method: start
+    # Purpose: Serve requests on a background thread.
+    def start(self):
+        self.thread = Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    # Method: render_stats
+    # Purpose: Fill in the template's document statistics block.
+    # Parameters:
+    # - stats: Values for the template's named fields. (Dictionary)
+    # Return: The <section id="document_stats"> element. (String)
+    def render_stats(self, stats):
+        return search(r"<section id=\"document_stats\">.*?</section>", self.template[1].format(**stats), DOTALL).group(0)
+
+    # Method: page
+    # Purpose: Render the whole preview page from the last published document.
+    # Return: The page. (String)
+    def page(self):
+        with self.lock:
+            article = "".join(f"<div class='preview_paragraph' id='{x}'>{self.paragraphs[x]}</div>\n" for x in self.ids)
+            closing = self.template[1]
+            start = closing.find("<section id=\"document_stats\">")
+            end = closing.find("</section>", start) + len("</section>")
+            return f"{self.template[0]}\n<article id='preview'>\n<div id='preview_title'>{self.title}</div>\n{article}</article>\n{closing[:start]}{self.stats}{closing[end:]}"
+
+    # Method: snapshot
+    # Purpose: Build an update carrying every paragraph, for a newly opened page.
+    # Return: The update. (String)
+    def snapshot(self):
+        return json.dumps({"title":self.title, "order":self.ids, "changed":self.paragraphs, "stats":self.stats})
+
+    # Method: subscribe
+    # Purpose: Register an open page, queueing the current document first so
+    #          the page cannot miss a build that lands while it connects.
+    # Return: The page's update queue. (Queue)
+    def subscribe(self):
+        queue = Queue()
+        with self.lock:
+            queue.put(self.snapshot())
+            self.clients.append(queue)
+        return queue
+
+    # Method: unsubscribe
+    # Purpose: Forget a page that has closed.
+    # Parameters:
+    # - queue: The page's update queue. (Queue)
+    def unsubscribe(self, queue):
+        with self.lock:
+            if (queue in self.clients):
+                self.clients.remove(queue)
+
+    # Method: publish
+    # Purpose: Record a rebuilt document and push the paragraphs that changed,
+    #          with the new statistics, to every open page.
+    # Parameters:
+    # - title: The document's title HTML. (String)
+    # - paragraphs: The document's paragraphs' HTML, in order. (List)
+    # - stats: Values for the template's named fields. (Dictionary)
+    # Return: Number of paragraphs sent. (Integer)
+    def publish(self, title, paragraphs, stats):
+        ids = paragraph_ids(paragraphs)
+        stats = self.render_stats(stats)
+        with self.lock:
+            changed = {x:html for x,html in zip(ids, paragraphs) if x not in self.paragraphs}
+            self.title = title
+            self.ids = ids
+            self.paragraphs = dict(zip(ids, paragraphs))
+            self.stats = stats
+            update = json.dumps({"title":title, "order":ids, "changed":changed, "stats":stats})
+            for queue in self.clients:
+                queue.put(update)
+        return len(changed)
+
+    # Method: close
+    # Purpose: Stop serving.
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+# Class: PreviewHandler
+# Purpose: Answer requests for the preview page, its event stream, and its
+#          assets.
+class PreviewHandler(BaseHTTPRequestHandler):
+    server_preview = None
+
+    # Method: do_GET
+    # Purpose: Route a request.
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if (path == "/" or path == "/index.html"):
+            self.send_body(self.server_preview.page().encode("utf-8"), "text/html; charset=utf-8")
+        elif (path == "/events"):
+            self.stream()
+        elif (path.startswith("/assets/")):
+            # Serve only files inside the assets directory.
+            target = normpath(join(assets, path[len("/assets/"):]))
+            if (not target.startswith(assets+"/") or not isfile(target)):
+                self.send_error(404)
+                return
+            fd = open(target, "rb")
+            body = fd.read()
+            fd.close()
+            self.send_body(body, guess_type(target)[0] or "application/octet-stream")
+        else:
+            self.send_error(404)
+
+    # Method: send_body
+    # Purpose: Send a complete response.
+    # Parameters:
+    # - body: Response body. (Bytes)
+    # - content_type: Response content type. (String)
+    def send_body(self, body, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    # Method: stream
+    # Purpose: Hold an event stream open, sending each update as it is
+    #          published, until the page goes away.
+    def stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        queue = self.server_preview.subscribe()
+        try:
+            self.wfile.write(b"retry: 1000\n\n")
+            while (True):
+                try:
+                    update = queue.get(timeout=keepalive)
+                    self.wfile.write(f"data: {update}\n\n".encode("utf-8"))
+                except Empty:
+                    self.wfile.write(b": keepalive\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.server_preview.unsubscribe(queue)
+
+    # Method: log_message
+    # Purpose: Keep request logs out of the build output.
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,145 @@
+#!/usr/local/bin/python3
+
+# Imports
+import cProfile # Function-level profiles
+import tracemalloc # Peak memory
+from contextlib import contextmanager, nullcontext # Stage timing
+from time import perf_counter # Stage timing
+
+# Shared by every stage of a disabled profiler, so instrumented code costs a
+# no-op with statement when profiling is off.
+disabled_stage = nullcontext()
+
+# Class: Profiler
+# Purpose: Record the wall time, call count, and, optionally, peak memory of
+#          each named stage of a pipeline, and print them as a table. Stages
+#          may nest; a stage's time includes the stages inside it.
+class Profiler:
+    # Method: __init__
+    # Purpose: Start profiling, or create a profiler that records nothing.
+    # Parameters:
+    # - enabled: Whether to record stages. (Boolean)
+    # - memory: Whether to trace peak memory per stage with tracemalloc, which
+    #           slows everything it measures. (Boolean)
+    # - dump: Path to write a cProfile dump to, for pstats or snakeviz, or
+    #         None. (String)
+    def __init__(self, enabled=True, memory=False, dump=None):
+        self.enabled = enabled
+        self.memory = enabled and memory
+        self.dump = dump if enabled else None
+        self.order = [] # Stage names, in order first seen
+        self.times = {}
+        self.calls = {}
+        self.peaks = {}
+        self.stack = [] # [memory at start, peak so far] for each open stage
+        self.highest = 0 # Highest traced memory at the end of any stage
+        self.total_peak = None
+        self.start = perf_counter()
+
+        if (self.memory):
+            tracemalloc.start()
+        self.profile = None
+        if (self.dump != None):
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    # Method: stage
+    # Purpose: Time a block as one call of a stage, as in
+    #          "with profiler.stage('tokenize'):".
+    # Parameters:
+    # - name: Name of the stage. (String)
+    # Return: A context manager. (Object)
+    def stage(self, name):
+        if (not self.enabled):
+            return disabled_stage
+        return self.timed(name)
+
+    # Method: timed
+    # Purpose: Time a block as one call of a stage, tracing its peak memory if
+    #          asked. Before resetting the peak for the block, fold the peak so
+    #          far into the enclosing stage's, so nested stages report true
+    #          peaks.
+    # Parameters:
+    # - name: Name of the stage. (String)
+    @contextmanager
+    def timed(self, name):
+        if (self.memory):
+            current, peak = tracemalloc.get_traced_memory()
+            if (self.stack):
+                self.stack[-1][1] = max(self.stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            self.stack.append([current, current])
+        t1 = perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, perf_counter()-t1)
+            if (self.memory):
+                current, peak = tracemalloc.get_traced_memory()
+                start, highest = self.stack.pop()
+                highest = max(highest, peak)
+                self.highest = max(self.highest, highest)
+                self.peaks[name] = max(self.peaks.get(name, 0), highest-start)
+                if (self.stack):
+                    self.stack[-1][1] = max(self.stack[-1][1], highest)
+
+    # Method: add
+    # Purpose: Record one call of a stage.
+    # Parameters:
+    # - name: Name of the stage. (String)
+    # - elapsed: Seconds the call took. (Float)
+    def add(self, name, elapsed):
+        if (name not in self.times):
+            self.order.append(name)
+            self.times[name] = 0.0
+            self.calls[name] = 0
+        self.times[name] += elapsed
+        self.calls[name] += 1
+
+    # Method: wrap
+    # Purpose: Time every call of a function as a stage. A disabled profiler
+    #          returns the function unchanged.
+    # Parameters:
+    # - name: Name of the stage. (String)
+    # - function: The function. (Function)
+    # Return: The timed function. (Function)
+    def wrap(self, name, function):
+        if (not self.enabled):
+            return function
+        def timed_function(*args, **kwargs):
+            t1 = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.add(name, perf_counter()-t1)
+        return timed_function
+
+    # Method: finish
+    # Purpose: Stop profiling, and write the cProfile dump, if any.
+    def finish(self):
+        if (self.profile != None):
+            self.profile.disable()
+            self.profile.dump_stats(self.dump)
+            self.profile = None
+        if (self.memory and tracemalloc.is_tracing()):
+            self.total_peak = max(self.highest, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+    # Method: table
+    # Purpose: Format the stages as a table, in the order first seen.
+    # Return: The table. (String)
+    def table(self):
+        total = perf_counter()-self.start
+        rows = [f"{'Stage':<16}{'Calls':>10}{'Total ms':>12}{'Per call us':>14}{'Share':>8}" + (f"{'Peak KiB':>12}" if self.memory else "")]
+        for name in self.order:
+            seconds, calls = self.times[name], self.calls[name]
+            row = f"{name:<16}{calls:>10}{seconds*1000:>12.2f}{seconds/calls*1e6:>14.1f}{seconds/total*100:>7.1f}%"
+            if (self.memory):
+                row += f"{self.peaks[name]/1024:>12.1f}" if name in self.peaks else f"{'-':>12}"
+            rows.append(row)
+        rows.append(f"{'wall':<16}{'':>10}{total*1000:>12.2f}")
+        if (self.total_peak != None):
+            rows.append(f"Peak traced memory: {self.total_peak/1024:.1f} KiB")
+        if (self.dump != None):
+            rows.append(f"cProfile dump: {self.dump} (python -m pstats {self.dump})")
+        return "\n".join(rows)
@@ -0,0 +1,100 @@
+#!/usr/local/bin/python3
+
+# Imports
+from collections import deque # Recent occurrences of each word
+
+# Default number of consecutive words a repetition must fall within, and the
+# number of uses that make a repetition.
+default_window = 100
+default_repeats = 3
+
+# Class: RepetitionDetector
+# Purpose: Find words used at least `repeats` times within any `window`
+#          consecutive words, in a single pass over a document. The window
+#          runs across paragraph breaks, as a reader's memory does. Each word
+#          costs constant time, amortized.
+class RepetitionDetector:
+    # Method: __init__
+    # Purpose: Start an empty pass.
+    # Parameters:
+    # - window: Number of consecutive words a repetition must fall within. (Integer)
+    # - repeats: Number of uses within the window that make a repetition. (Integer)
+    # - skip: Words never reported, like "the"; they still count toward the
+    #         window. (Iterable)
+    def __init__(self, window=default_window, repeats=default_repeats, skip=()):
+        self.window = window
+        self.repeats = repeats
+        self.skip = frozenset(x.lower() for x in skip)
+        self.count = 0
+        self.recent = {} # Word -> deque of (word index, position) within the window
+        self.expiry = deque() # (word index, word) within the window, oldest first
+        self.flagged = {} # Word -> word index of its last reported occurrence
+        self.found = {} # Word -> reported positions, in order
+
+    # Method: add
+    # Purpose: Read the next word of the document.
+    # Parameters:
+    # - word: The word, in any case. (String)
+    # - position: Where the word is, returned as is when it is reported. (Any)
+    def add(self, word, position):
+        index = self.count
+        self.count += 1
+        key = word.lower()
+        if (key in self.skip):
+            return
+
+        # Forget every occurrence that has left the window, and every word
+        # with no occurrence left in it.
+        expiry = self.expiry
+        while (expiry and expiry[0][0] <= index-self.window):
+            old = expiry.popleft()[1]
+            recent = self.recent[old]
+            recent.popleft()
+            if (not recent):
+                del self.recent[old]
+                self.flagged.pop(old, None)
+
+        recent = self.recent.get(key)
+        if (recent == None):
+            recent = self.recent[key] = deque()
+        recent.append((index, position))
+        expiry.append((index, key))
+
+        # Report every occurrence in the window not yet reported: all of them
+        # when the word first reaches the threshold, then each later one.
+        if (len(recent) >= self.repeats):
+            last = self.flagged.get(key, -1)
+            new = []
+            for i, pos in reversed(recent):
+                if (i <= last):
+                    break
+                new.append(pos)
+            new.reverse()
+            self.found.setdefault(key, []).extend(new)
+            self.flagged[key] = index
+
+    # Method: take
+    # Purpose: Return the occurrences reported since the last call, and forget
+    #          them, so a pass over a long document holds only the reports not
+    #          yet handled.
+    # Return: Lowercase word -> positions of its newly reported occurrences,
+    #         in document order. (Dictionary)
+    def take(self):
+        found = self.found
+        self.found = {}
+        return found
+
+    # Method: settled
+    # Purpose: Check whether a word can still be reported, once the window has
+    #          moved past it.
+    # Parameters:
+    # - index: The word's index, counting from zero. (Integer)
+    def settled(self, index):
+        return index <= self.count-self.window
+
+    # Method: repeated
+    # Purpose: Return the repeated words found so far.
+    # Return: Lowercase word -> positions of its reported occurrences, in
+    #         document order. (Dictionary)
+    def repeated(self):
+        return self.found
@@ -0,0 +1,42 @@
+#!/usr/local/bin/python3
+
+# Imports
+import json # Report serialization
+
+# Method: write_reports
+# Purpose: Write proofing reports for scripts to read. JSON writes each report
+#          as one document, or a list of them; NDJSON writes one line per
+#          paragraph, then one line for its document, as each report arrives.
+# Parameters:
+# - reports: Reports, each with "file", "title", "stats", and "paragraphs"
+#            keys. (Iterable)
+# - fmt: "json" or "ndjson". (String)
+# - fd: Output stream. (File)
+# - many: Whether JSON output is a list, even of one report. (Boolean)
+# Return: Number of reports written. (Integer)
+def write_reports(reports, fmt, fd, many=False):
+    if (fmt == "ndjson"):
+        count = 0
+        for report in reports:
+            for paragraph in report["paragraphs"]:
+                fd.write(json.dumps(dict(paragraph, type="paragraph", file=report["file"]))+"\n")
+            write_record(dict(report["stats"], type="document", file=report["file"], title=report["title"]), fd)
+            count += 1
+        return count
+
+    reports = list(reports)
+    if (not many and len(reports) == 0):
+        return 0
+    # Encode the whole document before writing it: json.dump writes every
+    # indented fragment separately.
+    fd.write(json.dumps(reports if many else reports[0], indent=2)+"\n")
+    return len(reports)
+
+# Method: write_record
+# Purpose: Write one NDJSON record and flush it, so a reader sees it at once.
+# Parameters:
+# - record: The record. (Dictionary)
+# - fd: Output stream. (File)
+def write_record(record, fd):
+    fd.write(json.dumps(record)+"\n")
+    fd.flush()
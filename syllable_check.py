@@ -1,6 +1,13 @@
 #!/usr/local/bin/python3
 
+import argparse # CLI argument parsing
 from re import findall
+from collections import Counter # Error histograms
+from datetime import datetime # Runtime
+from multiprocessing import Pool # Multiprocessing
+from os.path import exists, getsize, join # File operations
+import syllable_index # Compiled syllable counts
+from string import ascii_lowercase # Letter lists
 
 # Method: syllables
 # Purpose: Accept a word and return the number of syllables *efficiently*
@@ -103,37 +110,150 @@ def syllables(word):
     # calculate the output
     return numVowels - disc + syls
 
-def test_method(wordlist, method):
-    fd = open(f"./Syllables/Individual Syllable Lists/syllable_{wordlist}.txt", "r")
-
-    disagree,agree,total = 0,0,0
-
-    for i,line in enumerate(fd):
-        line = line.strip()
-        word,sylls = line.split(",")
-
-        total += 1
-
-        # Ignore words for which dictionary had no syllable count, for now
-        if (sylls == "-1"):
-            continue
-
-        if (method == "old"):
-            calced_sylls = str(syllables(word))
-        elif (method == "new"):
-            calced_sylls = str(new_syllables(word))
-        elif (method == "other"):
-            calced_sylls = str(nsyl(word))
-
-        if (calced_sylls != sylls):
-            disagree += 1
-            print(f"{word} - Expected: {sylls}; returned: {calced_sylls}")
-        else:
-            agree += 1
+# Method: count_syllables_batch
+# Purpose: Count syllables for a whole array of words at once, with the same
+#          rules, and the same results, as syllables().
+# Parameters:
+# - words: Words to be parsed. (List)
+# Return: Syllable count for each word. (numpy.ndarray)
+def count_syllables_batch(words):
+    # NumPy is only needed for batch counting, so import it here.
+    import numpy as np
+
+    words = [w.lower() for w in words]
+    n = len(words)
+    if (n == 0):
+        return np.zeros(0, dtype=np.int64)
+
+    # Encode the words into a zero-padded matrix of characters, one row per
+    # word. Characters outside Latin-1 become "?", which is not a vowel, so
+    # every row keeps the same length as its word.
+    lengths = np.fromiter(map(len, words), dtype=np.int64, count=n)
+    width = max(int(lengths.max()), 8)
+    flat = np.frombuffer("".join(words).encode("latin-1", "replace"), dtype=np.uint8)
+    offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    rows = np.arange(n)
+    cols = np.arange(width, dtype=np.int16)
+    m = np.zeros((n, width), dtype=np.uint8)
+    m[np.repeat(rows, lengths), np.arange(len(flat)) - offsets] = flat
+
+    is_vowel = np.zeros(256, dtype=bool)
+    is_vowel[list(b"aeoui")] = True
+    vowel = is_vowel[m]
+    inside = cols[None,:] < lengths[:,None]
+
+    # Pack each word's first eight characters, and its last four characters,
+    # into a single integer, so prefix and suffix tests are one comparison.
+    head = np.ascontiguousarray(m[:,:8]).view("<u8")[:,0]
+    tail_idx = lengths[:,None] - 4 + np.arange(4)[None,:]
+    tail = np.where(tail_idx >= 0, m[rows[:,None], np.clip(tail_idx, 0, None)], 0).astype(np.uint8)
+    tail_vowel = np.where(tail_idx >= 0, vowel[rows[:,None], np.clip(tail_idx, 0, None)], False)
+    tail = np.ascontiguousarray(tail).view("<u4")[:,0]
+
+    # Helpers to test a word's prefix, suffix, and whole-word membership.
+    def starts(prefix):
+        p = prefix.encode("latin-1")
+        k = min(len(p), 8)
+        found = (head & np.uint64((1 << 8*k) - 1)) == np.uint64(int.from_bytes(p[:k], "little"))
+        # Compare the rest of longer prefixes only for the rows that match.
+        if (len(p) > 8):
+            candidates = np.flatnonzero(found)
+            if (len(p) > width):
+                found[candidates] = False
+            else:
+                found[candidates] = (m[candidates,8:len(p)] == np.frombuffer(p[8:], dtype=np.uint8)).all(axis=1)
+        return found
+
+    def ends(suffix):
+        p = suffix.encode("latin-1")
+        return (tail >> np.uint32(8*(4-len(p)))) == np.uint32(int.from_bytes(p, "little"))
+
+    def member(wordlist):
+        found = np.zeros(n, dtype=bool)
+        for word in wordlist:
+            found |= (lengths == len(word)) & starts(word)
+        return found
+
+    #2, #4) Count non-overlapping vowel pairs and triplets, as re.findall
+    # would: a run of k vowels holds k//2 pairs and k//3 triplets. Track the
+    # length of the current run of vowels at every position.
+    last_consonant = np.maximum.accumulate(np.where(vowel, -1, cols[None,:]), axis=1)
+    run = np.where(vowel, cols[None,:] - last_consonant, 0)
+    double_vowel = np.count_nonzero((run > 0) & (run % 2 == 0), axis=1)
+    triple_vowel = np.count_nonzero((run > 0) & (run % 3 == 0), axis=1)
+
+    # A vowel followed by any other character, within the word.
+    vowel_consonant = np.count_nonzero(vowel[:,:-1] & ~vowel[:,1:] & inside[:,1:], axis=1)
+
+    disc = np.zeros(n, dtype=np.int64)
+    syls = np.zeros(n, dtype=np.int64)
+
+    #2) Discard "es" and "ed" at the end, except "ted", "tes", "ses", "ied", "ies".
+    es_ed = ends("es") | ends("ed")
+    keep = ends("ted") | ends("tes") | ends("ses") | ends("ied") | ends("ies")
+    disc += es_ed & ((double_vowel > 1) | (vowel_consonant > 1)) & ~keep
+
+    #3) Discard trailing "e", except where ending is "le"
+    le_except = ['whole','mobile','pole','male','female','hale','pale','tale','sale','aisle','whale','while']
+    disc += ends("e") & ~(ends("le") & ~member(le_except))
+
+    #4) Consecutive vowels count as one.
+    disc += double_vowel + triple_vowel
+
+    #5) Count vowels in word.
+    num_vowels = np.count_nonzero(vowel, axis=1)
+
+    #6) Add one if starts with "mc"
+    syls += starts("mc")
+
+    #7) Add one if ends with "y" but is not preceded by a vowel
+    syls += ends("y") & ~tail_vowel[:,2]
+
+    #8) Add one for each "y" surrounded by non-vowels, inside the word.
+    y = m[:,1:-1] == ord("y")
+    middle = cols[None,1:-1] < (lengths[:,None]-1)
+    syls += np.count_nonzero(y & middle & ~vowel[:,:-2] & ~vowel[:,2:], axis=1)
+
+    #9) Add one if starts with "tri-" or "bi-" followed by a vowel.
+    syls += starts("tri") & vowel[:,3]
+    syls += starts("bi") & vowel[:,2]
+
+    #10) "-ian" is two syllables, except for "-tian" and "-cian"
+    syls += ends("ian") & ~(ends("cian") | ends("tian"))
+
+    #11) "co-" followed by a vowel, unless a single syllable "co" word.
+    co = starts("co") & vowel[:,2]
+    co_two = np.zeros(n, dtype=bool)
+    for prefix in ['coapt','coed','coinci']:
+        co_two |= starts(prefix)
+    co_one = np.zeros(n, dtype=bool)
+    for prefix in ['cool','coach','coat','coal','count','coin','coarse','coup','coif','cook','coign','coiffe','coof','court']:
+        co_one |= starts(prefix)
+    syls += co & (co_two | ~co_one)
+
+    #12) "pre-" followed by a vowel, except "preach"
+    syls += starts("pre") & vowel[:,3] & ~starts("preach")
+
+    #13) Negative contractions with an extra syllable.
+    syls += member(["doesn't", "isn't", "shouldn't", "couldn't","wouldn't"])
+
+    #14) Exceptional words.
+    disc += member(['fortunately','unfortunately'])
+    syls += member(['serious','crucial'])
 
-    fd.close()
+    #1) If three or less letters, one syllable
+    return np.where(lengths <= 3, 1, num_vowels - disc + syls)
 
-    skipped = total-(agree+disagree)
+# Method: test_method
+# Purpose: Compare one algorithm against one letter's syllable dictionary.
+# Parameters:
+# - wordlist: Letter of the syllable dictionary to test against. (String)
+# - method: Name of the algorithm, as registered in methods. (String)
+# Return: Summary of the comparison. (String)
+def test_method(wordlist, method):
+    result = evaluate_shard(wordlist, method)
+    total, skipped, agree = result["total"], result["skipped"], result["agree"]
+    disagree = result["disagree"] + result["unknown"]
 
     return f"{total} words processed. {skipped} ({(skipped/total*100):.2f}%) skipped. Of the remainder, {agree} matched ({(agree/(total-skipped)*100):.2f}%), and {disagree} did not ({(disagree/(total-skipped)*100):.2f}%)"
 
@@ -151,29 +271,175 @@ def new_syllables(word):
 
     sub = sum([word.count(x) for x in ['au', 'oy', 'oo', 'iou']])
 
-    if (word.endswith("le") and word[-3] not in consonants):
+    if (word.endswith("le") and len(word) > 2 and word[-3] not in consonants):
         add += 1
-    elif (word.endswith("les") and word[-4] not in consonants):
+    elif (word.endswith("les") and len(word) > 3 and word[-4] not in consonants):
         add += 1
 
     return add-sub
 
-from nltk.corpus import cmudict
-d = cmudict.dict()
+# Compiled CMU Pronouncing Dictionary syllable counts, built from NLTK's copy
+# on first use and opened on the first call to nsyl.
+cmu_index_path = join(syllable_index.base, "cmudict.idx")
+cmu_index = None
 
+# Method: load_cmu_index
+# Purpose: Open the compiled CMU syllable counts, compiling them first if
+#          needed. Only compiling them requires NLTK.
+# Parameters:
+# - path: Path to the compiled index. (String)
+# Return: The index. (SyllableIndex)
+def load_cmu_index(path=cmu_index_path):
+    if (not exists(path)):
+        from nltk.corpus import cmudict
+
+        # Count the stressed phonemes (vowels) in each word's first
+        # pronunciation.
+        counts = {}
+        for word, pronunciations in cmudict.dict().items():
+            counts[word] = len([y for y in pronunciations[0] if y[-1].isdigit()])
+        syllable_index.write_index(counts, path)
+
+    return syllable_index.SyllableIndex(path)
+
+# Method: nsyl
+# Purpose: Return the number of syllables in a word per the CMU Pronouncing
+#          Dictionary.
+# Parameters:
+# - word: Word to be looked up. (String)
+# Return: Syllable count, or -1 if the word is not in the dictionary. (Integer)
 def nsyl(word):
-    try:
-        return [len(list(y for y in x if y[-1].isdigit())) for x in d[word.lower()]][0]
-    except KeyError:
-        #if word not found in cmudict
+    global cmu_index
+    if (cmu_index == None):
+        cmu_index = load_cmu_index()
+
+    sylls = cmu_index.lookup(word)
+    #if word not found in cmudict
+    if (sylls == None):
         return -1
+    return sylls
+
+# Store the algorithms the sweep can evaluate, by name.
+methods = {"old": syllables, "new": new_syllables, "other": nsyl}
+
+# Directory holding the per-letter syllable dictionaries
+syllable_lists = "./Syllables/Individual Syllable Lists"
+
+# Method: evaluate_shard
+# Purpose: Compare one algorithm against one letter's syllable dictionary.
+# Parameters:
+# - letter: Letter of the syllable dictionary to test against. (String)
+# - method: Name of the algorithm, as registered in methods. (String)
+# Return: Counts of words, words the dictionary skipped, words the algorithm
+#         could not count, agreements, and disagreements; a histogram of
+#         syllable deltas (returned - expected); and the disagreements as
+#         (word, expected, returned) tuples. (Dictionary)
+def evaluate_shard(letter, method):
+    count = methods[method]
+    result = {"letter":letter, "method":method, "total":0, "skipped":0, "unknown":0, "agree":0, "disagree":0, "deltas":Counter(), "disagreements":[]}
+
+    fd = open(f"{syllable_lists}/syllable_{letter}.txt", "r")
+    for line in fd:
+        word,sylls = line.strip().split(",")
+        result["total"] += 1
+
+        # Ignore words for which dictionary had no syllable count, for now
+        if (sylls == "-1"):
+            result["skipped"] += 1
+            continue
+
+        # Algorithms that cannot count a word, like a dictionary lookup for a
+        # word it does not have, return -1.
+        calced_sylls = count(word)
+        if (calced_sylls == -1):
+            result["unknown"] += 1
+        elif (calced_sylls != int(sylls)):
+            result["disagree"] += 1
+            result["deltas"][calced_sylls-int(sylls)] += 1
+            result["disagreements"].append((word, int(sylls), calced_sylls))
+        else:
+            result["agree"] += 1
+    fd.close()
+
+    return result
+
+# Method: evaluate_shard_star
+# Purpose: Unpack a (letter, method) shard for Pool.imap_unordered.
+# Parameters:
+# - shard: (letter, method) tuple. (Tuple)
+def evaluate_shard_star(shard):
+    return evaluate_shard(*shard)
+
+# Method: sweep
+# Purpose: Evaluate every algorithm against every letter's syllable dictionary
+#          across a pool of processes, and merge the results by algorithm.
+# Parameters:
+# - letters: Letters of the syllable dictionaries to test against. (List)
+# - names: Names of the algorithms, as registered in methods. (List)
+# - jobs: Number of worker processes; None uses every core. (Integer)
+# - disagreements: Path to write every disagreement to. (String)
+# Return: Merged results, by algorithm name. (Dictionary)
+def sweep(letters, names, jobs=None, disagreements="./disagreements.tsv"):
+    # Hand out the largest letters first, so no long shard starts last and
+    # the sweep takes about as long as its slowest shard.
+    size = lambda letter: getsize(f"{syllable_lists}/syllable_{letter}.txt")
+    shards = sorted([(letter, name) for letter in letters for name in names], key=lambda x: size(x[0]), reverse=True)
+
+    # Run each algorithm once up front, so one-time setup like compiling the
+    # CMU index happens here, once, instead of racing in every worker.
+    for name in names:
+        methods[name]("a")
+
+    merged = {name:{"total":0, "skipped":0, "unknown":0, "agree":0, "disagree":0, "deltas":Counter()} for name in names}
+    found = []
+    with Pool(jobs) as pool:
+        for result in pool.imap_unordered(evaluate_shard_star, shards):
+            totals = merged[result["method"]]
+            for key in ["total", "skipped", "unknown", "agree", "disagree"]:
+                totals[key] += result[key]
+            totals["deltas"].update(result["deltas"])
+            found.extend((result["method"], result["letter"], word, expected, returned) for word,expected,returned in result["disagreements"])
+
+    # Write the disagreements in a stable order, rather than finishing order.
+    found.sort(key=lambda x: (names.index(x[0]), x[1]))
+    fd = open(disagreements, "w")
+    fd.write("method\tword\texpected\treturned\n")
+    for method, letter, word, expected, returned in found:
+        fd.write(f"{method}\t{word}\t{expected}\t{returned}\n")
+    fd.close()
+
+    return merged
+
+# Method: report
+# Purpose: Format merged sweep results as an accuracy table, followed by each
+#          algorithm's histogram of syllable deltas.
+# Parameters:
+# - merged: Merged results, by algorithm name, as returned by sweep. (Dictionary)
+# Return: The table. (String)
+def report(merged):
+    lines = [f"{'Method':<8}{'Words':>9}{'Skipped':>9}{'Unknown':>9}{'Agree':>9}{'Disagree':>10}{'Accuracy':>10}"]
+    for name, totals in merged.items():
+        checked = totals["agree"] + totals["disagree"]
+        accuracy = (totals["agree"]/checked*100) if checked else 0.0
+        lines.append(f"{name:<8}{totals['total']:>9}{totals['skipped']:>9}{totals['unknown']:>9}{totals['agree']:>9}{totals['disagree']:>10}{accuracy:>9.2f}%")
+
+    lines.append("")
+    lines.append("Errors by syllable delta (returned - expected):")
+    for name, totals in merged.items():
+        histogram = ", ".join(f"{delta:+d}: {count}" for delta,count in sorted(totals["deltas"].items()))
+        lines.append(f"{name:<8}{histogram}")
+
+    return "\n".join(lines)
 
 if (__name__ == "__main__"):
-    wordlist = "a"
-    results = [f"Old: {test_method(wordlist,'old')}"]
-    results.append(f"New: {test_method(wordlist,'new')}")
-    results.append(f"Other: {test_method(wordlist,'other')}")
-
-    print(results[0])
-    print(results[1])
-    print(results[2])
\ No newline at end of file
+    # Parse CLI arguments.
+    parser = argparse.ArgumentParser(description='Measure syllable counting algorithms against the syllable dictionaries.')
+    parser.add_argument('-l', '--letters', type=str, default=ascii_lowercase, help='Letters of the dictionaries to test against. (Default: all)')
+    parser.add_argument('-m', '--methods', type=str, nargs='+', default=list(methods.keys()), choices=list(methods.keys()), help='Algorithms to evaluate. (Default: all)')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='Number of worker processes. (Default: one per core)')
+    parser.add_argument('-o', '--output', type=str, default='./disagreements.tsv', help='File to write disagreements to.')
+    args = parser.parse_args()
+
+    t1 = datetime.now()
+    print(report(sweep(list(args.letters), args.methods, args.jobs, args.output)))
+    print(f"Disagreements written to {args.output}. Runtime: {datetime.now()-t1}")
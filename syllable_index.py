@@ -0,0 +1,212 @@
+#!/usr/local/bin/python3
+
+# Imports
+import sys # CLI arguments
+from os import getpid, listdir, replace # Finding and installing files
+from os.path import abspath, dirname, exists, getmtime, isdir, join # File operations
+from mmap import mmap, ACCESS_READ # Memory-mapped lookups
+from struct import Struct # Binary layout
+
+# Default locations of the source dictionaries and the compiled index
+base = join(dirname(abspath(__file__)), "Syllables")
+default_sources = [join(base, "webS"), join(base, "Individual Syllable Lists")]
+default_index = join(base, "webS.idx")
+
+# Index layout: a header, then (count + 1) little-endian uint32 offsets into the
+# word area, then one uint8 syllable count per word, then the words themselves,
+# UTF-8 encoded and sorted bytewise so lookups can binary search them.
+header = Struct("<8sII") # Magic, word count, word area size
+offset = Struct("<I")
+magic = b"SYLIDX1\0"
+
+# Method: source_files
+# Purpose: List the files of syllable dictionaries. Directories are expanded
+#          to the syllable_{letter}.txt files they contain.
+# Parameters:
+# - sources: Paths to dictionaries, in order of precedence. (List)
+# Return: Paths to the files, in order of precedence. (List)
+def source_files(sources):
+    files = []
+    for source in sources:
+        if (isdir(source)):
+            files.extend(sorted(join(source, x) for x in listdir(source) if x.startswith("syllable_") and x.endswith(".txt")))
+        else:
+            files.append(source)
+    return files
+
+# Method: read_sources
+# Purpose: Read word,count pairs from syllable dictionaries.
+# Parameters:
+# - sources: Paths to dictionaries, or directories of them, in order of
+#            precedence. (List)
+# Return: Dictionary of word -> syllable count. (Dictionary)
+def read_sources(sources):
+    words = {}
+    for path in source_files(sources):
+        if (not exists(path)):
+            continue
+        fd = open(path, "r")
+        for line in fd:
+            word, _, sylls = line.strip().rpartition(",")
+            word = word.strip().lower()
+
+            # Ignore words for which the dictionary had no syllable count, and
+            # words an earlier source already covered.
+            if (len(word) == 0 or word in words or not sylls.lstrip("-").isdigit()):
+                continue
+            sylls = int(sylls)
+            if (sylls < 1 or sylls > 255):
+                continue
+            words[word] = sylls
+        fd.close()
+
+    return words
+
+# Method: write_index
+# Purpose: Write word syllable counts to a binary index.
+# Parameters:
+# - words: Dictionary of word -> syllable count, from 0 to 255. (Dictionary)
+# - dest: Path for the compiled index. (String)
+# Return: Number of words in the index. (Integer)
+def write_index(words, dest=default_index):
+    words = sorted((word.lower().encode("utf-8"), sylls) for word,sylls in words.items())
+
+    offsets = bytearray()
+    counts = bytearray()
+    area = bytearray()
+    for word, sylls in words:
+        offsets += offset.pack(len(area))
+        counts.append(sylls)
+        area += word
+    offsets += offset.pack(len(area))
+
+    # Write to a temporary file first, so a reader never maps a partial index,
+    # and concurrent writers never interleave.
+    tmp = f"{dest}.{getpid()}.tmp"
+    fd = open(tmp, "wb")
+    fd.write(header.pack(magic, len(words), len(area)))
+    fd.write(offsets)
+    fd.write(counts)
+    fd.write(area)
+    fd.close()
+    replace(tmp, dest)
+
+    return len(words)
+
+# Method: compile_index
+# Purpose: Compile syllable dictionaries into a binary index.
+# Parameters:
+# - sources: Paths to dictionaries, in order of precedence. (List)
+# - dest: Path for the compiled index. (String)
+# Return: Number of words in the index. (Integer)
+def compile_index(sources=default_sources, dest=default_index):
+    return write_index(read_sources(sources), dest)
+
+# Class: SyllableIndex
+# Purpose: Look up dictionary syllable counts in a memory-mapped index.
+class SyllableIndex:
+    # Method: __init__
+    # Purpose: Map the index into memory and locate its sections.
+    # Parameters:
+    # - path: Path to the compiled index. (String)
+    def __init__(self, path=default_index):
+        self.fd = open(path, "rb")
+        self.mm = mmap(self.fd.fileno(), 0, access=ACCESS_READ)
+
+        tag, self.count, size = header.unpack_from(self.mm, 0)
+        if (tag != magic):
+            raise ValueError(f"{path} is not a syllable index.")
+        self.counts = header.size + offset.size*(self.count+1)
+        self.words = self.counts + self.count
+
+        # View the offsets as an array of integers. The index is little-endian,
+        # so big-endian hosts unpack a copy instead.
+        self.view = memoryview(self.mm)
+        if (sys.byteorder == "little"):
+            self.offsets = self.view[header.size:self.counts].cast("I")
+        else:
+            self.offsets = [offset.unpack_from(self.mm, header.size+4*i)[0] for i in range(self.count+1)]
+
+    # Method: __len__
+    # Purpose: Return the number of words in the index.
+    def __len__(self):
+        return self.count
+
+    # Method: lookup
+    # Purpose: Return the dictionary syllable count for a word.
+    # Parameters:
+    # - word: Word to look up. (String)
+    # Return: Syllable count, or None if the word is not in the index. (Integer)
+    def lookup(self, word):
+        key = word.lower().encode("utf-8")
+        mm, offsets, words = self.mm, self.offsets, self.words
+        lo, hi = 0, self.count
+        while (lo < hi):
+            mid = (lo+hi) // 2
+            probe = mm[words+offsets[mid]:words+offsets[mid+1]]
+            if (probe < key):
+                lo = mid+1
+            elif (probe > key):
+                hi = mid
+            else:
+                return mm[self.counts+mid]
+        return None
+
+    # Method: close
+    # Purpose: Unmap the index.
+    def close(self):
+        if (isinstance(self.offsets, memoryview)):
+            self.offsets.release()
+        self.view.release()
+        self.mm.close()
+        self.fd.close()
+
+# Method: load_index
+# Purpose: Open the compiled index, compiling it first if it is missing or
+#          older than the dictionaries it was built from.
+# Parameters:
+# - path: Path to the compiled index. (String)
+# - sources: Paths to dictionaries, in order of precedence. (List)
+# Return: The index, or None if there is nothing to build it from. (SyllableIndex)
+def load_index(path=default_index, sources=default_sources):
+    # A file edited in place leaves its directory's time alone, so compare
+    # against each file, as well as each directory, for files added or
+    # removed.
+    newest = max([getmtime(x) for x in sources+source_files(sources) if exists(x)], default=None)
+    if (newest == None and not exists(path)):
+        return None
+    if (not exists(path) or (newest != None and getmtime(path) < newest)):
+        try:
+            compile_index(sources, path)
+        except OSError:
+            if (not exists(path)):
+                return None
+    return SyllableIndex(path)
+
+# Class: Lookup
+# Purpose: Defer opening the index until the first lookup, so importing a module
+#          that counts syllables stays cheap.
+class Lookup:
+    index = None
+    loaded = False
+
+    # Method: __call__
+    # Purpose: Return the dictionary syllable count for a word.
+    # Parameters:
+    # - word: Word to look up. (String)
+    # Return: Syllable count, or None if the word is not known. (Integer)
+    def __call__(self, word):
+        if (not self.loaded):
+            self.index = load_index()
+            self.loaded = True
+        if (self.index == None):
+            return None
+        return self.index.lookup(word)
+
+# Shared lookup for the proofing scripts.
+dictionary_syllables = Lookup()
+
+# If run, not imported, compile the index.
+if (__name__ == "__main__"):
+    dest = sys.argv[1] if len(sys.argv) > 1 else default_index
+    print(f"Compiled {compile_index(default_sources, dest)} words into {dest}")
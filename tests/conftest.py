@@ -0,0 +1,7 @@
+# Import the scripts under test by bare name, as they import each other.
+import sys
+from os.path import abspath, dirname, join
+
+root = dirname(dirname(abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, join(root, "Syllables"))
@@ -0,0 +1,25 @@
+import subprocess
+import sys
+from os.path import abspath, dirname, join
+
+script = join(dirname(dirname(abspath(__file__))), "Syllables", "BuildSyllableDictionary.py")
+
+
+def build(tmp_path, *args):
+    return subprocess.run([sys.executable, script, str(tmp_path / "words"), "-s", str(tmp_path / "s.db")] + list(args),
+                          capture_output=True, text=True, check=True).stdout
+
+
+def test_check_counts_the_wordlist_in_a_fresh_store(tmp_path):
+    (tmp_path / "words").write_text("Apple\napple\nbanana\ncherry\n")
+    assert build(tmp_path, "--check") == "4 words, 0 counted, 4 missing, 0 with no count found (0 of them not proper nouns).\n"
+
+
+def test_imports_fill_the_wordlist(tmp_path):
+    (tmp_path / "words").write_text("Apple\napple\nbanana\ncherry\n")
+    (tmp_path / "a").write_text("apple,2\n")
+    (tmp_path / "b").write_text("banana,3\ncherry,-1\n")
+    lines = build(tmp_path, "--import", str(tmp_path / "a"), "--import", str(tmp_path / "b"), "--check").splitlines()
+    assert lines[0].startswith("2 counts imported")
+    assert lines[1].startswith("2 counts imported")
+    assert lines[2] == "4 words, 4 counted, 0 missing, 1 with no count found (1 of them not proper nouns)."
@@ -0,0 +1,261 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from crawler import ConnectionPool, Crawler, HostLimit, fetch
+from scraper import ResponseCache
+
+
+# Class: Handler
+# Purpose: Answer with scripted responses, by the first part of the path:
+# - /plain/WORD: "count=N", N the length of WORD, with a Content-Length.
+# - /chunked/WORD: the same, chunked.
+# - /flaky/WORD: 503 on the first request for WORD, then as /plain.
+# - /slow/WORD: hang past the client's timeout on the first request, then
+#   as /plain.
+# - /missing/WORD: 404.
+# - /redirect/WORD: 302 to /plain/WORD.
+# - /garbled/WORD: a page the parser cannot read.
+# - /closing/WORD: as /plain, then close the connection.
+# Every request waits `delay` seconds, and the server tracks the most
+# requests open at once, and the connections made to it.
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        with self.server.lock:
+            self.server.connections += 1
+        BaseHTTPRequestHandler.setup(self)
+
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, status, body, chunked=False, headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        if (chunked):
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i in range(0, len(body), 3):
+                piece = body[i:i+3]
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(piece), piece))
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits[self.path] = hits = server.hits.get(self.path, 0)+1
+            server.open += 1
+            server.most_open = max(server.most_open, server.open)
+            server.starts.append(time.monotonic())
+        try:
+            time.sleep(server.delay)
+            kind, word = self.path.strip("/").split("/", 1)
+            body = b"count=%d" % len(word)
+            if (kind == "plain"):
+                self.send_body(200, body)
+            elif (kind == "chunked"):
+                self.send_body(200, body, chunked=True)
+            elif (kind == "flaky"):
+                self.send_body(503 if hits == 1 else 200, b"" if hits == 1 else body)
+            elif (kind == "slow"):
+                if (hits == 1):
+                    time.sleep(1.0)
+                self.send_body(200, body)
+            elif (kind == "redirect"):
+                self.send_body(302, b"", headers=[("Location", "/plain/"+word)])
+            elif (kind == "closing"):
+                self.send_body(200, body, headers=[("Connection", "close")])
+            elif (kind == "garbled"):
+                self.send_body(200, b"count=many")
+            else:
+                self.send_body(404, b"")
+        except OSError:
+            pass
+        finally:
+            with server.lock:
+                server.open -= 1
+
+
+# Class: IdleHandler
+# Purpose: Answer as Handler does, but close connections left idle for a
+#          tenth of a second, as servers drop idle keep-alive connections.
+class IdleHandler(Handler):
+    timeout = 0.1
+
+
+@pytest.fixture(params=[Handler])
+def server(request):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), request.param)
+    httpd.lock = threading.Lock()
+    httpd.hits = {}
+    httpd.open = 0
+    httpd.most_open = 0
+    httpd.starts = []
+    httpd.delay = 0.0
+    httpd.connections = 0
+    httpd.daemon_threads = True
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    httpd.base = "http://127.0.0.1:%d" % httpd.server_address[1]
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def parse(body):
+    if (body.startswith("count=")):
+        return int(body[6:])
+    return None
+
+
+def crawl(crawler, words):
+    results = {}
+    asyncio.run(crawler.crawl(words, lambda word, sylls, source: results.__setitem__(word, (sylls, source)), report=0))
+    return results
+
+
+def test_fetch_reads_content_length_and_chunked_bodies(server):
+    assert asyncio.run(fetch(server.base+"/plain/abc")) == (200, "count=3")
+    assert asyncio.run(fetch(server.base+"/chunked/abcdefghij")) == (200, "count=10")
+
+
+def test_fetch_follows_redirects(server):
+    assert asyncio.run(fetch(server.base+"/redirect/abcd")) == (200, "count=4")
+
+
+def test_retries_5xx_with_backoff(server):
+    crawler = Crawler([(server.base+"/flaky/{word}", parse)], backoff=0.01)
+    assert crawl(crawler, ["ab", "abc"]) == {"ab": (2, "127.0.0.1"), "abc": (3, "127.0.0.1")}
+    assert crawler.retried == 2
+    assert crawler.requests == 4
+
+
+def test_retries_timeouts(server):
+    crawler = Crawler([(server.base+"/slow/{word}", parse)], timeout=0.3, backoff=0.01)
+    assert crawl(crawler, ["abcde"]) == {"abcde": (5, "127.0.0.1")}
+    assert crawler.retried == 1
+
+
+def test_gives_up_after_retries(server):
+    crawler = Crawler([(server.base+"/slow/{word}", parse)], timeout=0.1, retries=0)
+    assert crawl(crawler, ["abc"]) == {"abc": (-1, None)}
+    assert crawler.failed == 1
+
+
+def test_falls_through_to_the_next_source(server):
+    sources = [(server.base+"/missing/{word}", parse), (server.base.replace("127.0.0.1", "localhost")+"/plain/{word}", parse)]
+    crawler = Crawler(sources)
+    assert crawl(crawler, ["abcd"]) == {"abcd": (4, "localhost")}
+
+
+def test_no_source_has_the_word(server):
+    crawler = Crawler([(server.base+"/missing/{word}", parse)])
+    assert crawl(crawler, ["abc"]) == {"abc": (-1, None)}
+
+
+def test_parser_errors_do_not_stop_the_crawl(server):
+    def strict(body):
+        if (body == "count=many"):
+            raise ValueError("unexpected page")
+        return parse(body)
+    crawler = Crawler([(server.base+"/{word}", strict)], rate=0)
+    results = crawl(crawler, ["garbled/x"] + ["plain/w%d" % i for i in range(20)])
+    assert results["garbled/x"] == (-1, None)
+    assert len(results) == 21
+    assert crawler.done == 21
+
+
+def test_per_host_concurrency_limit(server):
+    server.delay = 0.05
+    crawler = Crawler([(server.base+"/plain/{word}", parse)], concurrency=16, per_host=3, rate=0)
+    results = crawl(crawler, ["w%d" % i for i in range(30)])
+    assert len(results) == 30
+    assert 1 < server.most_open <= 3
+
+
+def test_per_host_rate_limit(server):
+    crawler = Crawler([(server.base+"/plain/{word}", parse)], concurrency=8, per_host=8, rate=20)
+    crawl(crawler, ["w%d" % i for i in range(10)])
+    starts = sorted(server.starts)
+    # Ten requests at 20 per second span at least nine intervals of 50 ms.
+    assert starts[-1]-starts[0] >= 0.4
+
+
+def test_host_limit_spaces_starts():
+    async def run():
+        limit = HostLimit(4, 20)
+        starts = []
+        async def one():
+            async with limit:
+                starts.append(time.monotonic())
+        await asyncio.gather(*[one() for i in range(5)])
+        return starts
+    starts = sorted(asyncio.run(run()))
+    # Starts are scheduled 50 ms apart; allow for the event loop waking a
+    # task a little after its start time.
+    assert all(b-a >= 0.04 for a, b in zip(starts, starts[1:]))
+    assert starts[-1]-starts[0] >= 0.19
+
+
+def test_reuses_connections(server):
+    crawler = Crawler([(server.base+"/plain/{word}", parse)], concurrency=8, per_host=2, rate=0)
+    results = crawl(crawler, ["w%d" % i for i in range(40)])
+    assert len(results) == 40
+    assert server.connections <= 2
+    assert crawler.pool.idle == {}
+
+
+def test_does_not_reuse_closed_connections(server):
+    crawler = Crawler([(server.base+"/closing/{word}", parse)], concurrency=4, per_host=2, rate=0)
+    results = crawl(crawler, ["w%d" % i for i in range(10)])
+    assert set(results.values()) == {(2, "127.0.0.1")}
+    assert server.connections == 10
+
+
+@pytest.mark.parametrize("server", [IdleHandler], indirect=True)
+def test_reconnects_after_the_server_drops_an_idle_connection(server):
+    async def run():
+        pool = ConnectionPool()
+        first = await fetch(server.base+"/plain/abc", pool=pool)
+        await asyncio.sleep(0.3)
+        second = await fetch(server.base+"/plain/abcd", pool=pool)
+        pool.close()
+        return first, second
+    assert asyncio.run(run()) == ((200, "count=3"), (200, "count=4"))
+    assert server.connections == 2
+
+
+def test_cache_is_used_off_the_event_loop(server, tmp_path):
+    # Class: RecordingCache
+    # Purpose: Note the thread each cache call runs on.
+    class RecordingCache(ResponseCache):
+        def get(self, url):
+            threads.add(threading.current_thread())
+            return ResponseCache.get(self, url)
+
+        def put(self, *args):
+            threads.add(threading.current_thread())
+            ResponseCache.put(self, *args)
+
+    threads = set()
+    cache = RecordingCache(str(tmp_path), max_bytes=10**6)
+    words = ["w%d" % i for i in range(10)]
+    crawler = Crawler([(server.base+"/plain/{word}", parse)], rate=0, cache=cache)
+    assert set(crawl(crawler, words).values()) == {(2, "127.0.0.1")}
+    assert threads and threading.main_thread() not in threads
+
+    # A second crawl reads every page from the cache.
+    crawler = Crawler([(server.base+"/plain/{word}", parse)], rate=0, cache=cache)
+    assert set(crawl(crawler, words).values()) == {(2, "127.0.0.1")}
+    assert crawler.requests == 0
+    assert cache.hits == 10
@@ -0,0 +1,95 @@
+import http.client
+import json
+import re
+import socket
+import threading
+
+import pytest
+
+import daemon as daemon_module
+from daemon import ProofingDaemon
+
+
+@pytest.fixture(scope="module")
+def daemon():
+    proofing = ProofingDaemon(("127.0.0.1", 0), workers=2)
+    thread = threading.Thread(target=proofing.server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield proofing
+    proofing.server.shutdown()
+    proofing.close()
+
+
+def post(daemon, body, headers=None, path="/analyze"):
+    connection = http.client.HTTPConnection(*daemon.server.server_address, timeout=10)
+    try:
+        connection.putrequest("POST", path)
+        if (headers == None):
+            headers = {"Content-Length": str(len(body))}
+        for name, value in headers.items():
+            connection.putheader(name, value)
+        connection.endheaders(body)
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def test_one_line_post(daemon):
+    status, body = post(daemon, b"One line post.")
+    assert status == 200
+    report = json.loads(body)
+    assert report["title"] == "One line post."
+    assert report["stats"]["words"] == 0
+
+
+def test_title_only_post(daemon):
+    status, body = post(daemon, b"Only a title\n")
+    assert status == 200
+    report = json.loads(body)
+    assert report["title"] == "Only a title"
+    assert report["paragraphs"] == []
+
+
+def test_untitled_one_line_post(daemon):
+    status, body = post(daemon, b"One line post.", path="/analyze?title=0")
+    assert status == 200
+    assert json.loads(body)["stats"]["words"] == 3
+
+
+def test_bad_content_length(daemon):
+    for length in ["-1", "ten", "1.5"]:
+        status, body = post(daemon, b"", {"Content-Length": length})
+        assert status == 400
+
+
+def test_rejected_posts_do_not_leave_their_body_behind(daemon):
+    # On a keep-alive connection, an unread body would be answered as a
+    # second request.
+    for path in ["/analyze?format=xml", "/elsewhere"]:
+        inner = b"GET /status HTTP/1.1\r\nHost: x\r\n\r\n"
+        request = b"POST %s HTTP/1.1\r\nHost: x\r\nContent-Length: %d\r\n\r\n%s" % (path.encode(), len(inner), inner)
+        client = socket.create_connection(daemon.server.server_address, timeout=10)
+        try:
+            client.sendall(request + b"GET /missing HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n")
+            response = b""
+            while (True):
+                chunk = client.recv(65536)
+                if (not chunk):
+                    break
+                response += chunk
+        finally:
+            client.close()
+        statuses = re.findall(rb"HTTP/1.1 (\d+) ", response)
+        assert statuses[0] in [b"400", b"404"]
+        assert statuses[1:] == [b"404"]
+
+
+def test_failed_posts_are_not_counted_as_served(daemon, monkeypatch):
+    def fail(text, fmt, title):
+        raise RuntimeError("broken")
+    served = daemon.served
+    monkeypatch.setattr(daemon_module, "handle", fail)
+    status, body = post(daemon, b"Title\n\nText.")
+    assert status == 500
+    assert daemon.served == served
@@ -0,0 +1,33 @@
+from phrase_matcher import LongestMatches, PhraseMatcher
+from tokenizer import tokenize
+
+
+def search(phrases, text):
+    return [(text[start:end], phrase) for start, end, phrase in PhraseMatcher(phrases, tokenize).search_tokens(tokenize(text), text)]
+
+
+def test_matches_whole_words_in_any_case():
+    assert search(["cease", "at the end of the day"], "At the End of the day, we ceased to cease.") == [
+        ("At the End of the day", "at the end of the day"), ("cease", "cease")]
+
+
+def test_does_not_match_across_punctuation():
+    assert search(["at the end of the day"], "We stopped at the end. Of the day, little was said.") == []
+    assert search(["in order that"], "It was in order; that was enough.") == []
+
+
+def test_does_not_match_across_skipped_markup():
+    assert search(["prior to"], "Go [prior](http://x.y/) to lunch, or prior <b>to</b> it.") == []
+
+
+def test_matches_phrases_with_their_own_punctuation():
+    # A match spans its first word to its last, so it omits the ")".
+    assert search(["applicant (the)", "in the event of/that"], "The applicant (the) wrote in the event of/that.") == [
+        ("applicant (the", "applicant (the)"), ("in the event of/that", "in the event of/that")]
+    assert search(["applicant (the)"], "The applicant, the clerk.") == []
+
+
+def test_longest_matches_do_not_overlap():
+    text = "at the present time"
+    matches = PhraseMatcher(["at the present time", "present time", "at the"], tokenize).search_tokens(tokenize(text), text)
+    assert [phrase for start, end, phrase in LongestMatches(matches)] == ["at the present time"]
@@ -0,0 +1,41 @@
+import pytest
+
+pytest.importorskip("Markdown")
+
+import Proofer
+
+template = "<html><body>\n<!--Divider-->\n" + " ".join(["%s"]*13) + "\n</body></html>\n"
+
+
+@pytest.fixture
+def draft(tmp_path):
+    (tmp_path / "template.html").write_text(template)
+    return tmp_path
+
+
+def build(draft, text, context):
+    (draft / "post.md").write_text(text)
+    return Proofer.GenFile(str(draft / "post.md"), str(draft / "template.html"), str(draft / "index.html"), context)
+
+
+def test_rebuilds_survive_empty_and_title_only_drafts(draft):
+    # A watch session saves the draft as it is written, starting from nothing.
+    context = Proofer.BuildContext()
+    for text in ["", "A new post\n", "A new post\n=\n\n", "A new post\n=\n\nNo sentence yet\n", "A new post\n=\n\nThe first sentence. The second.\n", ""]:
+        build(draft, text, context)
+        assert "</body></html>" in (draft / "index.html").read_text()
+
+
+def test_empty_draft_scores_zero(draft):
+    (draft / "post.md").write_text("Only a title\n")
+    document = Proofer.BuildDocument(str(draft / "post.md"), render=False, context=Proofer.BuildContext())
+    counts = document["counts"]
+    assert (counts["words"], counts["fog_index"], counts["reading_ease"], counts["grade_level"]) == (0, 0.0, 0.0, 0.0)
+    assert (document["stats"]["AVGWP"], document["stats"]["AVGWS"]) == (0.0, 0.0)
+
+
+def test_pattern_cache_is_bounded():
+    context = Proofer.BuildContext(max_patterns=3)
+    for word in ["one", "two", "three", "one", "four"]:
+        assert context.pattern(word).search(" %s " % word)
+    assert list(context.patterns) == ["three", "one", "four"]
@@ -0,0 +1,50 @@
+from os.path import abspath, dirname, join
+
+import pytest
+
+import Proofer2
+
+template = Proofer2.read_template(join(dirname(dirname(abspath(__file__))), "assets", "template.html"))
+options = {"parser": lambda line: "<p>%s</p>" % line if line else ""}
+
+
+def test_short_posts_score_zero():
+    for text in ["Title\n\nNo sentence punctuation here\n", "Only a title\n", "Only a title", "", "Type: link\n"]:
+        report = Proofer2.analyze(text, options)
+        assert (report.fog_index, report.reading_ease, report.grade_level) == (0.0, 0.0, 0.0)
+        assert Proofer2.render(report, template)
+
+
+def test_title_only_post():
+    report = Proofer2.analyze("Only a title\n")
+    assert report.title == "Only a title"
+    assert report.words == 0
+    assert report.paragraphs == []
+
+
+def test_readability():
+    assert Proofer2.readability(0, 0, 0, 0) == (0.0, 0.0, 0.0)
+    assert Proofer2.readability(10, 0, 1, 12) == (0.0, 0.0, 0.0)
+    assert Proofer2.readability(20, 2, 2, 30) == pytest.approx((8.0, 69.785, 6.01))
+
+
+def test_summarize_an_empty_batch():
+    assert Proofer2.summarize([])["fog_index"] == 0.0
+
+
+def test_preview_paths_keep_extensions_only_when_names_collide(tmp_path):
+    posts = ["a.md", "a.txt", "b.md", "sub/a.md", "sub/C.md", "sub/c.markdown"]
+    for name in posts:
+        (tmp_path / name).parent.mkdir(exist_ok=True)
+        (tmp_path / name).write_text("Title\n\nText.\n")
+    inputs = [str(tmp_path / x) for x in posts] + [str(tmp_path / "sub" / ".." / "b.md")]
+    paths = Proofer2.preview_paths(inputs, "out")
+    assert sorted(paths.values()) == [join("out", x) for x in ["a.md.html", "a.txt.html", "b.html", "sub/C.md.html", "sub/a.html", "sub/c.markdown.html"]]
+    assert paths[str(tmp_path / "a.md")] == join("out", "a.md.html")
+
+
+def test_preview_paths_refuse_unresolvable_collisions(tmp_path):
+    for name in ["a.md", "a.txt", "a.md.txt"]:
+        (tmp_path / name).write_text("Title\n\nText.\n")
+    with pytest.raises(ValueError):
+        Proofer2.preview_paths([str(tmp_path / x) for x in ["a.md", "a.txt", "a.md.txt"]], "out")
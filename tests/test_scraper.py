@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+import scraper
+from scraper import ResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(scraper.time, "time", lambda: now[0])
+    return now
+
+
+def files(directory):
+    return sorted(os.path.join(root, x) for root, dirs, names in os.walk(directory) for x in names)
+
+
+def test_get_returns_what_put_stored(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.put("HTTP://Example.com:80/a?b=2&a=1#top", 200, "text/html", b"page")
+    assert cache.get("http://example.com/a?a=1&b=2") == (200, "text/html", b"page")
+    assert cache.get("http://example.com/b") == None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_evicts_oldest_pages_past_the_size_limit(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path), max_bytes=10**6)
+    for i in range(5):
+        clock[0] += 1
+        cache.put("http://example.com/%d" % i, 200, "", os.urandom(1000))
+    size = os.path.getsize(cache.path("http://example.com/0"))
+    cache.max_bytes = 3*size
+    clock[0] += 1
+    cache.put("http://example.com/0", 200, "", os.urandom(1000))
+    clock[0] += 1
+    cache.put("http://example.com/5", 200, "", os.urandom(1000))
+
+    # Page 0 was rewritten, so it is newer than pages 1 through 4.
+    kept = [i for i in range(6) if cache.get("http://example.com/%d" % i) != None]
+    assert kept == [0, 4, 5]
+    assert cache.total == sum(os.path.getsize(x) for x in files(tmp_path))
+    assert len(cache.ages) <= 2*len(cache.index)
+
+
+def test_stale_get_removes_the_page_from_the_total(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path), ttl=10, max_bytes=10**6)
+    cache.put("http://example.com/old", 200, "", b"old page")
+    clock[0] += 5
+    cache.put("http://example.com/new", 200, "", b"new page")
+    clock[0] += 6
+    assert cache.get("http://example.com/old") == None
+    assert cache.get("http://example.com/new") != None
+    assert list(cache.index) == [cache.path("http://example.com/new")]
+    assert cache.total == sum(os.path.getsize(x) for x in files(tmp_path))
+
+
+def test_prune_reads_pages_left_by_earlier_runs(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path))
+    paths = []
+    for i in range(4):
+        clock[0] += 1
+        cache.put("http://example.com/%d" % i, 200, "", b"x"*1000)
+        paths.append(cache.path("http://example.com/%d" % i))
+        os.utime(paths[-1], (clock[0], clock[0]))
+    kept = os.path.getsize(paths[2]) + os.path.getsize(paths[3])
+
+    cache = ResponseCache(str(tmp_path), max_bytes=kept)
+    cache.prune()
+    assert [i for i in range(4) if cache.get("http://example.com/%d" % i) != None] == [2, 3]
+    assert cache.total == kept
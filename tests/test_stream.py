@@ -0,0 +1,42 @@
+import gc
+
+import Proofer2
+from repetition import RepetitionDetector
+
+
+# Words no paragraph repeats, so nothing but the window can free them.
+def unique_paragraphs(count):
+    for i in range(count):
+        yield " ".join("w%dx%d" % (i, j) for j in range(12)) + ". The end came.\n"
+
+
+def live_paragraphs():
+    return sum(1 for x in gc.get_objects() if type(x) is Proofer2.Paragraph)
+
+
+def test_stream_holds_a_bounded_number_of_paragraphs():
+    report = Proofer2.Report()
+    counts = []
+    for i, paragraph in enumerate(Proofer2.stream(unique_paragraphs(3000), report, {"title": False})):
+        if (i % 500 == 499):
+            del paragraph
+            gc.collect()
+            counts.append(live_paragraphs())
+    assert report.paragraph_count == 3000
+    assert max(counts) < 50
+
+
+def test_detector_forgets_words_outside_the_window():
+    detector = RepetitionDetector(window=10, repeats=2)
+    for i in range(10000):
+        detector.add("word%d" % i, i)
+    assert len(detector.recent) <= 10
+    assert len(detector.expiry) <= 10
+
+
+def test_detector_still_finds_repeats_across_the_window():
+    detector = RepetitionDetector(window=5, repeats=2)
+    for i, word in enumerate("a b c a d e f g h a i a".split()):
+        detector.add(word, i)
+    # The first pair is 3 words apart; the middle "a" is too far from both.
+    assert detector.repeated() == {"a": [0, 3, 9, 11]}
@@ -0,0 +1,24 @@
+import os
+
+import syllable_index
+
+
+def test_rebuilds_when_a_source_in_a_directory_changes(tmp_path):
+    lists = tmp_path / "lists"
+    lists.mkdir()
+    source = lists / "syllable_a.txt"
+    source.write_text("apple,2\n")
+    index = str(tmp_path / "test.idx")
+    loaded = syllable_index.load_index(index, [str(lists)])
+    assert loaded.lookup("apple") == 2
+    loaded.close()
+
+    # Edit the file in place, as an editor saving it would, leaving the
+    # directory's time before the index's.
+    source.write_text("apple,3\n")
+    os.utime(lists, (0, 0))
+    os.utime(index, (1, 1))
+    os.utime(source, (2, 2))
+    loaded = syllable_index.load_index(index, [str(lists)])
+    assert loaded.lookup("apple") == 3
+    loaded.close()
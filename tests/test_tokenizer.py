@@ -0,0 +1,24 @@
+from tokenizer import count_sentences, tokenize
+
+
+def sentences(text):
+    return count_sentences(tokenize(text))
+
+
+def test_a_number_can_end_a_sentence():
+    assert sentences("It was 2020. Then it ended.") == 2
+    assert sentences("We met at 5. Then left.") == 2
+    assert sentences("Pi is 3.14. Yes.") == 2
+    assert sentences("It cost 1,000! Really?") == 2
+
+
+def test_separators_inside_a_number_do_not_end_a_sentence():
+    assert sentences("Pi is 3.14 or so, and 1,000.5 is more.") == 1
+    assert [x.text for x in tokenize("Version 2.0.1 shipped 10th.")] == ["Version", "shipped"]
+
+
+def test_words_and_cases():
+    tokens = tokenize("The NASA probe, e.g. iPhone's, didn't stop. [a link](http://x.y/z.html) <b>")
+    assert [x.text for x in tokens] == ["The", "NASA", "probe", "e.g", "iPhone's", "didn't", "stop", "a", "link"]
+    assert [x.case for x in tokens[:5]] == ["title", "upper", "lower", "lower", "mixed"]
+    assert [x.sentence_end for x in tokens].count(True) == 2
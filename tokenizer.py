@@ -0,0 +1,60 @@
+#!/usr/local/bin/python3
+
+# Imports
+from collections import namedtuple # Tokens
+from re import compile as recompile # Scanning
+
+# A word in a paragraph:
+# - start, end: Offsets of the word in the paragraph. (Integer)
+# - text: The word as written. (String)
+# - norm: The word lowercased, for lexicon lookups and repetition. (String)
+# - case: "lower", "upper", "title" (capitalized), or "mixed". (String)
+# - sentence_end: Whether a sentence ends after the word. (Boolean)
+Token = namedtuple("Token", ["start", "end", "text", "norm", "case", "sentence_end"])
+
+# Match, in order of precedence:
+# 1. Markup whose text is not prose, which is skipped: link targets, HTML
+#    tags, and bare URLs.
+# 2. A word: a letter, then word characters, joined across inner apostrophes,
+#    hyphens, and periods, as in "don't", "well-known", and "e.g".
+# 3. A number, which is skipped, so its decimal point or thousands separator
+#    does not end a sentence. A separator counts only with a digit after it,
+#    so the period after "in 2020." still does.
+# 4. A run of sentence-ending punctuation, as in "." or "?!" or "...".
+token_re = recompile(r"(\]\([^)]*\)|<[^>]*>|\w+://\S+)|([^\W\d_]\w*(?:['’.-]\w+)*)|(\d+(?:[,.]\d+)*\w*)|([.?!]+)")
+
+# Method: tokenize
+# Purpose: Scan a paragraph once, for every metric computed over its words.
+# Parameters:
+# - text: The paragraph. (String)
+# Return: The paragraph's words, in order. (List)
+def tokenize(text):
+    tokens = []
+    append = tokens.append
+    for m in token_re.finditer(text):
+        kind = m.lastindex
+        if (kind == 2):
+            word = m.group(2)
+            if (word.islower()):
+                case = "lower"
+            elif (word.isupper()):
+                case = "upper"
+            elif (word[0].isupper()):
+                case = "title"
+            else:
+                case = "mixed"
+            start, end = m.span()
+            append((start, end, word, word.lower(), case))
+        elif (kind == 4 and tokens and len(tokens[-1]) == 5):
+            tokens[-1] += (True,)
+
+    # Build the tokens once each word's sentence ending is known.
+    return [Token._make(x if len(x) == 6 else x+(False,)) for x in tokens]
+
+# Method: count_sentences
+# Purpose: Count the sentences ending in a paragraph.
+# Parameters:
+# - tokens: The paragraph's words, from tokenize. (List)
+# Return: Number of sentences. (Integer)
+def count_sentences(tokens):
+    return sum(1 for x in tokens if x.sentence_end)
@@ -0,0 +1,138 @@
+#!/usr/local/bin/python3
+
+# Imports
+import os # File status, reading events
+import sys # Platform detection
+from select import select # Waiting on events
+from struct import Struct # Parsing inotify events
+from time import monotonic, sleep # Debouncing, polling
+
+# inotify event masks, from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008 # File opened for writing was closed
+IN_MOVED_TO = 0x00000080 # File moved into the directory, as in rename-on-save
+IN_CREATE = 0x00000100 # File created in the directory
+IN_CLOEXEC = 0o2000000
+
+# struct inotify_event: int wd; uint32_t mask, cookie, len; char name[len]
+inotify_event = Struct("iIII")
+
+# Method: load_inotify
+# Purpose: Load the inotify functions from the C library, on Linux.
+# Return: The C library, or None if inotify is not available. (ctypes.CDLL)
+def load_inotify():
+    if (not sys.platform.startswith("linux")):
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+# Class: Watcher
+# Purpose: Wait for a file to change, with inotify where available and by
+#          polling its status otherwise. Changes arriving within the debounce
+#          window of each other are reported once.
+class Watcher:
+    # Method: __init__
+    # Purpose: Start watching a file.
+    # Parameters:
+    # - path: File to watch. (String)
+    # - debounce: Seconds without further changes before reporting one. (Float)
+    # - interval: Seconds between checks when polling. (Float)
+    def __init__(self, path, debounce=0.05, interval=2.0):
+        self.path = os.path.abspath(path)
+        self.debounce = debounce
+        self.interval = interval
+        self.fd = None
+
+        # Watch the file's directory rather than the file, so saves that
+        # write a temporary file and rename it over the original are seen.
+        libc = load_inotify()
+        if (libc != None):
+            fd = libc.inotify_init1(IN_CLOEXEC)
+            if (fd >= 0):
+                directory = os.path.dirname(self.path).encode()
+                if (libc.inotify_add_watch(fd, directory, IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE) >= 0):
+                    self.fd = fd
+                else:
+                    os.close(fd)
+
+        self.name = os.path.basename(self.path).encode()
+        self.last = self.status()
+
+    # Method: status
+    # Purpose: Return what polling compares to detect a change.
+    # Return: (inode, size, modification time), or None if the file is
+    #         missing, as it may be for a moment mid-save. (Tuple)
+    def status(self):
+        try:
+            s = os.stat(self.path)
+            return (s.st_ino, s.st_size, s.st_mtime_ns)
+        except FileNotFoundError:
+            return None
+
+    # Method: events
+    # Purpose: Read pending inotify events, waiting up to timeout seconds for
+    #          them to arrive.
+    # Parameters:
+    # - timeout: Seconds to wait; None waits indefinitely. (Float)
+    # Return: Whether any event concerned the watched file. (Boolean)
+    def events(self, timeout):
+        ready, _, _ = select([self.fd], [], [], timeout)
+        if (not ready):
+            return False
+
+        buf = os.read(self.fd, 65536)
+        found = False
+        i = 0
+        while (i < len(buf)):
+            wd, mask, cookie, length = inotify_event.unpack_from(buf, i)
+            name = buf[i+inotify_event.size:i+inotify_event.size+length].rstrip(b"\0")
+            if (name == self.name):
+                found = True
+            i += inotify_event.size + length
+        return found
+
+    # Method: wait
+    # Purpose: Block until the file changes, then until it has stopped changing
+    #          for the debounce window.
+    def wait(self):
+        if (self.fd != None):
+            # Sleep in the kernel until an event concerns the file, then
+            # swallow the rest of the burst.
+            while (not self.events(None)):
+                pass
+            deadline = monotonic() + self.debounce
+            while (True):
+                remaining = deadline - monotonic()
+                if (remaining <= 0):
+                    break
+                if (self.events(remaining)):
+                    deadline = monotonic() + self.debounce
+        else:
+            # Poll until the status changes and the file exists, then until the
+            # status holds steady for the debounce window.
+            while (True):
+                sleep(self.interval)
+                current = self.status()
+                if (current != None and current != self.last):
+                    break
+            while (True):
+                sleep(self.debounce)
+                settled = self.status()
+                if (settled != None and settled == current):
+                    break
+                current = settled
+
+        self.last = self.status()
+
+    # Method: close
+    # Purpose: Stop watching the file.
+    def close(self):
+        if (self.fd != None):
+            os.close(self.fd)
+            self.fd = None